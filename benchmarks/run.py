@@ -0,0 +1,264 @@
+"""Offline benchmarks for the lookup, search and JSON post-processing paths
+
+Starts the fixture stub server, points Decibel's providers at it and replays Gemini
+through a stand-in model, then reports throughput, p50/p95/p99 latency and memory per
+scenario as JSON. Nothing touches the network or the user's cache directory.
+
+    python -m benchmarks.run --iterations 20 --latency-ms 80 --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.stub_server import StubServer, load_fixture
+
+API_KEY = 'benchmark-key'
+SNIPPET_RE = re.compile(r'provided these lyrics or sung words:\n"(.*?)"\n\n', re.S)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class _Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StreamedReply:
+    """Async iterable of chunks, like a streamed GenerateContentResponse"""
+
+    def __init__(self, text, chunk_size=48):
+        self.chunks = [_Reply(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class ReplayModel:
+    """Stands in for GenerativeModel, answering from the stub server's Gemini fixtures"""
+
+    def __init__(self, base_url, model_name):
+        self.url = f'{base_url}/v1beta/models/{model_name}:generateContent'
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        from decibel import http
+        match = SNIPPET_RE.search(prompt)
+        payload = {'snippet': match.group(1) if match else ''}
+        response = await asyncio.to_thread(http.session().post, self.url, json=payload, timeout=30)
+        response.raise_for_status()
+        text = response.json()['text']
+        return _StreamedReply(text) if stream else _Reply(text)
+
+
+async def measure(name, calls, concurrency):
+    """Run the zero-argument coroutine factories in calls, concurrency at a time"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(call):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if await call() is None:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'name': name,
+        'calls': len(calls),
+        'errors': errors,
+        'throughput_per_s': round(len(calls) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'peak_alloc_kb': round(peak / 1024, 1),
+    }
+
+
+async def _none_if_empty(awaitable):
+    return await awaitable or None
+
+
+def scenarios(iterations, concurrency):
+    """Build and run every scenario on Decibel's event loop"""
+    from decibel import aio
+    from decibel.gemini import parse_songs
+    from decibel.jsonstream import JSONArrayStream
+    from decibel.lookup import lookup_lyrics_async, lyrics_cache
+    from decibel.providers import race_providers_async
+    from decibel.search import search_lyrics_async
+    from decibel.semantic_cache import snippet_cache
+    from decibel.synced import SyncedLyrics
+
+    songs = [tuple(key.split('|')) for key in load_fixture('lrclib_get.json')]
+    snippets = list(load_fixture('gemini.json'))
+    replies = list(load_fixture('gemini.json').values())
+    lrcs = [track['syncedLyrics'] for track in load_fixture('lrclib_get.json').values() if track.get('syncedLyrics')]
+    encoded = [SyncedLyrics.parse(lrc).encode() for lrc in lrcs]
+
+    async def search_uncached(snippet):
+        # Every search has to reach Gemini, as for a snippet nobody asked about yet
+        snippet_cache().store.clear()
+        return await _none_if_empty(search_lyrics_async(snippet, API_KEY))
+
+    def parse(text):
+        try:
+            return parse_songs(text)
+        except ValueError:
+            return None
+
+    def stream_parse(text):
+        parser = JSONArrayStream()
+        items = []
+        for i in range(0, len(text), 48):
+            items.extend(parser.feed(text[i:i + 48]))
+        parser.close()
+        return items or None
+
+    async def sync_call(fn, arg):
+        return fn(arg)
+
+    async def run_all():
+        results = []
+        # Search runs first, while the local index is still empty, so the first pass reaches
+        # Gemini; verifying candidates indexes their lyrics, so later passes may not, as in the app
+        results.append(await measure(
+            'search_lyrics_gemini',
+            [lambda s=s: search_uncached(s) for s in snippets] * iterations, 1))
+        results.append(await measure(
+            'fetch_lyrics_uncached',
+            [lambda a=a, t=t: race_providers_async(a, t) for a, t in songs] * iterations, concurrency))
+        # Verifying search candidates fetched some of these songs already
+        lyrics_cache().clear()
+        results.append(await measure(
+            'fetch_lyrics_first',
+            [lambda a=a, t=t: lookup_lyrics_async(a, t) for a, t in songs], concurrency))
+        results.append(await measure(
+            'fetch_lyrics_cached',
+            [lambda a=a, t=t: lookup_lyrics_async(a, t) for a, t in songs] * iterations, concurrency))
+        # Fetched lyrics are now indexed, so these are answered locally
+        results.append(await measure(
+            'search_lyrics_local',
+            [lambda s=s: _none_if_empty(search_lyrics_async(s, API_KEY)) for s in snippets] * iterations,
+            concurrency))
+        results.append(await measure(
+            'json_parse_songs',
+            [lambda r=r: sync_call(parse, r) for r in replies] * iterations * 20, 1))
+        results.append(await measure(
+            'json_stream_parse',
+            [lambda r=r: sync_call(stream_parse, r) for r in replies] * iterations * 20, 1))
+        results.append(await measure(
+            'synced_parse',
+            [lambda l=l: sync_call(SyncedLyrics.parse, l) for l in lrcs] * iterations * 20, 1))
+        results.append(await measure(
+            'synced_decode_line_at',
+            [lambda e=e: sync_call(lambda e: SyncedLyrics.decode(e).line_at(7000), e) for e in encoded]
+            * iterations * 20, 1))
+        return results
+
+    return aio.run_sync(run_all())
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a previous run: slower p95 or lower throughput beyond tolerance"""
+    previous = {s['name']: s for s in baseline.get('scenarios', [])}
+    regressions = []
+    for scenario in results['scenarios']:
+        before = previous.get(scenario['name'])
+        if not before:
+            continue
+        if scenario['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{scenario['name']}: p95 {before['p95_ms']}ms -> {scenario['p95_ms']}ms")
+        if before.get('throughput_per_s') and scenario['throughput_per_s'] < before['throughput_per_s'] * (1 - tolerance):
+            regressions.append(f"{scenario['name']}: throughput {before['throughput_per_s']}/s "
+                               f"-> {scenario['throughput_per_s']}/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Decibel against recorded provider responses")
+    parser.add_argument('--iterations', type=int, default=10, help="Repeats of each fixture per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50, help="Injected upstream latency")
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of upstream calls answered 503")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-o', '--output', help="Write results JSON here instead of stdout")
+    parser.add_argument('--baseline', help="Results JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before failing, as a fraction")
+    args = parser.parse_args(argv)
+
+    stub = StubServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      error_rate=args.error_rate, seed=args.seed).start()
+    # Decibel reads these at import time
+    os.environ['DECIBEL_LYRICS_API_URL'] = stub.url
+    os.environ['DECIBEL_LRCLIB_URL'] = stub.url
+    os.environ['DECIBEL_CACHE_DIR'] = tempfile.mkdtemp(prefix='decibel-bench-')
+    os.environ['DECIBEL_INDEX_PATH'] = os.path.join(os.environ['DECIBEL_CACHE_DIR'], 'index.sqlite3')
+
+    from decibel import gemini, gemini_pool, metrics, search
+    gemini_pool.register_model(API_KEY, gemini_pool.MODEL_NAME, ReplayModel(stub.url, gemini_pool.MODEL_NAME))
+    # The replay model stands in for the SDK, which need not be installed
+    gemini.GEMINI_AVAILABLE = search.GEMINI_AVAILABLE = True
+
+    try:
+        results = {
+            'python': platform.python_version(),
+            'settings': {k: getattr(args, k) for k in
+                         ('iterations', 'concurrency', 'latency_ms', 'jitter_ms', 'error_rate', 'seed')},
+            'scenarios': scenarios(args.iterations, args.concurrency),
+            'upstream_requests': stub.requests,
+            # Where the time went inside Decibel, from its own spans
+            'stages': metrics.summary(),
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1),
+        }
+    finally:
+        stub.stop()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Latency and accuracy of the speech-to-text engines on recorded lyric clips
+
+Clips live in benchmarks/audio/ next to manifest.json, which holds the words sung in
+each. The bundled clips were chanted to a simple tune by espeak-ng (see sung_ssml), so
+every checkout measures the same audio; --synthesize regenerates them and --record
+replaces them with clips sung into a microphone, which are closer to what voice search
+hears:
+
+    python -m benchmarks.stt --synthesize --overwrite
+    python -m benchmarks.stt --record --overwrite
+    python -m benchmarks.stt --engines google vosk whisper --iterations 3 -o stt.json
+
+Reports per engine the p50/p95 latency of one clip, the word error rate against the
+manifest, and the throughput when every clip is submitted at once.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.run import percentile
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio')
+
+
+def load_manifest():
+    with open(os.path.join(AUDIO_DIR, 'manifest.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (r != h))
+    return row[-1] / max(len(ref), 1)
+
+
+def record_missing(overwrite=False):
+    import speech_recognition as sr
+    recognizer = sr.Recognizer()
+    with sr.Microphone(sample_rate=16000) as source:
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        for entry in load_manifest():
+            path = os.path.join(AUDIO_DIR, entry['file'])
+            if os.path.exists(path) and not overwrite:
+                continue
+            input(f"Press Enter, then sing or say: \"{entry['text']}\" ")
+            audio = recognizer.listen(source, timeout=8, phrase_time_limit=12)
+            with open(path, 'wb') as f:
+                f.write(audio.get_wav_data(convert_rate=16000, convert_width=2))
+            print(f"saved {path}")
+
+
+def synthesizer():
+    """Path of an installed espeak-ng or espeak, or None"""
+    return shutil.which('espeak-ng') or shutil.which('espeak')
+
+
+# A tune for the synthesized clips, as pitch in percent of the voice's base, cycled
+# over the words; each word is held on its note, as when singing
+MELODY = [40, 60, 80, 70, 100, 80, 60, 70, 50, 40, 80, 100, 120, 100, 80, 60]
+SYNTH_WPM = 105
+
+
+def sung_ssml(text):
+    """SSML that has espeak-ng chant text on MELODY"""
+    return '<speak>' + ' '.join(
+        f'<prosody pitch="{MELODY[i % len(MELODY)]}" range="0">{word}</prosody>'
+        for i, word in enumerate(text.split())
+    ) + '</speak>'
+
+
+def synthesize_missing(overwrite=False):
+    """Speak every missing clip's words into its WAV file; False without a synthesizer"""
+    program = synthesizer()
+    if program is None:
+        return False
+    for entry in load_manifest():
+        path = os.path.join(AUDIO_DIR, entry['file'])
+        if os.path.exists(path) and not overwrite:
+            continue
+        subprocess.run([program, '-m', '-v', 'en-us', '-s', str(SYNTH_WPM), '-w', path,
+                        sung_ssml(entry['text'])], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"synthesized {path}", file=sys.stderr)
+    return True
+
+
+def load_clips():
+    import speech_recognition as sr
+    clips, missing = [], []
+    for entry in load_manifest():
+        path = os.path.join(AUDIO_DIR, entry['file'])
+        if not os.path.exists(path):
+            missing.append(entry['file'])
+            continue
+        with sr.AudioFile(path) as source:
+            clips.append((entry, sr.Recognizer().record(source)))
+    return clips, missing
+
+
+def bench_engine(engine, clips, iterations):
+    import speech_recognition as sr
+    from decibel import stt
+    recognizer = sr.Recognizer()
+    if engine in stt.ENGINES:
+        # Model loading is a one-off per process; keep it out of the per-clip numbers
+        started = time.perf_counter()
+        stt.transcribe_audio(recognizer, clips[0][1], engine)
+        load_seconds = time.perf_counter() - started
+    else:
+        load_seconds = None
+
+    latencies, errors, failures = [], [], 0
+    for _ in range(iterations):
+        for entry, audio in clips:
+            started = time.perf_counter()
+            try:
+                text = stt.transcribe_audio(recognizer, audio, engine)
+            except Exception as e:
+                print(f"{engine} failed on {entry['file']}: {e}", file=sys.stderr)
+                failures += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors.append(word_error_rate(entry['text'], text))
+
+    # Everything at once, as when several sessions use voice search together
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clips)) as pool:
+        list(pool.map(lambda clip: _safe_transcribe(recognizer, clip[1], engine), clips))
+    burst_seconds = time.perf_counter() - started
+
+    return {
+        'engine': engine,
+        'clips': len(clips),
+        'failures': failures,
+        'model_load_s': round(load_seconds, 3) if load_seconds is not None else None,
+        'p50_ms': round(percentile(latencies, 50), 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 1) if latencies else None,
+        'wer': round(sum(errors) / len(errors), 4) if errors else None,
+        'burst_clips_per_s': round(len(clips) / burst_seconds, 2),
+    }
+
+
+def _safe_transcribe(recognizer, audio, engine):
+    from decibel import stt
+    try:
+        return stt.transcribe_audio(recognizer, audio, engine)
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare speech-to-text engines on recorded lyric clips")
+    parser.add_argument('--engines', nargs='+', help="Engines to compare (default: all available)")
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--record', action='store_true', help="Record missing clips from the microphone")
+    parser.add_argument('--synthesize', action='store_true', help="Chant missing clips with espeak-ng and exit")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="With --record or --synthesize, replace existing clips too")
+    parser.add_argument('-o', '--output', help="Write results JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    from decibel import stt
+    if not stt.available_engines():
+        print("Voice search needs SpeechRecognition: pip install SpeechRecognition", file=sys.stderr)
+        return 1
+    if args.record:
+        record_missing(args.overwrite)
+        return 0
+    if args.synthesize:
+        if not synthesize_missing(args.overwrite):
+            print("--synthesize needs espeak-ng (apt install espeak-ng, brew install espeak-ng)", file=sys.stderr)
+            return 1
+        return 0
+
+    clips, missing = load_clips()
+    if missing:
+        print(f"missing clips ({', '.join(missing)}); restore them from git, regenerate them "
+              "with --synthesize or record them with --record", file=sys.stderr)
+    if not clips:
+        return 1
+
+    results = {'scenarios': [bench_engine(engine, clips, args.iterations)
+                             for engine in args.engines or stt.available_engines()]}
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Local stand-in for lyrics-api.fly.dev, lrclib.net and Gemini, replaying fixtures
+
+Every request waits an injected latency (with jitter) and fails with a 503 at the
+configured error rate, so benchmarks can model slow or flaky upstreams offline.
+
+    python -m benchmarks.stub_server --port 8765 --latency-ms 120 --error-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _key(*parts):
+    return '|'.join(' '.join(str(p).lower().split()) for p in parts)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """Doesn't print a traceback when the client hung up first
+
+    Hedged and cancelled requests close their connections mid-response by design.
+    """
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Threaded HTTP server replaying the recorded provider and Gemini responses"""
+
+    def __init__(self, port=0, latency_ms=0, jitter_ms=0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lyrics_api = load_fixture('lyrics_api.json')
+        self.lrclib_get = load_fixture('lrclib_get.json')
+        self.lrclib_search = load_fixture('lrclib_search.json')
+        self.gemini = load_fixture('gemini.json')
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = _QuietHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _delay_and_maybe_fail(self):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms))
+            fail = self.random.random() < self.error_rate
+        time.sleep(delay / 1000)
+        return fail
+
+    def route(self, method, path, query, body):
+        """Return (status, payload) for a request"""
+        if method == 'GET' and path.startswith('/api/lyrics/'):
+            parts = [unquote(p) for p in path[len('/api/lyrics/'):].split('/')]
+            data = self.lyrics_api.get(_key(*parts)) if len(parts) == 2 else None
+            return (200, data) if data else (404, {'error': 'Lyrics not found'})
+        if method == 'GET' and path == '/api/get':
+            data = self.lrclib_get.get(_key(query.get('artist_name', ''), query.get('track_name', '')))
+            return (200, data) if data else (404, {'code': 404, 'name': 'TrackNotFound'})
+        if method == 'GET' and path == '/api/search':
+            return 200, self.lrclib_search.get(_key(query.get('q', '')), [])
+        if method == 'POST' and ':generateContent' in path:
+            snippet = body.get('snippet', '')
+            return 200, {'text': self.gemini.get(_key(snippet), '[]')}
+        return 404, {'error': 'not found'}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, method):
+                parts = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                if stub._delay_and_maybe_fail():
+                    status, payload = 503, {'error': 'injected failure'}
+                else:
+                    status, payload = stub.route(method, parts.path, query, body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recorded provider responses locally")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+    stub = StubServer(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"stub server on {stub.url}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""Decibel core: lyrics providers and lookup helpers shared by the UI"""
+import importlib.util
+
+
+def module_available(name):
+    """Whether an optional dependency is installed, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # ValueError: already imported without a spec, e.g. a stub in sys.modules
+        return False
@@ -0,0 +1,162 @@
+"""Shared asyncio event loop, async HTTP and the sync facade used by the Streamlit UI
+
+All async work runs on one background event loop per process. Streamlit script
+threads (and any other sync caller) submit coroutines with run_sync and block only
+their own thread, so many sessions' network waits overlap on the same loop.
+"""
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from decibel import http
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_host_slots = {}
+
+
+def get_loop():
+    """The process-wide event loop, started on a daemon thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='decibel-loop', daemon=True).start()
+        return _loop
+
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the shared loop and wait for its result"""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync called from the Decibel event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def submit(coro):
+    """Start a coroutine on the shared loop without waiting; returns a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_async(coro):
+    """Await a coroutine on the shared loop from a different event loop, such as a web server's"""
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
+
+
+def iter_sync(agen):
+    """Iterate an async generator from sync code, getting each item as the loop produces it"""
+    updates = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                updates.put((item, None))
+        except Exception as e:
+            updates.put((finished, e))
+        else:
+            updates.put((finished, None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            item, error = updates.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # The consumer stopped early: stop producing too
+        future.cancel()
+
+
+def _client_session():
+    """Shared aiohttp session with keep-alive connections, created on the loop"""
+    global _client
+    if _client is None or _client.closed:
+        connector = aiohttp.TCPConnector(limit=64, limit_per_host=http.DEFAULT_HOST_LIMIT, ttl_dns_cache=300)
+        _client = aiohttp.ClientSession(connector=connector, headers={'User-Agent': http.USER_AGENT})
+    return _client
+
+
+@atexit.register
+def _close_client_session(timeout=2):
+    """Close the shared session on its own loop at exit, so no "Unclosed client session" warning"""
+    if _client is None or _client.closed or _loop is None or not _loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_client.close(), _loop).result(timeout)
+    except Exception as e:
+        logger.debug("closing the HTTP session failed: %r", e)
+
+
+def _slots(host):
+    if host not in _host_slots:
+        _host_slots[host] = asyncio.Semaphore(http.HOST_LIMITS.get(host, http.DEFAULT_HOST_LIMIT))
+    return _host_slots[host]
+
+
+async def get_json(url, params=None, timeout=10, retries=2):
+    """GET url and return (status, parsed JSON or None)
+
+    Uses aiohttp when installed, with the same retry, backoff and per-host limits as
+    decibel.http; otherwise runs the pooled sync client in a worker thread. Failures
+    raise requests.RequestException either way.
+    """
+    if not AIOHTTP_AVAILABLE:
+        response = await asyncio.to_thread(http.get, url, params, timeout, retries)
+        return response.status_code, (response.json() if response.status_code == 200 else None)
+
+    deadline = time.monotonic() + timeout
+    host = urlsplit(url).hostname or ''
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"No response from {host} within {timeout}s")
+        status, data, retry_after, error = None, None, None, None
+        try:
+            async with _slots(host):
+                async with _client_session().get(
+                    url, params=params, timeout=aiohttp.ClientTimeout(total=remaining)
+                ) as response:
+                    status = response.status
+                    retry_after = response.headers.get('Retry-After')
+                    if status == 200:
+                        data = await response.json(content_type=None)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+
+        if error is None and status not in http.RETRY_STATUSES:
+            return status, data
+
+        delay = http.backoff_delay(attempt, retry_after)
+        if attempt >= retries or time.monotonic() + delay >= deadline:
+            if error is not None:
+                raise requests.ConnectionError(f"{host} unreachable: {error}") from error
+            return status, data
+        logger.info("retrying %s after %s (attempt %d, waiting %.2fs)",
+                    host, error or status, attempt + 1, delay)
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,168 @@
+"""Resolve lyrics for a whole list of (artist, title) pairs
+
+Results are appended to a JSONL file as each pair resolves, one line per pair, so an
+interrupted run picks up where it stopped: pairs already in the output are skipped.
+
+    python -m decibel.batch playlist.csv -o lyrics.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import queue
+import sys
+
+from decibel import aio
+from decibel.cache import normalize_key
+from decibel.lookup import lookup_lyrics_outcome_async
+
+ARTIST_COLUMNS = ('artist', 'artist_name', 'artistname', 'singer')
+TITLE_COLUMNS = ('title', 'song', 'track', 'track_name', 'trackname', 'name')
+
+
+def _pick(row, columns):
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    for column in columns:
+        if lowered.get(column):
+            return str(lowered[column]).strip()
+    return ''
+
+
+def parse_pairs(text, fmt):
+    """Parse CSV (with artist/title headers) or JSON (objects or [artist, title] lists)"""
+    if fmt == 'json':
+        items = json.loads(text)
+        pairs = []
+        for item in items:
+            if isinstance(item, dict):
+                pairs.append((_pick(item, ARTIST_COLUMNS), _pick(item, TITLE_COLUMNS)))
+            elif isinstance(item, (list, tuple)) and len(item) >= 2:
+                pairs.append((str(item[0]).strip(), str(item[1]).strip()))
+    else:
+        pairs = [(_pick(row, ARTIST_COLUMNS), _pick(row, TITLE_COLUMNS))
+                 for row in csv.DictReader(io.StringIO(text))]
+    return [(artist, title) for artist, title in pairs if artist and title]
+
+
+def read_pairs(path):
+    fmt = 'json' if path.lower().endswith('.json') else 'csv'
+    with open(path, encoding='utf-8-sig') as f:
+        return parse_pairs(f.read(), fmt)
+
+
+def completed_keys(output_path):
+    """Keys already resolved in a previous run; errored pairs are retried"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; the pair is simply fetched again
+                continue
+            if not record.get('error'):
+                done.add(normalize_key(record.get('artist'), record.get('title')))
+    return done
+
+
+async def run_batch_async(pairs, output_path, concurrency=8, progress=None):
+    """Resolve every unique pair, appending one JSON line per pair to output_path
+
+    progress(done, total, record) is called after each pair; record is None for pairs
+    skipped because an earlier run already resolved them.
+    """
+    unique = {}
+    for artist, title in pairs:
+        unique.setdefault(normalize_key(artist, title), (artist, title))
+
+    done_keys = completed_keys(output_path)
+    todo = [(key, pair) for key, pair in unique.items() if key not in done_keys]
+    total = len(unique)
+    done = total - len(todo)
+    summary = {'total': total, 'skipped': done, 'found': 0, 'missing': 0, 'errors': 0}
+    if progress and done:
+        progress(done, total, None)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(pair):
+        artist, title = pair
+        async with semaphore:
+            try:
+                result, outcome = await lookup_lyrics_outcome_async(artist, title)
+                if outcome == 'failed':
+                    # Not an answer: a provider timed out, errored or was skipped by its
+                    # circuit breaker, so the pair is retried on the next run
+                    return {'artist': artist, 'title': title, 'found': False, 'result': None,
+                            'error': "no provider answered; retried on the next run"}
+                return {'artist': artist, 'title': title, 'found': bool(result), 'result': result}
+            except Exception as e:
+                return {'artist': artist, 'title': title, 'found': False, 'result': None, 'error': str(e)}
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'a', encoding='utf-8') as out:
+        for next_done in asyncio.as_completed([resolve(pair) for _, pair in todo]):
+            record = await next_done
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            done += 1
+            if record.get('error'):
+                summary['errors'] += 1
+            elif record['found']:
+                summary['found'] += 1
+            else:
+                summary['missing'] += 1
+            if progress:
+                progress(done, total, record)
+    return summary
+
+
+def iter_batch(pairs, output_path, concurrency=8):
+    """Run a batch on the shared loop, yielding (done, total, record) as pairs resolve
+
+    The summary dict is the generator's return value.
+    """
+    updates = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        run_batch_async(pairs, output_path, concurrency, progress=lambda *u: updates.put(u)),
+        aio.get_loop()
+    )
+    try:
+        while not (future.done() and updates.empty()):
+            try:
+                yield updates.get(timeout=0.2)
+            except queue.Empty:
+                pass
+    finally:
+        if not future.done():
+            future.cancel()
+    return future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch lyrics for a CSV/JSON list of songs")
+    parser.add_argument('input', help="CSV with artist,title columns or a JSON list")
+    parser.add_argument('-o', '--output', default='lyrics.jsonl', help="JSONL file to append results to")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Lookups in flight at once")
+    args = parser.parse_args(argv)
+
+    pairs = read_pairs(args.input)
+    batch = iter_batch(pairs, args.output, args.concurrency)
+    try:
+        while True:
+            done, total, record = next(batch)
+            if record:
+                status = 'ok' if record['found'] else record.get('error') or 'not found'
+                print(f"[{done}/{total}] {record['artist']} - {record['title']}: {status}", file=sys.stderr)
+    except StopIteration as stop:
+        summary = stop.value
+    print(json.dumps(summary))
+    return 0 if not summary['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
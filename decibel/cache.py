@@ -0,0 +1,193 @@
+"""Two-tier cache: an in-process LRU in front of a SQLite table on disk"""
+import json
+import os
+import sqlite3
+import string
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv('DECIBEL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'decibel'))
+
+_PUNCTUATION = str.maketrans({c: ' ' for c in string.punctuation})
+
+
+def normalize_key(*parts):
+    """Build a cache key that ignores case, punctuation and extra whitespace"""
+    cleaned = []
+    for part in parts:
+        text = unicodedata.normalize('NFKC', str(part or '')).casefold()
+        cleaned.append(' '.join(text.translate(_PUNCTUATION).split()))
+    return '|'.join(cleaned)
+
+
+class PersistentCache:
+    """LRU memory tier backed by SQLite, with a TTL and size caps on both tiers
+
+    Values must be JSON serializable. The disk tier is shared by every process
+    pointing at the same cache directory, so it survives Streamlit reruns and restarts.
+    """
+
+    def __init__(self, name, ttl=7 * 24 * 3600, max_memory_items=512,
+                 max_disk_items=50000, path=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.path = path or os.path.join(CACHE_DIR, 'cache.sqlite3')
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn().execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" ('
+            'key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)'
+        )
+        self._conn().execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}_accessed" ON "{name}" (accessed_at)'
+        )
+
+    def _conn(self):
+        """One SQLite connection per thread, in WAL mode so readers don't block writers"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get(self, key, memory_only=False):
+        """Return the cached value for key, or None if missing or expired
+
+        With memory_only, only the in-process tier is checked (it never blocks) and a
+        miss there is not counted, so the caller can go on to a full get.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[0]
+                del self._memory[key]
+        if memory_only:
+            return None
+
+        try:
+            row = self._conn().execute(
+                f'SELECT value, expires_at FROM "{self.name}" WHERE key = ?', (key,)
+            ).fetchone()
+            if row and row[1] > now:
+                self._conn().execute(
+                    f'UPDATE "{self.name}" SET accessed_at = ? WHERE key = ?', (now, key)
+                )
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                return value
+        except sqlite3.Error:
+            pass
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def __contains__(self, key):
+        """Whether key has an unexpired value; unlike get, it leaves the stats and LRU order alone"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                return True
+        try:
+            return self._conn().execute(
+                f'SELECT 1 FROM "{self.name}" WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    def set(self, key, value, ttl=None):
+        """Store value under key in both tiers"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._remember(key, value, expires_at)
+        try:
+            self._conn().execute(
+                f'INSERT OR REPLACE INTO "{self.name}" VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), expires_at, now)
+            )
+        except sqlite3.Error:
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % 100 == 0
+        if should_prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired rows and evict least recently used rows above the disk cap"""
+        conn = self._conn()
+        try:
+            conn.execute(f'DELETE FROM "{self.name}" WHERE expires_at <= ?', (time.time(),))
+            excess = conn.execute(f'SELECT COUNT(*) FROM "{self.name}"').fetchone()[0] - self.max_disk_items
+            if excess > 0:
+                conn.execute(
+                    f'DELETE FROM "{self.name}" WHERE key IN ('
+                    f'SELECT key FROM "{self.name}" ORDER BY accessed_at LIMIT ?)', (excess,)
+                )
+                with self._lock:
+                    self.stats['evictions'] += excess
+        except sqlite3.Error:
+            pass
+
+    def recent_keys(self, limit):
+        """Most recently used keys on disk, newest first"""
+        try:
+            rows = self._conn().execute(
+                f'SELECT key FROM "{self.name}" WHERE expires_at > ? ORDER BY accessed_at DESC LIMIT ?',
+                (time.time(), limit)
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        return [row[0] for row in rows]
+
+    def clear(self):
+        """Empty both tiers"""
+        with self._lock:
+            self._memory.clear()
+        self._conn().execute(f'DELETE FROM "{self.name}"')
+
+    def hit_rate(self):
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, **kwargs):
+    """Return the process-wide cache called name, creating it on first use"""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = PersistentCache(name, **kwargs)
+        return _caches[name]
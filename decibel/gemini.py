@@ -0,0 +1,351 @@
+"""Gemini song identification from lyric snippets"""
+import asyncio
+import json
+import logging
+import time
+
+from decibel import aio, metrics, module_available
+from decibel.gemini_pool import generate
+from decibel.jsonstream import JSONArrayStream
+from decibel.semantic_cache import normalize_snippet, snippet_cache
+from decibel.singleflight import SingleFlight
+
+# The SDK is slow to import, so it is only loaded on the first identification
+GEMINI_AVAILABLE = module_available('google.generativeai')
+
+logger = logging.getLogger(__name__)
+
+# Concurrent identifications of the same normalized snippet share one Gemini call
+_identifications = SingleFlight()
+
+# Configure generation parameters for better results
+GENERATION_CONFIG = {
+    'temperature': 0.3,
+    'top_p': 0.8,
+    'top_k': 40,
+    'max_output_tokens': 2048,
+}
+
+# Shared by the single and batched prompts
+GUIDELINES = """ANALYSIS INSTRUCTIONS:
+1. Consider exact phrase matches first
+2. Look for distinctive phrases or memorable lines
+3. Consider phonetic similarities (the user might have misheard)
+4. Consider translations or alternate versions
+5. Include songs from all languages and regions
+6. Consider both popular hits and lesser-known tracks
+
+CONFIDENCE SCORING:
+- 90-100: Exact or near-exact lyric match
+- 70-89: Strong match with minor variations
+- 50-69: Partial match or similar phrasing
+- 30-49: Possible match based on keywords
+- Below 30: Low confidence match"""
+
+PROMPT_TEMPLATE = """You are an expert music librarian with extensive knowledge of songs across all genres, languages, and eras.
+
+A user has provided these lyrics or sung words:
+"{lyrics_text}"
+
+TASK: Identify the most likely songs that contain these lyrics.
+
+{guidelines}
+
+OUTPUT FORMAT (JSON ONLY):
+[
+  {{
+    "title": "Exact Song Title",
+    "artist": "Artist Name (or Multiple Artists if applicable)",
+    "album": "Album Name",
+    "year": "Release Year",
+    "language": "Language",
+    "confidence": 95,
+    "matching_phrase": "the specific phrase that matched",
+    "genre": "Genre"
+  }}
+]
+
+REQUIREMENTS:
+- Return TOP 8 matches, ordered by confidence (highest first)
+- Only include songs with confidence >= 30
+- If no matches found, return empty array: []
+- Provide accurate metadata (double-check artist spelling)
+- RESPOND WITH ONLY THE JSON ARRAY - NO OTHER TEXT
+
+Begin analysis:"""
+
+
+BATCH_PROMPT_TEMPLATE = """You are an expert music librarian with extensive knowledge of songs across all genres, languages, and eras.
+
+Users have provided several lyric snippets or sung words, each under its own ID:
+{snippets}
+
+TASK: For EACH snippet independently, identify the most likely songs that contain those lyrics.
+
+{guidelines}
+
+OUTPUT FORMAT (JSON ONLY): one key per snippet ID, each holding that snippet's matches
+{{
+  "s1": [
+    {{
+      "title": "Exact Song Title",
+      "artist": "Artist Name (or Multiple Artists if applicable)",
+      "album": "Album Name",
+      "year": "Release Year",
+      "language": "Language",
+      "confidence": 95,
+      "matching_phrase": "the specific phrase that matched",
+      "genre": "Genre"
+    }}
+  ]
+}}
+
+REQUIREMENTS:
+- Include EVERY snippet ID as a key, with an empty array [] if nothing matches
+- Return at most {matches} matches per snippet, ordered by confidence (highest first)
+- Only include songs with confidence >= 30
+- Provide accurate metadata (double-check artist spelling)
+- RESPOND WITH ONLY THE JSON OBJECT - NO OTHER TEXT
+
+Begin analysis:"""
+
+# Rough output size of one song object, used to size batches under max_output_tokens
+TOKENS_PER_MATCH = 80
+
+
+def build_prompt(lyrics_text):
+    return PROMPT_TEMPLATE.format(lyrics_text=lyrics_text, guidelines=GUIDELINES)
+
+
+def build_batch_prompt(snippets, matches):
+    """Prompt for several snippets at once; the instructions are sent once per batch"""
+    numbered = json.dumps({f's{i + 1}': text for i, text in enumerate(snippets)},
+                          ensure_ascii=False, indent=0)
+    return BATCH_PROMPT_TEMPLATE.format(snippets=numbered, guidelines=GUIDELINES, matches=matches)
+
+
+def clean_response_text(result_text):
+    """Strip markdown code fences Gemini sometimes wraps around its JSON"""
+    result_text = result_text.strip()
+    if result_text.startswith('```'):
+        lines = result_text.split('\n')
+        result_text = '\n'.join(lines[1:-1]) if len(lines) > 2 else result_text
+        result_text = result_text.replace('```json', '').replace('```', '').strip()
+    return result_text
+
+
+def rank_songs(songs):
+    """Drop low confidence matches and keep the top 8, best first"""
+    filtered_songs = [s for s in songs if isinstance(s, dict) and s.get('confidence', 0) >= 30]
+    filtered_songs.sort(key=lambda x: x.get('confidence', 0), reverse=True)
+    return filtered_songs[:8]
+
+
+def parse_songs(result_text):
+    """Parse Gemini's reply into a ranked song list; raises json.JSONDecodeError on bad JSON"""
+    with metrics.span('json_parse', mode='full'):
+        result_text = clean_response_text(result_text)
+        if not result_text.startswith('['):
+            return None
+        return rank_songs(json.loads(result_text)) or None
+
+
+async def _cached_songs(lyrics_text):
+    """The snippet cache's songs for lyrics_text, or None
+
+    SQLite reads and the near-duplicate scan block, so they run in a worker thread, as
+    does building the cache on first use.
+    """
+    return await asyncio.to_thread(lambda: snippet_cache().get(lyrics_text))
+
+
+async def _remember_songs(lyrics_text, songs):
+    await asyncio.to_thread(lambda: snippet_cache().set(lyrics_text, songs))
+
+
+async def identify_song_async(lyrics_text, api_key):
+    """Identify songs containing lyrics_text
+
+    Returns a ranked list of song dicts, or None when Gemini is unavailable or finds
+    nothing. Gemini and JSON errors propagate so the caller can report them.
+    """
+    if not GEMINI_AVAILABLE or not api_key:
+        return None
+
+    # Same or near-duplicate snippet identified recently: skip the LLM call
+    cached = await _cached_songs(lyrics_text)
+    if cached:
+        return cached
+
+    return await _identifications.do(normalize_snippet(lyrics_text),
+                                     lambda: _identify(lyrics_text, api_key))
+
+
+async def _identify(lyrics_text, api_key):
+    response = await generate(api_key, build_prompt(lyrics_text), GENERATION_CONFIG)
+    songs = parse_songs(response.text)
+    if songs:
+        await _remember_songs(lyrics_text, songs)
+    return songs
+
+
+async def identify_song_stream(lyrics_text, api_key):
+    """Yield songs one at a time while Gemini is still generating the rest
+
+    Each song object is parsed as soon as it is complete. If the reply is cut off or
+    malformed after some songs, those are kept; json.JSONDecodeError is raised only
+    when nothing usable arrived.
+    """
+    if not GEMINI_AVAILABLE or not api_key:
+        return
+
+    cached = await _cached_songs(lyrics_text)
+    if cached:
+        for song in cached:
+            yield song
+        return
+
+    # Someone is already identifying this snippet: wait for their result
+    key = normalize_snippet(lyrics_text)
+    flight, is_leader = _identifications.claim(key)
+    if not is_leader:
+        for song in await asyncio.shield(flight) or []:
+            yield song
+        return
+
+    songs = []
+    try:
+        async for song in _identify_stream(lyrics_text, api_key, songs):
+            yield song
+    except Exception as e:
+        _identifications.fail(key, e)
+        raise
+    finally:
+        # Followers get the songs that arrived, even if this stream was abandoned early
+        _identifications.resolve(key, rank_songs(songs) or None)
+
+
+async def _identify_stream(lyrics_text, api_key, songs):
+    """Stream songs from Gemini, appending each to songs as it is yielded"""
+    parser = JSONArrayStream()
+    parse_seconds = 0.0
+    try:
+        with metrics.span('gemini_stream'):
+            response = await generate(api_key, build_prompt(lyrics_text), GENERATION_CONFIG, stream=True)
+            try:
+                async for chunk in response:
+                    started = time.perf_counter()
+                    parsed = parser.feed(chunk.text)
+                    parse_seconds += time.perf_counter() - started
+                    for song in parsed:
+                        if isinstance(song, dict) and song.get('confidence', 0) >= 30 and len(songs) < 8:
+                            songs.append(song)
+                            yield song
+            finally:
+                # Frees the Gemini slot even when our reader stops early
+                response.close()
+    except Exception as e:
+        if not songs:
+            raise
+        logger.warning("Gemini stream ended early after %d songs: %s", len(songs), e)
+    finally:
+        # Parsing is spread over the chunks, so it is recorded as one total per reply
+        metrics.observe('json_parse', parse_seconds, mode='stream')
+
+    tail = parser.close()
+    if tail and parser.started:
+        if not songs:
+            raise json.JSONDecodeError("Unparseable Gemini reply", tail, 0)
+        logger.info("dropped unparseable tail of Gemini reply: %r", tail[:80])
+
+    if songs:
+        await _remember_songs(lyrics_text, rank_songs(songs))
+
+
+def identify_song(lyrics_text, api_key):
+    """Sync facade over identify_song_async"""
+    return aio.run_sync(identify_song_async(lyrics_text, api_key))
+
+
+def batch_size_for(max_output_tokens, matches):
+    """How many snippets fit in one reply of at most max_output_tokens"""
+    return max(1, (max_output_tokens - 50) // (matches * TOKENS_PER_MATCH + 10))
+
+
+async def _identify_batch(api_key, snippets, matches, generation_config):
+    """One Gemini call for a list of snippets; halves the batch if the reply is cut off or invalid"""
+    response = await generate(api_key, build_batch_prompt(snippets, matches), generation_config)
+    try:
+        with metrics.span('json_parse', mode='batch'):
+            result_text = clean_response_text(response.text)
+            by_id = json.loads(result_text) if result_text.startswith('{') else None
+            if not isinstance(by_id, dict):
+                raise json.JSONDecodeError("Expected a JSON object", result_text, 0)
+    except (json.JSONDecodeError, ValueError):
+        if len(snippets) == 1:
+            raise
+        middle = len(snippets) // 2
+        logger.info("splitting Gemini batch of %d snippets after an unusable reply", len(snippets))
+        first = await _identify_batch(api_key, snippets[:middle], matches, generation_config)
+        second = await _identify_batch(api_key, snippets[middle:], matches, generation_config)
+        return first + second
+
+    results = []
+    for i in range(len(snippets)):
+        songs = by_id.get(f's{i + 1}')
+        results.append(rank_songs(songs)[:matches] if isinstance(songs, list) else [])
+    return results
+
+
+async def identify_songs_batch_async(snippets, api_key, matches=3, max_output_tokens=8192, concurrency=2):
+    """Identify many snippets with as few Gemini calls as possible
+
+    Snippets are packed into batches sized to fit max_output_tokens and each batch
+    is one request. Returns {snippet: ranked song list or None}; cached snippets and
+    duplicates never reach Gemini.
+    """
+    results = {snippet: None for snippet in snippets}
+    if not GEMINI_AVAILABLE or not api_key:
+        return results
+
+    def lookup_cached():
+        return [snippet_cache().get(snippet) for snippet in results]
+
+    pending = []
+    for snippet, cached in zip(list(results), await asyncio.to_thread(lookup_cached)):
+        if cached:
+            results[snippet] = cached[:matches]
+        else:
+            pending.append(snippet)
+    if not pending:
+        return results
+
+    generation_config = dict(GENERATION_CONFIG, max_output_tokens=max_output_tokens)
+    size = batch_size_for(max_output_tokens, matches)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch):
+        async with semaphore:
+            try:
+                return batch, await _identify_batch(api_key, batch, matches, generation_config)
+            except Exception as e:
+                logger.warning("Gemini batch of %d snippets failed: %s", len(batch), e)
+                return batch, [None] * len(batch)
+
+    batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+    for batch, songs_per_snippet in await asyncio.gather(*(run(b) for b in batches)):
+        for snippet, songs in zip(batch, songs_per_snippet):
+            results[snippet] = songs or None
+
+    def remember():
+        for snippet in pending:
+            if results[snippet]:
+                snippet_cache().set(snippet, results[snippet])
+
+    await asyncio.to_thread(remember)
+    return results
+
+
+def identify_songs_batch(snippets, api_key, matches=3, max_output_tokens=8192):
+    """Sync facade over identify_songs_batch_async"""
+    return aio.run_sync(identify_songs_batch_async(snippets, api_key, matches, max_output_tokens))
@@ -0,0 +1,239 @@
+"""Shared Gemini model clients with concurrency and rate limits
+
+One client per (api key, model) per process. Each client allows a fixed number of
+requests in flight and refills a token bucket at the quota's requests-per-minute,
+so callers queue for a slot instead of tripping 429s. When the primary model stays
+saturated or is rate limited, requests overflow to the fallback model if one is set.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from decibel import metrics
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv('DECIBEL_GEMINI_MODEL', 'gemini-2.0-flash-exp')
+FALLBACK_MODEL_NAME = os.getenv('DECIBEL_GEMINI_FALLBACK_MODEL', '')
+MAX_CONCURRENT = int(os.getenv('DECIBEL_GEMINI_CONCURRENCY', 4))
+REQUESTS_PER_MINUTE = float(os.getenv('DECIBEL_GEMINI_RPM', 60))
+QUEUE_TIMEOUT = float(os.getenv('DECIBEL_GEMINI_QUEUE_TIMEOUT', 20))
+
+
+class GeminiBusyError(Exception):
+    """No Gemini slot became free within the queue timeout"""
+
+
+class TokenBucket:
+    """Allows rate requests per minute on average, with bursts up to capacity"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline):
+        """Wait for a token until deadline (a time.monotonic() value); False if none came"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class ModelClient:
+    """A configured GenerativeModel plus the limits guarding it"""
+
+    def __init__(self, model_name, model):
+        self.model_name = model_name
+        self.model = model
+        self.slots = asyncio.Semaphore(MAX_CONCURRENT)
+        self.bucket = TokenBucket(REQUESTS_PER_MINUTE)
+        self.waiting = 0
+
+    async def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        self.waiting += 1
+        try:
+            if not await self.bucket.acquire(deadline):
+                return False
+            try:
+                await asyncio.wait_for(self.slots.acquire(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                return False
+            return True
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.slots.release()
+
+
+_configured_key = None
+_configure_lock = threading.Lock()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _configure(genai, api_key):
+    global _configured_key
+    with _configure_lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+
+
+def _build_model(api_key, model_name):
+    import google.generativeai as genai
+    # The SDK keeps its API key in global state; one key per process is the norm,
+    # so this only reconfigures when a different key shows up
+    _configure(genai, api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def get_client(api_key, model_name=None):
+    """The process-wide client for (api_key, model_name)"""
+    key = (api_key, model_name or MODEL_NAME)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = ModelClient(key[1], _build_model(*key))
+        return _clients[key]
+
+
+async def get_client_async(api_key, model_name=None):
+    """get_client for the event loop
+
+    Building a client imports the SDK and configures it, which blocks, so the first
+    call for a key runs in a worker thread.
+    """
+    client = _clients.get((api_key, model_name or MODEL_NAME))
+    if client is None:
+        client = await asyncio.to_thread(get_client, api_key, model_name)
+    return client
+
+
+def register_model(api_key, model_name, model):
+    """Serve (api_key, model_name) with a ready-made model object, such as a replay stub
+
+    The object needs an async generate_content_async(prompt, generation_config, stream)
+    like GenerativeModel's. The usual limits still apply.
+    """
+    with _clients_lock:
+        _clients[(api_key, model_name)] = ModelClient(model_name, model)
+
+
+def _is_rate_limited(error):
+    return type(error).__name__ in ('ResourceExhausted', 'TooManyRequests') or getattr(error, 'code', None) == 429
+
+
+class PooledStream:
+    """A streamed reply that holds its model's slot until it is read to the end or closed
+
+    The first chunk has already arrived when the stream is handed out, so a 429 at the
+    start of the stream was retried like any other; errors after that reach the reader.
+    """
+
+    def __init__(self, client, first, chunks):
+        self._client = client
+        self._first = first
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._read()
+
+    async def _read(self):
+        try:
+            if self._client is None:
+                return
+            yield self._first
+            while True:
+                try:
+                    chunk = await self._chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        """Give the slot back; safe to call more than once"""
+        client, self._client = self._client, None
+        if client is not None:
+            client.release()
+
+
+async def generate(api_key, prompt, generation_config, stream=False, model_name=None,
+                   timeout=QUEUE_TIMEOUT, retries=2):
+    """generate_content_async through the pool, queueing for a slot under the limits
+
+    Raises GeminiBusyError when no slot frees up within timeout on the primary or
+    fallback model. A 429 from Gemini is retried after a backoff, preferring the
+    fallback model when it is configured. A streamed reply comes back as a
+    PooledStream, which keeps the slot until it is exhausted or closed.
+    """
+    model_name = model_name or MODEL_NAME
+    candidates = [model_name]
+    if FALLBACK_MODEL_NAME and FALLBACK_MODEL_NAME != model_name:
+        candidates.append(FALLBACK_MODEL_NAME)
+
+    for attempt in range(retries + 1):
+        client = None
+        with metrics.span('gemini_queue') as span:
+            for i, name in enumerate(candidates):
+                candidate = await get_client_async(api_key, name)
+                # Only wait on the last candidate; earlier ones are tried if a slot is free now
+                is_last = i == len(candidates) - 1
+                if await candidate.acquire(timeout if is_last else 0.05):
+                    client = candidate
+                    break
+            if client is None:
+                span.outcome = 'busy'
+        if client is None:
+            raise GeminiBusyError("Gemini is busy right now. Please try again in a moment.")
+
+        handed_off = False
+        try:
+            # For streamed replies this is the time to the first chunk
+            with metrics.span('gemini_generate', model=client.model_name, stream=stream) as span:
+                try:
+                    response = await client.model.generate_content_async(
+                        prompt, generation_config=generation_config, stream=stream
+                    )
+                    if not stream:
+                        return response
+                    # Rate limits on a stream often surface with the first chunk
+                    chunks = response.__aiter__()
+                    try:
+                        first = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        return PooledStream(None, None, None)
+                    handed_off = True
+                    return PooledStream(client, first, chunks)
+                except Exception as e:
+                    if _is_rate_limited(e):
+                        span.outcome = 'rate_limited'
+                    raise
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt == retries:
+                raise
+            logger.info("Gemini %s rate limited, retrying (attempt %d)", client.model_name, attempt + 1)
+            if len(candidates) > 1 and client.model_name == candidates[0]:
+                # Send the retry straight to the fallback
+                candidates = candidates[1:]
+            else:
+                await asyncio.sleep(2 ** attempt)
+        finally:
+            if not handed_off:
+                client.release()
@@ -0,0 +1,94 @@
+"""Process-wide pooled HTTP client used by every provider call"""
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = 'Decibel (https://github.com/naakaarafr/Decibel)'
+DEFAULT_HOST_LIMIT = 8
+# Concurrent requests allowed per host, to stay under the public APIs' rate limits
+HOST_LIMITS = {
+    'lrclib.net': 8,
+    'lyrics-api.fly.dev': 8,
+}
+
+
+class HostBusyError(requests.RequestException):
+    """Raised when a host's concurrency limit stays saturated until the deadline"""
+
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+
+
+def session():
+    """The shared keep-alive session; connections are reused across calls and threads"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _session.headers['User-Agent'] = USER_AGENT
+        return _session
+
+
+def _slots(host):
+    with _session_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        return _host_slots[host]
+
+
+def backoff_delay(attempt, retry_after=None, base=0.25, cap=4.0):
+    """Full-jitter exponential backoff, or the server's Retry-After when it sends one"""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), cap)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get(url, params=None, timeout=10, retries=2):
+    """GET through the shared pool, retrying 429/5xx and connection errors
+
+    timeout is the overall deadline for the call including retries and waiting for a
+    free per-host slot. The last response is returned even if it is still an error
+    status; network failures after the final attempt raise requests.RequestException.
+    """
+    deadline = time.monotonic() + timeout
+    host = urlsplit(url).hostname or ''
+    slots = _slots(host)
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not slots.acquire(timeout=remaining):
+            raise HostBusyError(f"No free connection slot for {host} within {timeout}s")
+        response, error = None, None
+        try:
+            response = session().get(url, params=params, timeout=max(deadline - time.monotonic(), 0.1))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        finally:
+            slots.release()
+
+        if error is None and response.status_code not in RETRY_STATUSES:
+            return response
+
+        delay = backoff_delay(attempt, response.headers.get('Retry-After') if response is not None else None)
+        if attempt >= retries or time.monotonic() + delay >= deadline:
+            if error is not None:
+                raise error
+            return response
+        logger.info("retrying %s after %s (attempt %d, waiting %.2fs)",
+                    host, error or response.status_code, attempt + 1, delay)
+        time.sleep(delay)
+        attempt += 1
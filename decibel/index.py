@@ -0,0 +1,290 @@
+"""Local full-text index over every lyric body Decibel has fetched
+
+Backed by SQLite FTS5 tables (inverted indexes with BM25 ranking): one over whole
+lyric bodies for exact word matches, and one over the phonetic keys of every line
+for misheard or voice-recognized snippets. The database
+file is opened with mmap enabled and in WAL mode, so several worker processes can
+read it concurrently while another one appends new songs.
+"""
+import os
+import sqlite3
+import threading
+
+from decibel.cache import CACHE_DIR, normalize_key
+from decibel.phonetic import encode, similarity, trigrams
+from decibel.query import INDIC_MARKS, tokenize
+
+INDEX_PATH = os.getenv('DECIBEL_INDEX_PATH', os.path.join(CACHE_DIR, 'index.sqlite3'))
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Indic vowel signs are token characters, so Hindi words are indexed whole
+_TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{INDIC_MARKS}'"
+
+
+def _phonetic_grams(codes, unigrams=False):
+    """Adjacent pairs of phonetic keys; pairs are far more selective than single keys"""
+    grams = [a + 'x' + b for a, b in zip(codes, codes[1:])]
+    return (codes + grams) if unigrams else (grams or codes)
+
+
+def _match_expr(tokens, operator):
+    # Quote every token so words like "and"/"or"/"near" are never parsed as FTS syntax
+    return f' {operator} '.join('"' + t.replace('"', '""') + '"' for t in tokens)
+
+
+class LyricsIndex:
+    """Incrementally updatable BM25 index of (artist, title) -> lyrics"""
+
+    def __init__(self, path=None):
+        self.path = path or INDEX_PATH
+        self._local = threading.local()
+        self._known = set()
+        self._lock = threading.Lock()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS docs ('
+            'id INTEGER PRIMARY KEY, key TEXT UNIQUE, title TEXT, artist TEXT, source TEXT)'
+        )
+        self._retokenize()
+        conn.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS lyrics_fts USING fts5(body, tokenize="{_TOKENIZER}")'
+        )
+        # Per-term document counts, for IDF-weighted query keywords
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS lyrics_vocab USING fts5vocab(lyrics_fts, 'row')")
+        has_lines = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'lines'"
+        ).fetchone()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS lines ('
+            'id INTEGER PRIMARY KEY, doc_id INTEGER, text TEXT, codes TEXT)'
+        )
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS phonetic_fts USING fts5(grams, content='')"
+        )
+        if not has_lines:
+            self._index_existing_lines()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+            self._local.conn = conn
+        return conn
+
+    def _retokenize(self):
+        """Rebuild a lyrics table made with the old tokenizer, which split Hindi words apart"""
+        conn = self._conn()
+        query = "SELECT sql FROM sqlite_master WHERE name = 'lyrics_fts'"
+        row = conn.execute(query).fetchone()
+        if not row or 'tokenchars' in row[0]:
+            return
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Another process may have rebuilt it while we waited for the lock
+            row = conn.execute(query).fetchone()
+            if 'tokenchars' not in row[0]:
+                conn.execute(
+                    f'CREATE VIRTUAL TABLE lyrics_fts_new USING fts5(body, tokenize="{_TOKENIZER}")'
+                )
+                conn.execute('INSERT INTO lyrics_fts_new (rowid, body) SELECT rowid, body FROM lyrics_fts')
+                conn.execute('DROP TABLE lyrics_fts')
+                conn.execute('ALTER TABLE lyrics_fts_new RENAME TO lyrics_fts')
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+
+    def _add_lines(self, conn, doc_id, lyrics):
+        for line in lyrics.splitlines():
+            codes = encode(line)
+            if not codes:
+                continue
+            cursor = conn.execute('INSERT INTO lines (doc_id, text, codes) VALUES (?, ?, ?)',
+                                  (doc_id, line.strip(), ' '.join(codes)))
+            conn.execute('INSERT INTO phonetic_fts (rowid, grams) VALUES (?, ?)',
+                         (cursor.lastrowid, ' '.join(_phonetic_grams(codes, unigrams=True))))
+
+    def _index_existing_lines(self):
+        """Build the phonetic line index for songs indexed before it existed"""
+        conn = self._conn()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for doc_id, body in conn.execute('SELECT rowid, body FROM lyrics_fts').fetchall():
+                self._add_lines(conn, doc_id, body)
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+
+    def add(self, result):
+        """Index a lyrics result dict (title, artist, lyrics, source); no-op if already indexed"""
+        if not result or not result.get('lyrics'):
+            return
+        key = normalize_key(result.get('artist'), result.get('title'))
+        with self._lock:
+            if key in self._known:
+                return
+        conn = self._conn()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            exists = conn.execute('SELECT 1 FROM docs WHERE key = ?', (key,)).fetchone()
+            if not exists:
+                cursor = conn.execute(
+                    'INSERT INTO docs (key, title, artist, source) VALUES (?, ?, ?, ?)',
+                    (key, result.get('title', ''), result.get('artist', ''), result.get('source', ''))
+                )
+                conn.execute('INSERT INTO lyrics_fts (rowid, body) VALUES (?, ?)',
+                             (cursor.lastrowid, result['lyrics']))
+                self._add_lines(conn, cursor.lastrowid, result['lyrics'])
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            return
+        with self._lock:
+            self._known.add(key)
+
+    def search(self, snippet, limit=8, min_coverage=0.6):
+        """Rank indexed songs against a lyric snippet
+
+        Songs containing every query word come first; otherwise songs must contain at
+        least min_coverage of the distinct words to count as candidates. 'phrase' is
+        True for songs that contain the snippet's words as one run, in order.
+        """
+        words = tokenize(snippet)
+        tokens = list(dict.fromkeys(words))
+        if not tokens:
+            return []
+
+        conn = self._conn()
+        query = (
+            'SELECT d.id, d.title, d.artist, d.source, bm25(lyrics_fts) AS score, lyrics_fts.body '
+            'FROM lyrics_fts JOIN docs d ON d.id = lyrics_fts.rowid '
+            'WHERE lyrics_fts MATCH ? ORDER BY score LIMIT ?'
+        )
+        try:
+            rows = conn.execute(query, (_match_expr(tokens, 'AND'), limit)).fetchall()
+            if not rows:
+                rows = conn.execute(query, (_match_expr(tokens, 'OR'), limit * 4)).fetchall()
+            # A phrase query matches adjacent tokens in order, as the index split them
+            phrase_ids = {row[0] for row in conn.execute(
+                f'SELECT rowid FROM lyrics_fts WHERE lyrics_fts MATCH ? '
+                f'AND rowid IN ({",".join("?" * len(rows))})',
+                ['"' + ' '.join(words) + '"'] + [row[0] for row in rows]
+            )} if rows else set()
+        except sqlite3.Error:
+            return []
+
+        results = []
+        for doc_id, title, artist, source, score, body in rows:
+            body_tokens = set(tokenize(body))
+            coverage = sum(1 for t in tokens if t in body_tokens) / len(tokens)
+            if coverage < min_coverage:
+                continue
+            results.append({
+                'title': title,
+                'artist': artist,
+                'album': '',
+                'confidence': int(round(coverage * 100)),
+                'source': 'local_index',
+                'lyrics_source': source,
+                'bm25': -score,
+                'phrase': doc_id in phrase_ids,
+            })
+        results.sort(key=lambda r: (r['phrase'], r['confidence'], r['bm25']), reverse=True)
+        return results[:limit]
+
+    def fuzzy_search(self, snippet, limit=8, candidates=200, min_score=0.5):
+        """Rank songs by how well their lines sound like the snippet
+
+        Candidate lines come from the phonetic inverted index, so only a few hundred
+        lines are scored however large the corpus is. Each candidate is scored on its
+        own and joined with the following line, since a sung phrase often spans two;
+        'matching_phrase' is whichever of the two scored better.
+        """
+        query_codes = encode(snippet)
+        if not query_codes:
+            return []
+        query_trigrams = trigrams(snippet)
+
+        conn = self._conn()
+        try:
+            rows = conn.execute(
+                'SELECT l.doc_id, l.text, l.codes, n.text, n.codes '
+                'FROM phonetic_fts JOIN lines l ON l.id = phonetic_fts.rowid '
+                'LEFT JOIN lines n ON n.id = l.id + 1 AND n.doc_id = l.doc_id '
+                'WHERE phonetic_fts MATCH ? ORDER BY bm25(phonetic_fts) LIMIT ?',
+                (_match_expr(list(dict.fromkeys(_phonetic_grams(query_codes))), 'OR'), candidates)
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+
+        best = {}
+        for doc_id, text, codes, next_text, next_codes in rows:
+            score = similarity(query_codes, query_trigrams, codes.split(), text)
+            if next_text is not None:
+                joined = similarity(query_codes, query_trigrams,
+                                    (codes + ' ' + next_codes).split(), text + ' ' + next_text)
+                if joined > score:
+                    score, text = joined, text + ' ' + next_text
+            if score > best.get(doc_id, (0.0, ''))[0]:
+                best[doc_id] = (score, text)
+
+        ranked = sorted(((s, t, d) for d, (s, t) in best.items() if s >= min_score), reverse=True)[:limit]
+        if not ranked:
+            return []
+        placeholders = ','.join('?' * len(ranked))
+        docs = {
+            row[0]: row[1:] for row in conn.execute(
+                f'SELECT id, title, artist, source FROM docs WHERE id IN ({placeholders})',
+                [d for _, _, d in ranked]
+            )
+        }
+        return [{
+            'title': docs[d][0],
+            'artist': docs[d][1],
+            'album': '',
+            'confidence': int(round(score * 100)),
+            'matching_phrase': text,
+            'source': 'local_index',
+            'lyrics_source': docs[d][2],
+        } for score, text, d in ranked if d in docs]
+
+    def document_frequencies(self, terms):
+        """(indexed song count, {term: songs containing it}) for the given index terms"""
+        terms = list(dict.fromkeys(terms))
+        if not terms:
+            return 0, {}
+        conn = self._conn()
+        try:
+            total = conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+            rows = conn.execute(
+                f'SELECT term, doc FROM lyrics_vocab WHERE term IN ({",".join("?" * len(terms))})', terms
+            ).fetchall()
+        except sqlite3.Error:
+            return 0, {}
+        return total, dict(rows)
+
+    def __len__(self):
+        try:
+            return self._conn().execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def lyrics_index():
+    """Process-wide lyrics index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LyricsIndex()
+        return _index
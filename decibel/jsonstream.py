@@ -0,0 +1,72 @@
+"""Incremental parser for a JSON array that arrives in chunks"""
+import json
+
+_WHITESPACE = ' \t\r\n'
+
+
+class JSONArrayStream:
+    """Yield each element of a top-level JSON array as soon as it is complete
+
+    Anything before the opening '[' (such as a ```json fence) is ignored. Elements
+    parsed before a truncated or malformed tail are kept; close() reports the tail.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = None  # index just past '[' once the array has started
+        self.finished = False
+
+    def feed(self, chunk):
+        """Add text and return the elements it completed"""
+        if self.finished or not chunk:
+            return []
+        self._buffer += chunk
+        if self._pos is None:
+            start = self._buffer.find('[')
+            if start < 0:
+                return []
+            self._pos = start + 1
+
+        items = []
+        buffer = self._buffer
+        while True:
+            pos = self._pos
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or buffer[pos] == ','):
+                pos += 1
+            self._pos = pos
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                self.finished = True
+                self._pos = pos + 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete element (or a malformed one); wait for more text
+                break
+            if end >= len(buffer) and not isinstance(item, (dict, list)):
+                # A number or literal could still be growing: "12" may become "123"
+                break
+            items.append(item)
+            self._pos = end
+
+        # Drop consumed text so long streams don't re-scan it
+        if self._pos > 4096:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        return items
+
+    @property
+    def started(self):
+        return self._pos is not None
+
+    def close(self):
+        """Finish the stream, returning unparsed trailing text ('' if the array was complete)"""
+        if self._pos is None:
+            return self._buffer.strip()
+        tail = self._buffer[self._pos:].strip()
+        if self.finished:
+            return ''
+        return tail or ']'
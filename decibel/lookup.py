@@ -0,0 +1,106 @@
+"""Cached lyrics lookup shared by every entry point"""
+import asyncio
+import os
+
+from decibel import aio, metrics
+from decibel.cache import get_cache, normalize_key
+from decibel.index import lyrics_index
+from decibel.providers import LRCLIB, fetch_provider_async, race_providers_async
+from decibel.singleflight import SingleFlight
+from decibel.store import resolve, to_ref
+from decibel.synced import SyncedLyrics
+
+LYRICS_TTL = int(os.getenv('DECIBEL_LYRICS_TTL', 30 * 24 * 3600))
+
+
+# Concurrent lookups of the same song share one provider race
+_lookups = SingleFlight()
+
+
+def lyrics_cache():
+    return get_cache('lyrics', ttl=LYRICS_TTL, max_memory_items=1024, max_disk_items=200000)
+
+
+def _cached(key):
+    return resolve(lyrics_cache().get(key))
+
+
+def _remember(key, result):
+    # The cache keeps only a reference; the body goes to the deduplicated lyrics store
+    lyrics_cache().set(key, to_ref(result))
+    # Every body we fetch makes later snippet searches answerable offline
+    lyrics_index().add(result)
+
+
+async def lookup_lyrics_async(artist, song):
+    """Return lyrics for (artist, song), from cache when possible"""
+    result, _ = await lookup_lyrics_outcome_async(artist, song)
+    return result
+
+
+async def lookup_lyrics_outcome_async(artist, song):
+    """(lyrics or None, outcome) for (artist, song)
+
+    outcome is 'hit' when lyrics were found, 'miss' when every provider answered that it
+    has none, and 'failed' when a provider timed out, errored or was skipped, so there
+    may be lyrics after all.
+    """
+    key = normalize_key(artist, song)
+    with metrics.span('lookup') as span:
+        # Only the memory tiers are read on the shared event loop; SQLite and the store's
+        # mmap can block, so they are read in a worker thread
+        result = resolve(lyrics_cache().get(key, memory_only=True), memory_only=True)
+        if not result:
+            result = await asyncio.to_thread(_cached, key)
+        if result:
+            span.outcome = 'hit'
+            return result, 'hit'
+
+        span.outcome = 'miss'
+        return await _lookups.do(key, lambda: _fetch(artist, song, key))
+
+
+async def _fetch(artist, song, key):
+    outcomes = []
+    result = await race_providers_async(artist, song, outcomes=outcomes)
+    if result:
+        await asyncio.to_thread(_remember, key, result)
+        return result, 'hit'
+    missed = outcomes and all(outcome == 'miss' for _, outcome in outcomes)
+    return None, 'miss' if missed else 'failed'
+
+
+async def lookup_synced_async(artist, song):
+    """Timestamped lyrics for (artist, song) as SyncedLyrics, or None if there are none
+
+    Only lrclib.net has timestamps. When the cached lyrics came from another provider,
+    lrclib.net is asked once and the answer (even "none") is kept with the lyrics.
+    """
+    key = normalize_key(artist, song)
+    result = await lookup_lyrics_async(artist, song)
+    if result is None:
+        return None
+    if 'synced' not in result:
+        result = await _lookups.do(('synced', key), lambda: _fetch_synced(artist, song, key, result))
+    return SyncedLyrics.decode(result['synced']) if result.get('synced') else None
+
+
+async def _fetch_synced(artist, song, key, result):
+    outcomes = []
+    lrclib = await fetch_provider_async(LRCLIB, artist, song, outcomes)
+    if not outcomes or outcomes[0][1] not in ('hit', 'miss'):
+        # lrclib.net is down or slow: no timestamps this time, but ask again next time
+        return dict(result, synced='')
+    result = dict(result, synced=(lrclib or {}).get('synced', ''))
+    await asyncio.to_thread(lambda: lyrics_cache().set(key, to_ref(result)))
+    return result
+
+
+def lookup_synced(artist, song):
+    """Sync facade over lookup_synced_async"""
+    return aio.run_sync(lookup_synced_async(artist, song))
+
+
+def lookup_lyrics(artist, song):
+    """Sync facade over lookup_lyrics_async"""
+    return aio.run_sync(lookup_lyrics_async(artist, song))
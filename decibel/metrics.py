@@ -0,0 +1,176 @@
+"""Per-stage latency spans, Prometheus-style export and an optional trace log
+
+Every stage of a lookup or search (provider calls, Gemini, JSON parsing, local and
+fallback searches, voice capture and recognition) is timed with span(). Each
+(stage, labels) pair keeps a latency histogram, outcome counters and a window of
+recent durations for live percentiles. render() produces the Prometheus text format;
+setting DECIBEL_TRACE_LOG appends every finished span to that file as a JSON line.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACE_LOG = os.getenv('DECIBEL_TRACE_LOG', '')
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Durations kept per series for the live percentiles
+RECENT_SAMPLES = 512
+
+
+class Series:
+    """Latency histogram, outcome counts and recent samples for one (stage, labels)"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.outcomes = Counter()
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds, outcome):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.outcomes[outcome] += 1
+        self.recent.append(seconds)
+
+
+class Span:
+    """A running span; set outcome to record something other than 'ok'"""
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.outcome = 'ok'
+        self.started = time.perf_counter()
+
+
+_series = {}
+_lock = threading.Lock()
+_trace_lock = threading.Lock()
+
+
+def observe(stage, seconds, outcome='ok', **labels):
+    """Record one finished stage that was timed elsewhere"""
+    key = (stage, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = Series()
+        series.observe(seconds, outcome)
+    if TRACE_LOG:
+        _trace(stage, labels, seconds, outcome)
+
+
+def _trace(stage, labels, seconds, outcome):
+    line = json.dumps({'ts': round(time.time(), 3), 'stage': stage, 'labels': labels,
+                       'ms': round(seconds * 1000, 2), 'outcome': outcome}, ensure_ascii=False)
+    try:
+        with _trace_lock, open(TRACE_LOG, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.warning("could not write trace log %s: %s", TRACE_LOG, e)
+
+
+def _failure(error):
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return 'cancelled'
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return 'timeout'
+    return 'error'
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time the enclosed block as one occurrence of stage
+
+    An exception is recorded as 'error', 'timeout' or 'cancelled' unless the block
+    already set a more specific outcome, and is re-raised. Works the same in sync
+    code, coroutines and async generators.
+    """
+    current = Span(stage, labels)
+    try:
+        yield current
+    except BaseException as e:
+        if current.outcome == 'ok':
+            current.outcome = _failure(e)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - current.started, current.outcome, **labels)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def summary(stage=None):
+    """Per-series calls, hit rate and recent p50/p95/p99 in ms, for display"""
+    with _lock:
+        items = [(key, series.count, dict(series.outcomes), sorted(series.recent))
+                 for key, series in _series.items() if stage is None or key[0] == stage]
+    rows = []
+    for (name, labels), count, outcomes, recent in sorted(items):
+        judged = outcomes.get('hit', 0) + outcomes.get('miss', 0)
+        rows.append({
+            'stage': name,
+            'labels': ', '.join(f'{k}={v}' for k, v in labels),
+            'calls': count,
+            'hit_rate': outcomes.get('hit', 0) / count if judged else None,
+            'errors': sum(n for outcome, n in outcomes.items() if outcome in ('error', 'timeout')),
+            'p50_ms': _percentile(recent, 50) * 1000 if recent else None,
+            'p95_ms': _percentile(recent, 95) * 1000 if recent else None,
+            'p99_ms': _percentile(recent, 99) * 1000 if recent else None,
+        })
+    return rows
+
+
+def _label_text(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """All series in the Prometheus text exposition format"""
+    with _lock:
+        snapshot = [(key, list(s.buckets), s.count, s.sum, dict(s.outcomes))
+                    for key, s in sorted(_series.items())]
+
+    lines = ['# HELP decibel_stage_seconds Time spent in each lookup and search stage',
+             '# TYPE decibel_stage_seconds histogram']
+    for (stage, labels), buckets, count, total, _ in snapshot:
+        labels = (('stage', stage),) + labels
+        cumulative = 0
+        for bound, n in zip(BUCKETS, buckets):
+            cumulative += n
+            lines.append(f'decibel_stage_seconds_bucket{_label_text(labels, le=bound)} {cumulative}')
+        lines.append(f'decibel_stage_seconds_bucket{_label_text(labels, le="+Inf")} {count}')
+        lines.append(f'decibel_stage_seconds_sum{_label_text(labels)} {total:.6f}')
+        lines.append(f'decibel_stage_seconds_count{_label_text(labels)} {count}')
+
+    lines += ['# HELP decibel_stage_total Stage runs by outcome',
+              '# TYPE decibel_stage_total counter']
+    for (stage, labels), _, _, _, outcomes in snapshot:
+        labels = (('stage', stage),) + labels
+        for outcome, n in sorted(outcomes.items()):
+            lines.append(f'decibel_stage_total{_label_text(labels, outcome=outcome)} {n}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _series.clear()
@@ -0,0 +1,81 @@
+"""Phonetic encoding and fuzzy similarity for misheard or voice-recognized lyrics"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+# Romanized lyrics spell the same sound many ways ("bandhu"/"bandu", "phir"/"fir")
+_DIGRAPHS = [
+    ('ph', 'f'), ('bh', 'b'), ('dh', 'd'), ('th', 't'), ('kh', 'k'), ('gh', 'g'),
+    ('jh', 'j'), ('ch', 'c'), ('sh', 's'), ('ck', 'k'), ('wh', 'w'), ('qu', 'k'),
+]
+
+# Silent leading letters, as in Metaphone
+_SILENT_PREFIXES = [('kn', 'n'), ('gn', 'n'), ('wr', 'r'), ('ps', 's'), ('pn', 'n')]
+
+# Soundex-style consonant classes; vowels, h, w and y carry no code
+_CLASSES = {}
+for _letters, _code in [('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'),
+                        ('l', '4'), ('mn', '5'), ('r', '6')]:
+    for _letter in _letters:
+        _CLASSES[_letter] = _code
+
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+
+def _ascii_fold(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+def phonetic_key(word):
+    """Encode a word so that spellings which sound alike share a key
+
+    The first sound is kept as a letter (all vowels become 'a'), the rest is the
+    sequence of consonant classes with repeats collapsed and no length limit.
+    """
+    word = _ascii_fold(word.casefold())
+    word = ''.join(c for c in word if c.isalpha())
+    if not word:
+        return ''
+    for prefix, replacement in _SILENT_PREFIXES:
+        if word.startswith(prefix):
+            word = replacement + word[len(prefix):]
+            break
+    for digraph, replacement in _DIGRAPHS:
+        word = word.replace(digraph, replacement)
+
+    first = 'a' if word[0] in 'aeiouy' else word[0]
+    if first in _CLASSES:
+        first = {'1': 'b', '2': 'k', '3': 't', '4': 'l', '5': 'm', '6': 'r'}[_CLASSES[first]]
+    codes = []
+    previous = _CLASSES.get(word[0], '')
+    for letter in word[1:]:
+        code = _CLASSES.get(letter, '')
+        if code and code != previous:
+            codes.append(code)
+        if letter not in 'hw':
+            previous = code
+    return first + ''.join(codes)
+
+
+def words(text):
+    return _WORD_RE.findall(_ascii_fold((text or '').casefold()))
+
+
+def encode(text):
+    """Phonetic keys for every word in text"""
+    return [k for k in (phonetic_key(w) for w in words(text)) if k]
+
+
+def trigrams(text):
+    text = ' ' + ' '.join(words(text)) + ' '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(query_codes, query_trigrams, line_codes, line_text):
+    """How well a line covers the query, 0..1, blending sound and spelling"""
+    if not query_codes:
+        return 0.0
+    matcher = SequenceMatcher(None, query_codes, line_codes, autojunk=False)
+    sound = sum(block.size for block in matcher.get_matching_blocks()) / len(query_codes)
+    spelling = len(query_trigrams & trigrams(line_text)) / len(query_trigrams) if query_trigrams else 0.0
+    return 0.65 * sound + 0.35 * spelling
@@ -0,0 +1,91 @@
+"""Speculative lyrics prefetch for the top-ranked search results"""
+import asyncio
+import logging
+import threading
+
+from decibel import aio
+from decibel.cache import normalize_key
+from decibel.lookup import lookup_lyrics_async, lyrics_cache
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Warm the lyrics cache for the songs a user is most likely to open next
+
+    Each owner (a UI session) has at most one prefetch batch; scheduling a new one
+    cancels the old. All owners share a global limit on concurrent fetches.
+    """
+
+    def __init__(self, top_n=3, concurrency=4):
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._batches = {}
+        self._semaphore = None
+
+    async def _fetch(self, song):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        await self._semaphore.acquire()
+        # A started lookup is single-flight and may be shared with other callers, so a
+        # cancelled prefetch lets it finish (filling the cache) and keeps the slot until then
+        lookup = asyncio.ensure_future(lookup_lyrics_async(song['artist'], song['title']))
+        lookup.add_done_callback(lambda task: self._finished(song, task))
+        await asyncio.shield(lookup)
+
+    def _finished(self, song, task):
+        self._semaphore.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.info("prefetch of %s - %s failed: %s", song['artist'], song['title'], task.exception())
+
+    async def _run(self, songs):
+        await asyncio.gather(*(self._fetch(song) for song in songs), return_exceptions=True)
+
+    def schedule(self, owner, songs):
+        """Start fetching lyrics for the top songs, replacing owner's previous batch
+
+        songs are taken in the order given, which is already the search's ranking.
+        Songs whose lyrics verification looked up (found or not) are skipped.
+        """
+        cache = lyrics_cache()
+        todo = [s for s in songs[:self.top_n]
+                if s.get('artist') and s.get('title') and 'lyrics_available' not in s
+                and normalize_key(s['artist'], s['title']) not in cache]
+
+        self.cancel(owner)
+        if not todo:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._run(todo), aio.get_loop())
+        with self._lock:
+            self._batches[owner] = future
+        future.add_done_callback(lambda f: self._forget(owner, f))
+
+    def _forget(self, owner, future):
+        with self._lock:
+            if self._batches.get(owner) is future:
+                del self._batches[owner]
+
+    def cancel(self, owner):
+        """Drop owner's prefetches that have not started yet
+
+        Lookups already under way run to completion in the background, still counting
+        against the concurrency limit.
+        """
+        with self._lock:
+            future = self._batches.pop(owner, None)
+        if future is not None:
+            future.cancel()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def prefetcher():
+    """Process-wide prefetcher"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
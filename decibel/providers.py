@@ -0,0 +1,190 @@
+"""Lyrics providers and the engine that routes each lookup across them"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from urllib.parse import quote
+
+import requests
+
+from decibel import aio, metrics, routing
+from decibel.synced import SyncedLyrics
+
+logger = logging.getLogger(__name__)
+
+# Overridable so tests and benchmarks can point at a local stub server
+LYRICS_API_URL = os.getenv('DECIBEL_LYRICS_API_URL', 'https://lyrics-api.fly.dev').rstrip('/')
+LRCLIB_URL = os.getenv('DECIBEL_LRCLIB_URL', 'https://lrclib.net').rstrip('/')
+
+
+class Provider:
+    """A lyrics source: how to build its request, parse its reply and how long to wait"""
+
+    def __init__(self, name, build_request, parse, timeout=10):
+        self.name = name
+        self.build_request = build_request
+        self.parse = parse
+        self.timeout = timeout
+
+    async def fetch(self, artist, song):
+        """Fetch lyrics from this provider, returning a result dict or None"""
+        url, params = self.build_request(artist, song)
+        status, data = await aio.get_json(url, params=params, timeout=self.timeout)
+        if status == 429 or status >= 500:
+            # An outage, not an answer: the song may well have lyrics
+            raise requests.HTTPError(f"{self.name} answered {status}")
+        if status != 200 or not data:
+            return None
+        return self.parse(data, artist, song)
+
+
+def _lyrics_api_request(artist, song):
+    return f'{LYRICS_API_URL}/api/lyrics/{quote(artist)}/{quote(song)}', None
+
+
+def _lyrics_api_parse(data, artist, song):
+    if 'lyrics' in data and data['lyrics']:
+        return {
+            'title': data.get('title', song),
+            'artist': data.get('artist', artist),
+            'lyrics': data['lyrics'],
+            'source': 'lyrics-api.fly.dev'
+        }
+    return None
+
+
+def _lrclib_request(artist, song):
+    return f'{LRCLIB_URL}/api/get', {'artist_name': artist, 'track_name': song}
+
+
+def _lrclib_parse(data, artist, song):
+    synced = SyncedLyrics.parse(data.get('syncedLyrics') or '')
+    lyrics = data.get('plainLyrics') or (synced.plain() if synced else '')
+    if lyrics:
+        return {
+            'title': data.get('trackName', song),
+            'artist': data.get('artistName', artist),
+            'lyrics': lyrics,
+            # Empty when lrclib.net has no timestamps, so nobody asks it again
+            'synced': synced.encode() if synced else '',
+            'source': 'lrclib.net'
+        }
+    return None
+
+
+LRCLIB = Provider('lrclib.net', _lrclib_request, _lrclib_parse, timeout=10)
+
+# Default preference; at runtime providers are reordered by observed health (decibel.routing)
+PROVIDERS = [
+    Provider('lyrics-api.fly.dev', _lyrics_api_request, _lyrics_api_parse, timeout=10),
+    LRCLIB,
+]
+
+
+async def _timed_fetch(provider, artist, song, outcomes=None):
+    """Run one provider within its deadline and record how long it took, whatever the outcome
+
+    outcomes, if given, is a list that gets (provider name, outcome) appended unless the
+    call was cancelled.
+    """
+    with metrics.span('provider', provider=provider.name) as span:
+        try:
+            result = await asyncio.wait_for(provider.fetch(artist, song), provider.timeout)
+            span.outcome = 'hit' if result else 'miss'
+            return result
+        except asyncio.CancelledError:
+            span.outcome = 'cancelled'
+            raise
+        except asyncio.TimeoutError:
+            span.outcome = 'timeout'
+            logger.warning("provider %s timed out after %ss", provider.name, provider.timeout)
+            return None
+        except Exception as e:
+            span.outcome = 'error'
+            logger.warning("provider %s failed: %r", provider.name, e)
+            return None
+        finally:
+            elapsed = time.perf_counter() - span.started
+            health = routing.health(provider.name)
+            if span.outcome == 'cancelled':
+                if elapsed >= health.hedge_delay(provider.timeout):
+                    # Another provider was asked meanwhile and won: this one is slow
+                    health.record_abandoned(elapsed)
+                else:
+                    health.release_trial()
+            else:
+                health.record(elapsed, ok=span.outcome in ('hit', 'miss'))
+                if outcomes is not None:
+                    outcomes.append((provider.name, span.outcome))
+            logger.info("provider %s took %.0f ms (%s)", provider.name, elapsed * 1000, span.outcome)
+
+
+async def fetch_provider_async(provider, artist, song, outcomes=None):
+    """Ask one provider, within its deadline and through its circuit breaker
+
+    Returns the result dict or None; outcomes works as in race_providers_async.
+    """
+    if not routing.health(provider.name).allow():
+        logger.info("skipping provider %s: circuit open", provider.name)
+        if outcomes is not None:
+            outcomes.append((provider.name, 'skipped'))
+        return None
+    return await _timed_fetch(provider, artist, song, outcomes)
+
+
+def _launch_next(queue, artist, song, outcomes=None):
+    """Start the next provider whose breaker lets a request through"""
+    while queue:
+        provider = queue.popleft()
+        if routing.health(provider.name).allow():
+            return provider, asyncio.ensure_future(_timed_fetch(provider, artist, song, outcomes))
+        logger.info("skipping provider %s: circuit open", provider.name)
+        if outcomes is not None:
+            outcomes.append((provider.name, 'skipped'))
+    return None, None
+
+
+async def race_providers_async(artist, song, providers=None, outcomes=None):
+    """Query providers best-first, hedging slow ones, and return the first valid result
+
+    The next provider starts as soon as every running one has missed or failed, or
+    when the latest one runs past its p90 latency, so a healthy fast provider answers
+    alone and a degraded one costs at most its p90. Providers whose circuit breaker
+    is open are skipped. outcomes, if given, is a list that collects (provider name,
+    outcome) for every provider that finished or was skipped: 'hit', 'miss', 'timeout',
+    'error' or 'skipped'.
+    """
+    queue = deque(routing.order(PROVIDERS if providers is None else providers))
+    pending = {}
+    launched = 0
+    hedge_at = None
+    try:
+        while True:
+            if not pending or (hedge_at is not None and time.monotonic() >= hedge_at):
+                provider, task = _launch_next(queue, artist, song, outcomes)
+                if task is None and not pending:
+                    return None
+                if task is not None:
+                    pending[task] = launched
+                    launched += 1
+                    hedge_at = time.monotonic() + routing.health(provider.name).hedge_delay(provider.timeout)
+                if not queue:
+                    hedge_at = None
+
+            timeout = None if hedge_at is None else max(hedge_at - time.monotonic(), 0)
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the earlier provider when several finish in the same tick
+            for task in sorted(done, key=pending.get):
+                del pending[task]
+                result = task.result()
+                if result:
+                    return result
+    finally:
+        for straggler in pending:
+            straggler.cancel()
+
+
+def race_providers(artist, song, providers=None):
+    """Sync facade over race_providers_async"""
+    return aio.run_sync(race_providers_async(artist, song, providers))
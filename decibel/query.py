@@ -0,0 +1,142 @@
+"""Lyric query preprocessing: filler removal, tokenization, language and keyword choice
+
+A snippet is cleaned of fillers with compiled whole-word patterns, then split into
+words the same way the local index splits lyrics (letters and digits, with the vowel
+signs of Indic scripts kept inside their words). The script of the words and the
+stopwords they hit give the language, and the keywords sent to lrclib.net are the
+snippet's non-stopwords that are rarest in the local corpus (highest IDF).
+"""
+import math
+import re
+import unicodedata
+
+# Vowel signs and other combining marks of the Indic scripts (Devanagari to Malayalam),
+# plus the zero-width joiners; without them "दिल" would split into "द" and "ल"
+INDIC_MARKS = ''.join(chr(c) for c in range(0x0900, 0x0D80)
+                      if unicodedata.category(chr(c)) in ('Mn', 'Mc')) + '\u200c\u200d'
+
+_TOKEN_RE = re.compile('(?:[^\\W_]|[' + INDIC_MARKS + '])+')
+
+# Hesitations are never lyrics, so they go wherever they appear ("ummm", "uhh", "hmm")
+_HESITATION_RE = re.compile(r"(?<![\w'’])(?:u+m+|u+h+m*|e+r+m+|h+m+)(?![\w'’])", re.I)
+
+# Phrases people wrap around what they remember. They are common in lyrics too ("like a
+# rolling stone", "I mean it"), so they are only removed when set off by punctuation.
+DISCOURSE_FILLERS = ['something like', 'you know', 'i mean', 'i think', 'basically', 'like']
+_DISCOURSE = '|'.join(re.escape(f).replace(r'\ ', r'\s+') for f in DISCOURSE_FILLERS)
+_DISCOURSE_RE = re.compile(
+    rf"(?<![\w'’])(?:{_DISCOURSE})\s*(?:,|;|…|\.\.\.|--?|—)"
+    rf"|(?:^|[,;…])\s*(?:{_DISCOURSE})\s*[.!?]*\s*$",
+    re.I
+)
+_LOOSE_PUNCTUATION_RE = re.compile(r'^[\s,;:.…—-]+|[\s,;:…—-]+$')
+
+STOPWORDS = {
+    'en': frozenset((
+        "a an the and or but if so of to in on at by for from with into onto about as than "
+        "then that this these those there here it its is are was were be been being am do "
+        "does did have has had will would shall should can could may might must i me my "
+        "mine myself you your yours we us our they them their he him his she her hers oh "
+        "ooh yeah hey la na just all not no yes up down out what when where who why how "
+        "too very s t m d ll re ve don won isn ain"
+    ).split()),
+    'es': frozenset((
+        "el la los las un una unos unas y o pero si de del a al en con por para que como "
+        "es son era fue ser estar esta está este esto eso ese lo le les me te se nos mi mis "
+        "tu tus su sus yo tú él ella no sí ya muy más"
+    ).split()),
+    'hi': frozenset((
+        "है हैं था थे थी हो हूँ हूं को का की के से में पर और या ना न भी तो ही जो वो यह ये "
+        "वह मैं मेरा मेरी मेरे तुम तू तेरा तेरी तेरे हम कि एक"
+    ).split()),
+    # Romanized Hindi, as lyrics are usually typed
+    'hi-latn': frozenset((
+        "hai hain tha the thi ho hoon hu ko ka ki ke se mein me main mai par aur ya na bhi "
+        "to toh hi jo wo woh yeh ye ek mera meri mere tera teri tere hum tum tu kya kyun"
+    ).split()),
+}
+
+# Below this many indexed songs, document frequencies say little; prefer longer words
+MIN_IDF_DOCS = 20
+MAX_KEYWORDS = 5
+
+
+def script(token):
+    """Unicode script of a token's first character: 'LATIN', 'DEVANAGARI', ..."""
+    return unicodedata.name(token[0], 'UNKNOWN').split(' ')[0] if token else 'UNKNOWN'
+
+
+def clean(text):
+    """Snippet with fillers removed and whitespace collapsed; case and punctuation are kept"""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = _HESITATION_RE.sub(' ', text)
+    text = _DISCOURSE_RE.sub(' ', text)
+    return _LOOSE_PUNCTUATION_RE.sub('', ' '.join(text.split()))
+
+
+def tokenize(text):
+    """Casefolded word tokens, split like the local index's tokenizer"""
+    return _TOKEN_RE.findall(unicodedata.normalize('NFKC', text or '').casefold())
+
+
+def detect_language(tokens):
+    """'hi' for Devanagari, otherwise the language whose stopwords the words hit most"""
+    scripts = [script(t) for t in tokens]
+    if scripts and scripts.count('DEVANAGARI') * 2 >= len(scripts):
+        return 'hi'
+    hits = {lang: sum(1 for t in tokens if t in STOPWORDS[lang]) for lang in ('en', 'es', 'hi-latn')}
+    best = max(hits, key=hits.get)
+    return best if hits[best] > hits['en'] else 'en'
+
+
+def index_term(token):
+    """Token as the index's vocabulary stores it (Latin diacritics folded)"""
+    if script(token) != 'LATIN':
+        return token
+    return ''.join(c for c in unicodedata.normalize('NFD', token) if not unicodedata.combining(c))
+
+
+def idf(doc_count, total):
+    return math.log((total - doc_count + 0.5) / (doc_count + 0.5) + 1)
+
+
+def keywords(tokens, language, index=None, limit=MAX_KEYWORDS):
+    """The snippet's most distinctive words, in snippet order
+
+    Stopwords of the snippet's language (and English and Hindi, which lyrics often mix
+    in) are dropped, then the rest are ranked by IDF in the local index, rarest first.
+    """
+    stop = STOPWORDS['en'] | STOPWORDS['hi'] | STOPWORDS.get(language, frozenset())
+    unique = list(dict.fromkeys(tokens))
+    candidates = [t for t in unique if t not in stop and not (len(t) == 1 and script(t) == 'LATIN')]
+    # A snippet made mostly of stopwords ("let it be", "tum hi ho") is its own best query
+    if len(candidates) < 2:
+        candidates = unique
+
+    total, frequencies = (0, {})
+    if index is not None and len(candidates) > limit:
+        total, frequencies = index.document_frequencies([index_term(t) for t in candidates])
+    if total >= MIN_IDF_DOCS:
+        def weight(t):
+            return idf(frequencies.get(index_term(t), 0), total), len(t)
+    else:
+        weight = len
+    chosen = set(sorted(candidates, key=weight, reverse=True)[:limit])
+    return ' '.join(t for t in candidates if t in chosen)
+
+
+def analyze(text, index=None):
+    """Everything the search tiers need from a raw snippet
+
+    Returns a dict with the cleaned text (for Gemini and the local index), its tokens,
+    the detected language and the keyword query for lrclib.net.
+    """
+    cleaned = clean(text)
+    tokens = tokenize(cleaned)
+    language = detect_language(tokens)
+    return {
+        'text': cleaned,
+        'tokens': tokens,
+        'language': language,
+        'keywords': keywords(tokens, language, index),
+    }
@@ -0,0 +1,170 @@
+"""Per-provider health: rolling latency and error rate, circuit breakers, hedge delays
+
+Each provider keeps its last WINDOW outcomes. Providers are tried fastest-healthy
+first; the next one is only started (hedged) once the current one has run past its
+own p90 latency, or as soon as it fails or misses. After FAILURE_THRESHOLD errors or
+timeouts in a row a provider's breaker opens and it is skipped for COOLDOWN seconds,
+then a single trial request decides whether it closes again.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+WINDOW = int(os.getenv('DECIBEL_PROVIDER_WINDOW', 50))
+FAILURE_THRESHOLD = int(os.getenv('DECIBEL_PROVIDER_FAILURES', 3))
+COOLDOWN = float(os.getenv('DECIBEL_PROVIDER_COOLDOWN', 30))
+
+# Hedge delay bounds, and the delay used before a provider has enough samples
+MIN_HEDGE_DELAY = 0.05
+DEFAULT_HEDGE_DELAY = 1.0
+MIN_SAMPLES = 5
+
+# A provider not asked for this long is tried first again, so a recovered or
+# never-measured provider gets a chance to prove itself
+STALE_AFTER = 60
+
+
+class ProviderHealth:
+    """Rolling latency/outcome window and circuit breaker for one provider"""
+
+    def __init__(self, name, window=WINDOW, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.samples = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.last_sample_at = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        """ok is False for errors and timeouts; a miss (no lyrics) is still a healthy reply"""
+        with self._lock:
+            self.samples.append((seconds, ok))
+            self.last_sample_at = time.monotonic()
+            self.trial_running = False
+            if ok:
+                self.consecutive_failures = 0
+                self.opened_at = None
+            else:
+                self.consecutive_failures += 1
+                if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                    # Trip, or re-trip after a failed trial
+                    self.opened_at = time.monotonic()
+
+    def record_abandoned(self, seconds):
+        """A call cancelled after seconds, having lost to a hedge: it took at least that long
+
+        Kept as a latency sample, so a provider that turned slow without failing drops
+        down the order; the breaker is left alone, as nothing failed.
+        """
+        with self._lock:
+            self.samples.append((seconds, True))
+            self.last_sample_at = time.monotonic()
+            self.trial_running = False
+
+    def release_trial(self):
+        """The trial request was cancelled before it could tell us anything"""
+        with self._lock:
+            self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        """Whether to send this provider a request now; claims the trial slot when half-open"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def _latencies(self):
+        return sorted(seconds for seconds, _ in self.samples)
+
+    def percentile(self, pct):
+        latencies = self._latencies()
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))]
+
+    @property
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    @property
+    def stale(self):
+        return self.last_sample_at is None or time.monotonic() - self.last_sample_at > STALE_AFTER
+
+    def expected_latency(self, timeout):
+        """Typical time to a usable reply: p50, with failures costing a full timeout"""
+        p50 = self.percentile(50)
+        if p50 is None:
+            return None
+        return p50 * (1 - self.error_rate) + timeout * self.error_rate
+
+    def hedge_delay(self, timeout):
+        """How long to wait on this provider before also asking the next one"""
+        p90 = self.percentile(90)
+        if p90 is None:
+            return min(DEFAULT_HEDGE_DELAY, timeout)
+        return min(max(p90, MIN_HEDGE_DELAY), timeout)
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def health(name):
+    """The process-wide health record for a provider"""
+    with _health_lock:
+        if name not in _health:
+            _health[name] = ProviderHealth(name)
+        return _health[name]
+
+
+def order(providers):
+    """Providers to try, best first; open breakers are left out
+
+    Providers that are unmeasured or have not been asked lately come first, in their
+    configured order; the rest are sorted by expected latency.
+    """
+    def score(indexed):
+        i, provider = indexed
+        h = health(provider.name)
+        expected = h.expected_latency(provider.timeout)
+        if expected is None or h.stale:
+            return (0, 0, i)
+        return (1, expected, i)
+
+    ranked = [p for _, p in sorted(enumerate(providers), key=score)]
+    return [p for p in ranked if health(p.name).state != 'open']
+
+
+def snapshot(providers):
+    """Health of each provider for display"""
+    rows = []
+    for provider in providers:
+        h = health(provider.name)
+        p50, p90 = h.percentile(50), h.percentile(90)
+        rows.append({
+            'provider': provider.name,
+            'state': h.state,
+            'samples': len(h.samples),
+            'error_rate': h.error_rate,
+            'p50_ms': p50 * 1000 if p50 is not None else None,
+            'p90_ms': p90 * 1000 if p90 is not None else None,
+        })
+    return rows
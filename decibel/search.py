@@ -0,0 +1,268 @@
+"""Find songs from a lyric snippet: local index, then Gemini and lrclib.net search at once"""
+import asyncio
+import json
+import logging
+import os
+
+import requests
+
+from decibel import aio, metrics
+from decibel.cache import normalize_key
+from decibel.gemini import GEMINI_AVAILABLE, identify_song_stream
+from decibel.gemini_pool import GeminiBusyError
+from decibel.index import lyrics_index
+from decibel.providers import LRCLIB_URL
+from decibel.query import analyze
+from decibel.verify import align, verify_songs_stream
+
+logger = logging.getLogger(__name__)
+
+LRCLIB_SEARCH_URL = f'{LRCLIB_URL}/api/search'
+
+# Seconds Gemini, the lrclib.net searches and verifying their results get together
+# before we go with what has arrived
+SEARCH_BUDGET = float(os.getenv('DECIBEL_SEARCH_BUDGET', 12))
+
+# Reciprocal-rank fusion: score = sum of weight / (RRF_K + rank) over the lists a song is in
+RRF_K = 60
+# The two lrclib.net queries often find the same songs, so each counts for less, and the
+# local index's matches reached the fan-out because they were not conclusive
+SOURCE_WEIGHTS = {'gemini': 1.0, 'lrclib_keywords': 0.7, 'lrclib_full_text': 0.7,
+                  'local_index': 0.7, 'local_fuzzy': 0.5}
+
+# Shorter snippets occur in too many songs for a local phrase match to settle the search
+MIN_PHRASE_WORDS = 4
+# Alignment a fuzzy match needs to settle the search: soundalike words are fine, a
+# reordered, missing or different word in a short snippet is not
+PHRASE_SCORE = 0.85
+
+
+def gemini_song(song):
+    return {
+        'title': song.get('title', 'Unknown'),
+        'artist': song.get('artist', 'Unknown'),
+        'album': song.get('album', ''),
+        'year': song.get('year', ''),
+        'language': song.get('language', ''),
+        'confidence': song.get('confidence', 0),
+        'matching_phrase': song.get('matching_phrase', ''),
+        'genre': song.get('genre', ''),
+        'source': 'gemini_ai'
+    }
+
+
+async def lrclib_search_async(query):
+    """Songs from lrclib.net's search endpoint, at most 8"""
+    status, data = await aio.get_json(LRCLIB_SEARCH_URL, params={'q': query}, timeout=10)
+    if status != 200 or not data or not isinstance(data, list):
+        return []
+    return [{
+        'title': item.get('trackName', item.get('name', 'Unknown')),
+        'artist': item.get('artistName', item.get('artist', 'Unknown')),
+        'album': item.get('albumName', ''),
+        'source': 'lrclib'
+    } for item in data[:8]]
+
+
+async def search_lyrics_stream_async(lyrics_text, api_key, errors=None):
+    """Search for songs using lyrics text, yielding the result list as it grows
+
+    Each yielded value is the full list found so far, so Gemini matches can be shown
+    one by one while the rest are still being generated. errors, if given, is a list
+    that collects (level, message) tuples for failures the user should see, level
+    being 'warning' or 'error'.
+    """
+    errors = [] if errors is None else errors
+    with metrics.span('search') as search_span:
+        async for songs_found in _search_tiers(lyrics_text, api_key, errors, search_span):
+            yield songs_found
+        if search_span.outcome == 'ok':
+            search_span.outcome = 'none'
+
+
+async def _search_tiers(lyrics_text, api_key, errors, search_span):
+    """The search itself; search_span.outcome is set to the tier that answered"""
+    index = lyrics_index()
+    with metrics.span('query_analysis'):
+        query = await asyncio.to_thread(analyze, lyrics_text, index)
+    cleaned_lyrics = query['text']
+
+    # Priority 1: Songs we've already fetched, from the local full-text index. Only a
+    # song containing the snippet as a phrase answers alone; sharing most of its words
+    # says little ("i will always love you" vs "all of me loves all of you").
+    phrase_long_enough = len(query['tokens']) >= MIN_PHRASE_WORDS
+    with metrics.span('local_search') as span:
+        local_results = await asyncio.to_thread(index.search, cleaned_lyrics)
+        span.outcome = 'hit' if local_results and local_results[0]['phrase'] and phrase_long_enough else 'miss'
+    if span.outcome == 'hit':
+        search_span.outcome = 'local'
+        yield local_results
+        return
+
+    # Misheard or voice-recognized lyrics: match lines that sound alike, answering alone
+    # only when the snippet aligns with the matched lines word by word
+    with metrics.span('fuzzy_search') as span:
+        fuzzy_results = await asyncio.to_thread(index.fuzzy_search, cleaned_lyrics)
+        aligned = bool(fuzzy_results) and phrase_long_enough and (
+            align(cleaned_lyrics, fuzzy_results[0]['matching_phrase']) >= PHRASE_SCORE)
+        span.outcome = 'hit' if aligned else 'miss'
+    if span.outcome == 'hit':
+        search_span.outcome = 'fuzzy'
+        yield fuzzy_results
+        return
+
+    # Priority 2: Gemini and lrclib.net at once, fused into one ranking along with the
+    # local index's weaker candidates
+    strategies = [
+        lambda updates, name=name, songs=songs: _local_candidates(name, songs, updates)
+        for name, songs in (('local_index', local_results), ('local_fuzzy', fuzzy_results)) if songs
+    ]
+    if GEMINI_AVAILABLE and api_key:
+        strategies.append(lambda updates: _gemini_candidates(cleaned_lyrics, api_key, errors, updates))
+    # lrclib.net by the snippet's most distinctive words, and by its opening text when
+    # that is a different query
+    strategies.append(lambda updates: _lrclib_candidates('keywords', query['keywords'], updates))
+    if ' '.join(query['tokens'][:20]) != query['keywords']:
+        strategies.append(lambda updates: _lrclib_candidates('full_text', cleaned_lyrics[:100], updates))
+
+    # One budget covers the fan-out and verifying its results
+    deadline = asyncio.get_running_loop().time() + SEARCH_BUDGET
+    songs_found = []
+    async for songs_found in _fan_out(strategies, errors, deadline):
+        yield songs_found
+    if songs_found:
+        # Candidates whose lyrics contain the snippet go first, songs without lyrics last
+        async for songs_found in verify_songs_stream(cleaned_lyrics, songs_found, deadline=deadline):
+            yield songs_found
+        search_span.outcome = _answering_tier(songs_found[0]['sources'])
+
+
+def _answering_tier(sources):
+    """The search outcome for the strategies that found the top song"""
+    if 'gemini' in sources:
+        return 'gemini'
+    if any(source.startswith('lrclib') for source in sources):
+        return 'lrclib'
+    return 'local'
+
+
+async def _local_candidates(name, songs, updates):
+    """Put a local index ranking on updates; it is already complete"""
+    updates.put_nowait((name, songs))
+
+
+async def _gemini_candidates(lyrics_text, api_key, errors, updates):
+    """Put Gemini's matches on updates as they stream in, best first"""
+    songs = []
+    try:
+        async for song in identify_song_stream(lyrics_text, api_key):
+            songs.append(gemini_song(song))
+            updates.put_nowait(('gemini', sorted(songs, key=lambda x: x.get('confidence', 0), reverse=True)))
+    except json.JSONDecodeError:
+        errors.append(('warning', "⚠️ Gemini returned invalid format."))
+    except GeminiBusyError:
+        errors.append(('warning', "⏳ Gemini is busy right now."))
+    except Exception as e:
+        logger.warning("Gemini identification failed: %s", e)
+        errors.append(('error', f"Gemini API error: {str(e)}"))
+
+
+async def _lrclib_candidates(kind, search_query, updates):
+    """Put lrclib.net's matches for one query on updates"""
+    with metrics.span('lrclib_search', kind=kind) as span:
+        try:
+            songs = await lrclib_search_async(search_query)
+        except (requests.RequestException, ValueError) as e:
+            span.outcome = 'error'
+            logger.warning("lrclib %s search failed: %s", kind, e)
+            return
+        span.outcome = 'hit' if songs else 'miss'
+    if songs:
+        updates.put_nowait((f'lrclib_{kind}', songs))
+
+
+async def _run_strategy(strategy, updates):
+    try:
+        await strategy(updates)
+    finally:
+        # Tells the fan-out this strategy is done, however it ended
+        updates.put_nowait(None)
+
+
+async def _fan_out(strategies, errors, deadline):
+    """Run every strategy at once, yielding the fused ranking each time one reports
+
+    A strategy is called with a queue and puts (name, ranked songs) on it, as often as
+    its list grows. At deadline (an event loop time) the remaining strategies are
+    cancelled and the ranking stands as it is.
+    """
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+    tasks = [asyncio.ensure_future(_run_strategy(strategy, updates)) for strategy in strategies]
+    rankings = {}
+    running = len(tasks)
+    with metrics.span('fan_out') as span:
+        try:
+            while running:
+                try:
+                    update = await asyncio.wait_for(updates.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    span.outcome = 'timeout'
+                    errors.append(('warning', "⏱️ Search is taking long; showing the matches found so far."))
+                    break
+                if update is None:
+                    running -= 1
+                    continue
+                name, songs = update
+                rankings[name] = songs
+                yield fuse_rankings(rankings)
+        finally:
+            for task in tasks:
+                task.cancel()
+        if span.outcome == 'ok':
+            span.outcome = 'hit' if rankings else 'miss'
+
+
+def fuse_rankings(rankings):
+    """Merge ranked song lists by reciprocal-rank fusion
+
+    rankings maps a strategy name to its songs, best first. Songs are merged on
+    normalized (artist, title); each list a song appears in adds weight / (RRF_K + rank),
+    with Gemini's weight scaled by its confidence. Merged songs keep Gemini's metadata
+    when it has them, plus 'sources' (the strategies that found them) and 'score'.
+    """
+    merged = {}
+    for name, songs in rankings.items():
+        for rank, song in enumerate(songs, 1):
+            key = normalize_key(song.get('artist'), song.get('title'))
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = dict(song, sources=[], score=0.0)
+            elif name == 'gemini':
+                entry.update((k, v) for k, v in song.items() if v)
+            if name in entry['sources']:
+                continue
+            weight = SOURCE_WEIGHTS.get(name, 1.0)
+            if name == 'gemini':
+                weight *= 0.5 + song.get('confidence', 0) / 100
+            entry['sources'].append(name)
+            entry['score'] += weight / (RRF_K + rank)
+    return sorted(merged.values(), key=lambda song: song['score'], reverse=True)
+
+
+async def search_lyrics_async(lyrics_text, api_key, errors=None):
+    """Search for songs using lyrics text, returning the final result list"""
+    songs_found = []
+    async for songs_found in search_lyrics_stream_async(lyrics_text, api_key, errors):
+        pass
+    return songs_found
+
+
+def search_lyrics_stream(lyrics_text, api_key, errors=None):
+    """Sync facade over search_lyrics_stream_async"""
+    return aio.iter_sync(search_lyrics_stream_async(lyrics_text, api_key, errors))
+
+
+def search_lyrics(lyrics_text, api_key, errors=None):
+    """Sync facade over search_lyrics_async"""
+    return aio.run_sync(search_lyrics_async(lyrics_text, api_key, errors))
@@ -0,0 +1,89 @@
+"""Cache of Gemini song identifications keyed by a normalized lyric snippet"""
+import os
+import threading
+from collections import OrderedDict
+
+from decibel.cache import get_cache
+from decibel.phonetic import phonetic_key
+from decibel.query import clean, tokenize
+
+IDENTIFY_TTL = int(os.getenv('DECIBEL_IDENTIFY_TTL', 7 * 24 * 3600))
+
+
+def normalize_snippet(text):
+    """Cache key for a snippet: fillers removed as in search, then its casefolded words"""
+    return ' '.join(tokenize(clean(text)))
+
+
+def _near_duplicate(a, b, min_identical=0.5):
+    """Whether two normalized snippets only differ in words that sound alike
+
+    Both need the same number of words, at least min_identical of them identical, and
+    every other pair sharing a phonetic key ("bandu"/"bandhu"). A different word is a
+    different lyric however small the edit: "we will rock you" is not "we will mock you".
+    """
+    words_a, words_b = a.split(), b.split()
+    if not words_a or len(words_a) != len(words_b):
+        return False
+    changed = [(x, y) for x, y in zip(words_a, words_b) if x != y]
+    if len(changed) > len(words_a) * (1 - min_identical):
+        return False
+    return all(phonetic_key(x) == phonetic_key(y) for x, y in changed)
+
+
+class SnippetCache:
+    """Serve identifications for identical or near-duplicate snippets without an LLM call"""
+
+    def __init__(self, min_identical=0.5, max_candidates=2000):
+        self.min_identical = min_identical
+        self.max_candidates = max_candidates
+        self.store = get_cache('identify', ttl=IDENTIFY_TTL, max_memory_items=512, max_disk_items=50000)
+        self._lock = threading.Lock()
+        # Normalized snippets we can compare near-duplicates against, most recent last
+        self._recent = OrderedDict((k, None) for k in reversed(self.store.recent_keys(max_candidates)))
+
+    def _nearest(self, key):
+        """The most recent cached snippet that is a near-duplicate of key, or None"""
+        with self._lock:
+            candidates = list(self._recent)
+        spaces = key.count(' ')
+        for candidate in reversed(candidates):
+            # Snippets with a different word count are never near-duplicates
+            if candidate.count(' ') == spaces and _near_duplicate(key, candidate, self.min_identical):
+                return candidate
+        return None
+
+    def get(self, snippet):
+        key = normalize_snippet(snippet)
+        if not key:
+            return None
+        result = self.store.get(key)
+        if result is None:
+            near = self._nearest(key)
+            if near is not None:
+                result = self.store.get(near)
+        return result
+
+    def set(self, snippet, songs):
+        key = normalize_snippet(snippet)
+        if not key or not songs:
+            return
+        self.store.set(key, songs)
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_candidates:
+                self._recent.popitem(last=False)
+
+
+_snippet_cache = None
+_snippet_cache_lock = threading.Lock()
+
+
+def snippet_cache():
+    """Process-wide identification cache"""
+    global _snippet_cache
+    with _snippet_cache_lock:
+        if _snippet_cache is None:
+            _snippet_cache = SnippetCache()
+        return _snippet_cache
@@ -0,0 +1,170 @@
+"""Headless JSON API over Decibel's lookup, search and identification engines
+
+    python -m decibel.server --port 8080 --workers 4
+
+Endpoints (all GET, all JSON):
+    /lyrics?artist=...&title=...   lyrics for one song, 404 if not found
+    /synced?artist=...&title=...   timestamped lines, plus the line at &t=<ms> if given
+    /search?q=...                  songs matching a lyric snippet
+    /identify?q=...                Gemini identification of a lyric snippet
+    /health                        liveness check and provider health
+    /metrics                       per-stage latency in the Prometheus text format
+
+Workers are separate processes sharing one port (SO_REUSEPORT). They share the
+on-disk lyrics cache, identification cache and lyrics index; each keeps its own
+connection pools, in-memory cache tier and metrics.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+
+from decibel import aio, metrics, routing
+from decibel.gemini import identify_song_async
+from decibel.gemini_pool import GeminiBusyError
+from decibel.lookup import lookup_lyrics_async, lookup_synced_async
+from decibel.providers import PROVIDERS
+from decibel.search import search_lyrics_async
+
+try:
+    from aiohttp import web
+    SERVER_AVAILABLE = True
+except ImportError:
+    SERVER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _json(data, status=200):
+    return web.json_response(data, status=status, dumps=lambda d: json.dumps(d, ensure_ascii=False))
+
+
+def _required(request, *names):
+    values = [request.query.get(name, '').strip() for name in names]
+    missing = [name for name, value in zip(names, values) if not value]
+    if missing:
+        raise web.HTTPBadRequest(text=json.dumps({'error': f"missing parameter: {', '.join(missing)}"}),
+                                 content_type='application/json')
+    return values
+
+
+async def health(request):
+    return _json({'status': 'ok', 'providers': routing.snapshot(PROVIDERS)})
+
+
+async def metrics_text(request):
+    return web.Response(body=metrics.render().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+def _lyrics_payload(result):
+    """A lookup result as /lyrics returns it
+
+    Synced lyrics are kept in an internal encoding and may not have been looked up
+    yet, so they are left out; /synced serves them.
+    """
+    return {key: value for key, value in result.items() if key != 'synced'}
+
+
+async def lyrics(request):
+    artist, title = _required(request, 'artist', 'title')
+    result = await aio.run_async(lookup_lyrics_async(artist, title))
+    if not result:
+        return _json({'error': 'lyrics not found'}, status=404)
+    return _json(_lyrics_payload(result))
+
+
+async def synced(request):
+    artist, title = _required(request, 'artist', 'title')
+    lyrics = await aio.run_async(lookup_synced_async(artist, title))
+    if not lyrics:
+        return _json({'error': 'synced lyrics not found'}, status=404)
+    payload = {'lines': [{'ms': ms, 'text': text} for ms, text in lyrics.lines()]}
+    if request.query.get('t'):
+        try:
+            t = int(request.query['t'])
+        except ValueError:
+            return _json({'error': 't must be milliseconds'}, status=400)
+        index = lyrics.index_at(t)
+        payload['at'] = {'index': index, 'text': lyrics.line(index) if index >= 0 else None}
+    return _json(payload)
+
+
+async def search(request):
+    query, = _required(request, 'q')
+    errors = []
+    results = await aio.run_async(search_lyrics_async(query, request.app['gemini_api_key'], errors))
+    return _json({'results': results, 'warnings': [message for _, message in errors]})
+
+
+async def identify(request):
+    query, = _required(request, 'q')
+    if not request.app['gemini_api_key']:
+        return _json({'error': 'GEMINI_API_KEY is not configured'}, status=503)
+    try:
+        results = await aio.run_async(identify_song_async(query, request.app['gemini_api_key']))
+    except GeminiBusyError as e:
+        return _json({'error': str(e)}, status=503)
+    except ValueError:
+        return _json({'error': 'Gemini returned an invalid response'}, status=502)
+    return _json({'results': results or []})
+
+
+def create_app(gemini_api_key=None):
+    app = web.Application()
+    app['gemini_api_key'] = gemini_api_key if gemini_api_key is not None else os.getenv('GEMINI_API_KEY', '')
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics_text)
+    app.router.add_get('/lyrics', lyrics)
+    app.router.add_get('/synced', synced)
+    app.router.add_get('/search', search)
+    app.router.add_get('/identify', identify)
+    return app
+
+
+def serve(host, port, reuse_port=False):
+    # Core coroutines run on Decibel's shared loop; handlers just await them
+    aio.get_loop()
+    web.run_app(create_app(), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Decibel's search and lookup engines as a JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes sharing the port")
+    args = parser.parse_args(argv)
+
+    if not SERVER_AVAILABLE:
+        print("The API server needs aiohttp: pip install aiohttp", file=sys.stderr)
+        return 1
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(name)s %(message)s')
+
+    if args.workers <= 1:
+        serve(args.host, args.port)
+        return 0
+
+    workers = [multiprocessing.Process(target=serve, args=(args.host, args.port, True), daemon=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    logger.info("serving on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Coalesce concurrent identical calls into one upstream request
+
+Used from Decibel's shared event loop only, so no locking is needed: callers that ask
+for a key while a call for it is in flight await that call's result instead of
+starting their own. Nothing is kept once the call finishes; that is the cache's job.
+"""
+import asyncio
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._flights = {}
+
+    def claim(self, key):
+        """Return (future, is_leader) for key
+
+        The leader must finish the call and pass its outcome to resolve() or fail();
+        everyone else just awaits the future.
+        """
+        future = self._flights.get(key)
+        if future is not None:
+            return future, False
+        future = asyncio.get_running_loop().create_future()
+        # Followers may all give up; don't warn about an exception nobody read
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._flights[key] = future
+        return future, True
+
+    def resolve(self, key, result):
+        future = self._flights.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def fail(self, key, error):
+        future = self._flights.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    async def do(self, key, call):
+        """Await call() once for all concurrent callers with the same key
+
+        call is a zero-argument function returning a coroutine. A caller being
+        cancelled doesn't cancel the shared call for the others.
+        """
+        future, is_leader = self.claim(key)
+        if is_leader:
+            task = asyncio.ensure_future(call())
+
+            def finish(t):
+                if t.cancelled():
+                    self.fail(key, asyncio.CancelledError())
+                elif t.exception() is not None:
+                    self.fail(key, t.exception())
+                else:
+                    self.resolve(key, t.result())
+
+            task.add_done_callback(finish)
+        return await asyncio.shield(future)
+
+    def __len__(self):
+        return len(self._flights)
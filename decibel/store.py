@@ -0,0 +1,227 @@
+"""Content-addressed lyrics store: deduplicated, compressed, memory-mapped
+
+Lyric bodies are normalized and hashed; the hash is all a cache entry or a session
+needs to keep. Each distinct body is compressed once with zlib and a built-in
+dictionary of common lyric words (short texts compress far better with one), then
+appended to a segment file that is never rewritten. Reads go through an mmap of the
+segment, and recently read bodies are kept in a small process-wide LRU, so every
+session viewing a song shares one string instead of holding its own copy.
+
+The same song from two providers, or under two spellings of its title, is stored once
+as long as the normalized text matches.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+from decibel.cache import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STORE_PATH = os.getenv('DECIBEL_STORE_PATH', os.path.join(CACHE_DIR, 'lyrics.seg'))
+
+# Common words and phrases in song lyrics; zlib favors matches near the end of the
+# dictionary, so the most frequent come last. Changing it needs a new DICTIONARY_ID.
+DICTIONARY_ID = 1
+DICTIONARY = (
+    "forever together tonight tomorrow yesterday remember believe nothing something "
+    "everything somebody nobody everybody heart mind soul dream fire night light time "
+    "world life feel gonna wanna gotta cause'cause never ever again away alone inside "
+    "outside around down up over under through into want need know like love baby "
+    "Chorus Verse Bridge Intro Outro Pre-Chorus [Chorus]\n[Verse 1]\n[Verse 2]\n"
+    "oh oh oh yeah yeah yeah na na na la la la ooh ooh\n"
+    "I don't know\nI can't\nI'm not\nI won't\nI will\nI want you\nI need you\n"
+    "I love you\nyou know\nyou're\nyour\nwhen I\nthat I\nand I\nbut I\nif you\n"
+    "all the\nin the\nof the\non the\nto the\nfor you\nwith you\nwithout you\n"
+    "and the \nand you \nand I \nto be \nto me \nfor me \nin my \nmy heart \n"
+    "you and me \nme and you \nthe way \nall I \nI know \nI feel \nI can \n"
+    "I'm \nyou're \nit's \ndon't \ncan't \nthe \nand \nyou \nme \nmy \nI \n"
+).encode('utf-8')
+
+_ZDICTS = {DICTIONARY_ID: DICTIONARY}
+
+# Record header: dictionary id (1 byte) + compressed length (4 bytes, little-endian)
+_HEADER_SIZE = 5
+
+MEMORY_ITEMS = 256
+
+
+def normalize_body(text):
+    """Canonical form used for hashing and storage: NFC, LF line ends, no trailing spaces"""
+    text = unicodedata.normalize('NFC', text or '').replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.rstrip() for line in text.split('\n')]
+    # Collapse runs of blank lines to one
+    kept = [line for i, line in enumerate(lines) if line or (i and lines[i - 1])]
+    return '\n'.join(kept).strip()
+
+
+def digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class LyricsStore:
+    """Append-only segment of compressed lyric bodies, addressed by content hash"""
+
+    def __init__(self, path=None):
+        self.path = path or STORE_PATH
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._map = None
+        self._memory = OrderedDict()
+        self.stats = {'stored': 0, 'deduplicated': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+        # Where each body lives in the segment; shared by every process using the file
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS bodies ('
+            'digest TEXT PRIMARY KEY, offset INTEGER, length INTEGER, raw_length INTEGER)'
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path + '.idx', timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, text):
+        """Store a lyrics body and return its digest; a body already stored is not written again"""
+        body = normalize_body(text)
+        key = digest(body)
+        if self._conn().execute('SELECT 1 FROM bodies WHERE digest = ?', (key,)).fetchone():
+            with self._lock:
+                self.stats['deduplicated'] += 1
+            return key
+
+        raw = body.encode('utf-8')
+        compressor = zlib.compressobj(9, zdict=_ZDICTS[DICTIONARY_ID])
+        payload = compressor.compress(raw) + compressor.flush()
+        record = bytes([DICTIONARY_ID]) + len(payload).to_bytes(4, 'little') + payload
+
+        with self._lock, open(self.path, 'ab') as f:
+            if fcntl is not None:
+                # Other worker processes append to the same segment
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(record)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            self.stats['stored'] += 1
+            self.stats['raw_bytes'] += len(raw)
+            self.stats['stored_bytes'] += len(record)
+        self._conn().execute('INSERT OR IGNORE INTO bodies VALUES (?, ?, ?, ?)',
+                             (key, offset, len(record), len(raw)))
+        self._cache(key, body)
+        return key
+
+    def _cache(self, key, body):
+        with self._lock:
+            self._memory[key] = body
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_ITEMS:
+                self._memory.popitem(last=False)
+
+    def _mapped(self, end):
+        """A read-only mmap of the segment covering at least [0, end)"""
+        with self._lock:
+            if self._map is None or len(self._map) < end:
+                with open(self.path, 'rb') as f:
+                    # Readers still holding the old map keep it alive until they finish
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def get(self, key, memory_only=False):
+        """The lyrics body stored under digest key, or None
+
+        With memory_only, only recently read bodies are returned and the segment is
+        not touched.
+        """
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                return body
+        if memory_only:
+            return None
+        row = self._conn().execute('SELECT offset, length FROM bodies WHERE digest = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        offset, length = row
+        segment = self._mapped(offset + length)
+        view = memoryview(segment)[offset:offset + length]
+        try:
+            dictionary_id = view[0]
+            size = int.from_bytes(view[1:_HEADER_SIZE], 'little')
+            decompressor = zlib.decompressobj(zdict=_ZDICTS[dictionary_id])
+            body = (decompressor.decompress(view[_HEADER_SIZE:_HEADER_SIZE + size])
+                    + decompressor.flush()).decode('utf-8')
+        finally:
+            view.release()
+        self._cache(key, body)
+        return body
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM bodies').fetchone()[0]
+
+    def size(self):
+        """(total raw bytes, bytes on disk) of every stored body"""
+        raw, stored = self._conn().execute('SELECT SUM(raw_length), SUM(length) FROM bodies').fetchone()
+        return raw or 0, stored or 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def lyrics_store():
+    """Process-wide lyrics store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LyricsStore()
+        return _store
+
+
+# Large text fields of a lookup result that are kept in the store: the body, and the
+# encoded synced lyrics (which hold the text again plus the timings)
+_STORED_FIELDS = (('lyrics', 'lyrics_ref'), ('synced', 'synced_ref'))
+
+
+def to_ref(result):
+    """A lookup result with its body and synced lyrics replaced by digests, for caches and sessions"""
+    if not result or 'lyrics' not in result:
+        return result
+    ref = dict(result)
+    for field, ref_field in _STORED_FIELDS:
+        if ref.get(field):
+            ref[ref_field] = lyrics_store().put(ref.pop(field))
+    return ref
+
+
+def resolve(ref, memory_only=False):
+    """The full lookup result for a reference made by to_ref; None if the body is gone
+
+    With memory_only, None also when a body is not among the recently read ones.
+    """
+    if not ref or 'lyrics' in ref:
+        return ref
+    result = dict(ref)
+    for field, ref_field in _STORED_FIELDS:
+        if ref_field in result:
+            value = lyrics_store().get(result.pop(ref_field), memory_only)
+            if value is None:
+                return None
+            result[field] = value
+    return result
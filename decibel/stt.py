@@ -0,0 +1,154 @@
+"""Speech-to-text engines for voice search: Google's web recognizer or a local CPU model
+
+Local engines (Vosk, or Whisper via faster-whisper) load their model once per process
+on a dedicated worker thread and keep it in memory. Transcriptions from concurrent
+sessions queue up for that worker, which handles one clip at a time, so the model is
+never loaded twice and CPU use stays bounded however many people sing at once.
+"""
+import abc
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from decibel import metrics, module_available
+
+logger = logging.getLogger(__name__)
+
+STT_ENGINE = os.getenv('DECIBEL_STT_ENGINE', 'google')
+# Unpacked Vosk model directory; without one, the small model for VOSK_LANG is fetched once
+VOSK_MODEL_PATH = os.getenv('DECIBEL_VOSK_MODEL', '')
+VOSK_LANG = os.getenv('DECIBEL_VOSK_LANG', 'en-us')
+WHISPER_MODEL = os.getenv('DECIBEL_WHISPER_MODEL', 'tiny')
+
+VOSK_AVAILABLE = module_available('vosk')
+WHISPER_AVAILABLE = module_available('faster_whisper')
+
+# Local models take 16 kHz mono 16-bit PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class LocalEngine(abc.ABC):
+    """A local model served by one warm worker thread"""
+
+    name = None
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._load_error = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.model = None
+
+    @abc.abstractmethod
+    def load_model(self):
+        """Load and return the model; runs once, on the worker thread"""
+
+    @abc.abstractmethod
+    def transcribe_one(self, pcm):
+        """Text for one clip of 16 kHz mono 16-bit PCM"""
+
+    def warm(self):
+        """Start the worker and begin loading the model, without waiting for it"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'decibel-stt-{self.name}', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            with metrics.span('stt_model_load', engine=self.name):
+                self.model = self.load_model()
+        except Exception as e:
+            logger.warning("could not load %s speech model: %s", self.name, e)
+            self._load_error = e
+
+        while True:
+            pcm, future = self._requests.get()
+            if self._load_error is not None:
+                future.set_exception(self._load_error)
+                continue
+            try:
+                future.set_result(self.transcribe_one(pcm))
+            except Exception as e:
+                future.set_exception(e)
+
+    def transcribe(self, pcm, timeout=None):
+        """Text for a clip of 16 kHz mono 16-bit PCM; '' when nothing was recognized"""
+        self.warm()
+        future = Future()
+        self._requests.put((pcm, future))
+        return future.result(timeout)
+
+
+class VoskEngine(LocalEngine):
+    name = 'vosk'
+
+    def load_model(self):
+        import vosk
+        vosk.SetLogLevel(-1)
+        return vosk.Model(model_path=VOSK_MODEL_PATH) if VOSK_MODEL_PATH else vosk.Model(lang=VOSK_LANG)
+
+    def transcribe_one(self, pcm):
+        import vosk
+        recognizer = vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get('text', '')
+
+
+class WhisperEngine(LocalEngine):
+    name = 'whisper'
+
+    def load_model(self):
+        from faster_whisper import WhisperModel
+        return WhisperModel(WHISPER_MODEL, device='cpu', compute_type='int8')
+
+    def transcribe_one(self, pcm):
+        import numpy as np
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(audio, beam_size=1, vad_filter=True)
+        return ' '.join(segment.text.strip() for segment in segments).strip()
+
+
+ENGINES = {'vosk': (VoskEngine, VOSK_AVAILABLE), 'whisper': (WhisperEngine, WHISPER_AVAILABLE)}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def local_engine(name):
+    """The process-wide instance of a local engine"""
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name][0]()
+        return _engines[name]
+
+
+def available_engines():
+    """Engine names usable here, Google first"""
+    names = ['google'] if module_available('speech_recognition') else []
+    return names + [name for name, (_, available) in ENGINES.items() if available]
+
+
+def default_engine():
+    engines = available_engines()
+    return STT_ENGINE if STT_ENGINE in engines else (engines[0] if engines else None)
+
+
+def transcribe_audio(recognizer, audio, engine='google'):
+    """Transcribe a speech_recognition AudioData with the chosen engine; '' if nothing was heard
+
+    Google errors surface as sr.RequestError as before; local engines raise whatever
+    their model raises.
+    """
+    if engine == 'google':
+        import speech_recognition as sr
+        try:
+            return recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return ''
+    pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH)
+    return local_engine(engine).transcribe(pcm)
@@ -0,0 +1,157 @@
+"""Synced (LRC) lyrics in a compact, time-indexed form
+
+A track is stored as parallel arrays instead of per-line objects: start offsets in
+milliseconds, and for each timestamped line a reference into a table of distinct
+line texts (repeated chorus lines are stored once). The distinct lines live in one
+string, addressed by an array of start positions. "Which line is sung at t" is a
+binary search over the offsets, and serializing is a handful of array.tobytes()
+calls, so millions of tracks can be cached without building a Python object per line.
+"""
+import base64
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+# [mm:ss], [mm:ss.xx] or [mm:ss.xxx]; a line may carry several stamps
+_STAMP = re.compile(r'\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]')
+_OFFSET_TAG = re.compile(r'^\[offset:\s*([+-]?\d+)\s*\]\s*$', re.I)
+
+_MAGIC = b'LRC1'
+_HEADER = struct.Struct('<4sII')
+
+
+def _stamp_ms(minutes, seconds, fraction):
+    ms = int(fraction.ljust(3, '0')) if fraction else 0
+    return (int(minutes) * 60 + int(seconds)) * 1000 + ms
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class SyncedLyrics:
+    """Timestamped lyric lines backed by arrays
+
+    offsets[i] is when line i starts (ms, ascending), refs[i] indexes the distinct
+    line texts, and distinct text j is text[starts[j]:starts[j + 1] - 1].
+    """
+
+    __slots__ = ('offsets', 'refs', 'starts', 'text')
+
+    def __init__(self, offsets, refs, starts, text):
+        self.offsets = offsets
+        self.refs = refs
+        self.starts = starts
+        self.text = text
+
+    @classmethod
+    def parse(cls, lrc):
+        """Build from LRC text; metadata tags are skipped and [offset:] is applied"""
+        shift = 0
+        timed = []
+        for raw in (lrc or '').splitlines():
+            offset_tag = _OFFSET_TAG.match(raw.strip())
+            if offset_tag:
+                # A positive offset means the lyrics come earlier
+                shift = -int(offset_tag.group(1))
+                continue
+            stamps = []
+            rest = raw.strip()
+            while True:
+                match = _STAMP.match(rest)
+                if not match:
+                    break
+                stamps.append(_stamp_ms(*match.groups()))
+                rest = rest[match.end():]
+            for ms in stamps:
+                timed.append((ms, rest.strip()))
+        timed.sort(key=lambda item: item[0])
+
+        offsets, refs, starts = array('I'), array('I'), array('I')
+        distinct = {}
+        pieces = []
+        position = 0
+        for ms, line in timed:
+            if line not in distinct:
+                distinct[line] = len(distinct)
+                starts.append(position)
+                pieces.append(line)
+                position += len(line) + 1
+            offsets.append(max(ms + shift, 0))
+            refs.append(distinct[line])
+        starts.append(position)
+        text = '\n'.join(pieces) + ('\n' if pieces else '')
+        return cls(offsets, refs, starts, text)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __bool__(self):
+        return len(self.offsets) > 0
+
+    def line(self, i):
+        j = self.refs[i]
+        return self.text[self.starts[j]:self.starts[j + 1] - 1]
+
+    def index_at(self, ms):
+        """Index of the line being sung at ms, or -1 before the first line"""
+        return bisect_right(self.offsets, ms) - 1
+
+    def line_at(self, ms):
+        """Text of the line being sung at ms, or None before the first line"""
+        i = self.index_at(ms)
+        return self.line(i) if i >= 0 else None
+
+    def lines(self):
+        """(start ms, text) for every line, in order"""
+        return [(self.offsets[i], self.line(i)) for i in range(len(self))]
+
+    def plain(self):
+        """The lyrics without timestamps"""
+        return '\n'.join(self.line(i) for i in range(len(self)))
+
+    def to_lrc(self):
+        out = []
+        for ms, line in self.lines():
+            minutes, rest = divmod(ms, 60000)
+            out.append(f'[{minutes:02d}:{rest // 1000:02d}.{rest % 1000 // 10:02d}]{line}')
+        return '\n'.join(out) + '\n'
+
+    def to_bytes(self):
+        text = self.text.encode('utf-8')
+        return b''.join((_HEADER.pack(_MAGIC, len(self.offsets), len(self.starts)),
+                         _little_endian(self.offsets), _little_endian(self.refs),
+                         _little_endian(self.starts), text))
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, count, distinct = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("not a serialized SyncedLyrics")
+        position = _HEADER.size
+        arrays = []
+        for length in (count, count, distinct):
+            arrays.append(_from_little_endian('I', data[position:position + 4 * length]))
+            position += 4 * length
+        return cls(*arrays, bytes(data[position:]).decode('utf-8'))
+
+    def encode(self):
+        """Compact ASCII form that fits in a JSON cache entry"""
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def decode(cls, encoded):
+        return cls.from_bytes(base64.b64decode(encoded))
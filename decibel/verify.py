@@ -0,0 +1,154 @@
+"""Check candidate songs against their actual lyrics before they are shown
+
+Gemini and lrclib.net suggest songs by title; some have no lyrics anywhere, and some
+don't contain the snippet at all. The top candidates' lyrics are fetched concurrently
+(through the normal cached lookup, so "View Lyrics" is instant afterwards) and the
+snippet is aligned against them word by word, allowing misheard words, skipped words
+and extra ones. Verdicts are cached per (snippet, artist, title).
+"""
+import asyncio
+import os
+
+from decibel import metrics
+from decibel.cache import get_cache, normalize_key
+from decibel.lookup import lookup_lyrics_outcome_async
+from decibel.phonetic import phonetic_key
+from decibel.query import clean, tokenize
+from decibel.semantic_cache import normalize_snippet
+
+VERIFY_TTL = int(os.getenv('DECIBEL_VERIFY_TTL', 7 * 24 * 3600))
+# Lyrics missing today may be added upstream, so "unavailable" is kept for less time
+UNAVAILABLE_TTL = 6 * 3600
+# Most seconds the checks get before the ranking is final, within the search's own budget
+VERIFY_BUDGET = float(os.getenv('DECIBEL_VERIFY_BUDGET', 5))
+VERIFY_TOP = 5
+
+VERIFIED_SCORE = 0.7
+# Longer snippets only cost time; the first words are enough to place them
+MAX_SNIPPET_WORDS = 30
+
+# Cost of aligning a snippet word with a lyric word that merely sounds the same
+_SOUNDALIKE_COST = 0.3
+
+
+def verification_cache():
+    return get_cache('verify', ttl=VERIFY_TTL, max_memory_items=1024, max_disk_items=100000)
+
+
+def align(snippet, lyrics):
+    """How well snippet occurs somewhere in lyrics, from 0 (not at all) to 1 (verbatim)
+
+    A word-level semi-global alignment: the snippet must be matched in full, but may
+    start and end anywhere in the lyrics. Words cost 1 to skip or insert, and nothing
+    to match, or a little when they only share a phonetic key ("bandu"/"bandhu").
+    """
+    query = tokenize(snippet)[:MAX_SNIPPET_WORDS]
+    text = tokenize(lyrics)
+    if not query or not text:
+        return 0.0
+    query_keys = [phonetic_key(w) for w in query]
+    text_keys = [phonetic_key(w) for w in text]
+
+    # previous[j]: cheapest alignment of the snippet so far ending just before text[j]
+    previous = [0.0] * (len(text) + 1)
+    for i, word in enumerate(query, 1):
+        current = [float(i)] + [0.0] * len(text)
+        key = query_keys[i - 1]
+        for j, other in enumerate(text, 1):
+            if word == other:
+                substitution = 0.0
+            elif key and key == text_keys[j - 1]:
+                substitution = _SOUNDALIKE_COST
+            else:
+                substitution = 1.0
+            current[j] = min(previous[j - 1] + substitution, previous[j] + 1, current[j - 1] + 1)
+        previous = current
+    return max(0.0, 1.0 - min(previous) / len(query))
+
+
+async def _check(snippet, song, cache_key):
+    """Look up a song's lyrics and align the snippet; the verdict is cached
+
+    None when the providers could not be reached, since that proves nothing.
+    """
+    with metrics.span('verify') as span:
+        result, outcome = await lookup_lyrics_outcome_async(song.get('artist', ''), song.get('title', ''))
+        if outcome == 'failed':
+            # An outage says nothing about the song; leave it unchecked and uncached
+            span.outcome = 'failed'
+            return None
+        if not result or not result.get('lyrics'):
+            span.outcome = 'unavailable'
+            verdict = {'available': False, 'score': 0.0}
+            await asyncio.to_thread(verification_cache().set, cache_key, verdict, UNAVAILABLE_TTL)
+            return verdict
+        score = await asyncio.to_thread(align, snippet, result['lyrics'])
+        span.outcome = 'verified' if score >= VERIFIED_SCORE else 'mismatch'
+        verdict = {'available': True, 'score': score}
+        await asyncio.to_thread(verification_cache().set, cache_key, verdict)
+        return verdict
+
+
+def rerank(songs, verdicts):
+    """Songs annotated with their verdicts: verified first, unavailable last
+
+    Checked songs get 'lyrics_available', 'verified' and a 'confidence' that is the
+    alignment score as a percentage; the model's own is kept as 'model_confidence'.
+    Within each group the incoming order is kept.
+    """
+    ranked = []
+    for position, song in enumerate(songs):
+        verdict = verdicts.get(position)
+        if verdict is None:
+            ranked.append(((1, 0), song))
+            continue
+        song = dict(song, lyrics_available=verdict['available'],
+                    verified=verdict['score'] >= VERIFIED_SCORE,
+                    model_confidence=song.get('confidence', 0))
+        if not verdict['available']:
+            ranked.append(((3, 0), song))
+            continue
+        song['confidence'] = int(round(verdict['score'] * 100))
+        ranked.append(((0, -verdict['score']) if song['verified'] else (2, 0), song))
+    ranked.sort(key=lambda item: item[0])
+    return [song for _, song in ranked]
+
+
+async def verify_songs_stream(snippet, songs, limit=VERIFY_TOP, deadline=None):
+    """Yield songs re-ranked by verification, again each time another check finishes
+
+    Cached verdicts apply to the first list yielded. Checks still running after
+    VERIFY_BUDGET seconds, or at deadline (an event loop time) if that comes first, are
+    abandoned (their lookups finish in the background and
+    fill the lyrics cache) and those songs stay unchecked.
+    """
+    cleaned = clean(snippet)
+    snippet_key = normalize_snippet(cleaned)
+    keys = [normalize_key(snippet_key, song.get('artist'), song.get('title')) for song in songs[:limit]]
+    # The verdict cache is SQLite-backed; read it off the event loop
+    cached = await asyncio.to_thread(lambda: [verification_cache().get(key) for key in keys])
+    verdicts = {}
+    tasks = {}
+    for position, (song, cache_key, verdict) in enumerate(zip(songs, keys, cached)):
+        if verdict is not None:
+            verdicts[position] = verdict
+        else:
+            tasks[asyncio.ensure_future(_check(cleaned, song, cache_key))] = position
+    yield rerank(songs, verdicts)
+
+    loop = asyncio.get_running_loop()
+    deadline = min(loop.time() + VERIFY_BUDGET, deadline or float('inf'))
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=deadline - loop.time(),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                position = tasks.pop(task)
+                if not task.cancelled() and task.exception() is None and task.result() is not None:
+                    verdicts[position] = task.result()
+            yield rerank(songs, verdicts)
+    finally:
+        for task in tasks:
+            task.cancel()
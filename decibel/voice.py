@@ -0,0 +1,155 @@
+"""Streaming voice capture: chunked microphone input, partial transcripts, stable phrases
+
+The microphone is read in small chunks instead of one blocking listen(). While the
+user is still singing, the clip so far is re-transcribed every PARTIAL_INTERVAL
+seconds on a worker thread, and words that two partial transcripts in a row agree on
+are reported as a stable phrase, so a search can start before recording ends.
+"""
+import logging
+import math
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from decibel import metrics, module_available
+from decibel.stt import transcribe_audio
+
+VOICE_AVAILABLE = module_available('speech_recognition')
+
+logger = logging.getLogger(__name__)
+
+# Seconds of new audio between partial transcriptions
+PARTIAL_INTERVAL = 1.5
+# Recording stops after this much silence once the user has started, or at MAX_SECONDS
+SILENCE_SECONDS = 1.2
+MAX_SECONDS = 12
+# How long to wait for the user to start
+START_TIMEOUT = 8
+# Audio kept from just before speech was detected, so the first word is not clipped
+PRE_ROLL_SECONDS = 0.3
+
+# A stable phrase needs this many words, and each utterance fires at most this many
+STABLE_WORDS = 3
+MAX_STABLE_PHRASES = 3
+
+
+def rms(chunk, sample_width):
+    """Loudness of a chunk of little-endian PCM audio"""
+    if sample_width != 2:
+        import audioop
+        return audioop.rms(chunk, sample_width)
+    samples = array('h', chunk[:len(chunk) - len(chunk) % 2])
+    if not samples:
+        return 0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def normalize_phrase(text):
+    return ' '.join(text.lower().split())
+
+
+class PhraseTracker:
+    """Turns successive partial transcripts into stable phrases worth searching early
+
+    A phrase is the word prefix two partials in a row agree on. Each one is reported
+    once, only when it has grown, and at most max_phrases times per utterance.
+    """
+
+    def __init__(self, min_words=STABLE_WORDS, max_phrases=MAX_STABLE_PHRASES):
+        self.min_words = min_words
+        self.max_phrases = max_phrases
+        self.previous = []
+        self.stable = []
+        self.fired = 0
+
+    def feed(self, text):
+        words = normalize_phrase(text).split()
+        agreed = 0
+        for a, b in zip(self.previous, words):
+            if a != b:
+                break
+            agreed += 1
+        self.previous = words
+        if agreed >= self.min_words and agreed > len(self.stable) and self.fired < self.max_phrases:
+            self.stable = words[:agreed]
+            self.fired += 1
+            return ' '.join(self.stable)
+        return None
+
+
+def recognize(recognizer, audio, engine='google', kind='final'):
+    """Transcribe an AudioData clip; '' when nothing intelligible was heard"""
+    with metrics.span('voice_recognition', engine=engine, kind=kind):
+        return transcribe_audio(recognizer, audio, engine)
+
+
+def stream_transcripts(recognizer, source, engine='google'):
+    """Record from an open sr.Microphone, yielding (kind, text) as the transcript forms
+
+    kind is 'partial' for each new partial transcript, 'stable' for a phrase that is
+    settled enough to search for, and 'final' once for the whole utterance. Raises
+    sr.WaitTimeoutError if nobody starts singing within START_TIMEOUT and
+    sr.UnknownValueError if the final clip has no intelligible words. engine is
+    'google' or a local engine from decibel.stt.
+    """
+    import speech_recognition as sr
+    chunk_seconds = source.CHUNK / source.SAMPLE_RATE
+
+    def clip(frames):
+        return sr.AudioData(b''.join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+    def loud(chunk):
+        return rms(chunk, source.SAMPLE_WIDTH) > recognizer.energy_threshold
+
+    # Wait for the first loud chunk, keeping a little audio from just before it
+    pre_roll = deque(maxlen=max(1, int(PRE_ROLL_SECONDS / chunk_seconds)))
+    waited = 0.0
+    while True:
+        chunk = source.stream.read(source.CHUNK)
+        pre_roll.append(chunk)
+        if loud(chunk):
+            break
+        waited += chunk_seconds
+        if waited > START_TIMEOUT:
+            raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+
+    frames = list(pre_roll)
+    heard = silence = since_partial = 0.0
+    tracker = PhraseTracker()
+    last_partial = ''
+    pending = None
+    # Partial transcriptions run beside the capture so reading the microphone never stalls
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='decibel-voice')
+    try:
+        while heard < MAX_SECONDS and silence < SILENCE_SECONDS:
+            chunk = source.stream.read(source.CHUNK)
+            frames.append(chunk)
+            heard += chunk_seconds
+            since_partial += chunk_seconds
+            silence = 0.0 if loud(chunk) else silence + chunk_seconds
+
+            if pending is not None and pending.done():
+                try:
+                    text = pending.result()
+                except Exception as e:
+                    logger.info("partial transcription failed: %s", e)
+                    text = ''
+                pending = None
+                if text and text != last_partial:
+                    last_partial = text
+                    yield 'partial', text
+                    phrase = tracker.feed(text)
+                    if phrase:
+                        yield 'stable', phrase
+
+            if pending is None and since_partial >= PARTIAL_INTERVAL:
+                pending = pool.submit(recognize, recognizer, clip(frames), engine, 'partial')
+                since_partial = 0.0
+    finally:
+        # A partial still in flight is no longer needed; don't wait for it
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    text = recognize(recognizer, clip(frames), engine)
+    if not text:
+        raise sr.UnknownValueError()
+    yield 'final', text
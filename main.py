@@ -1,27 +1,27 @@
 import streamlit as st
-import requests
-from urllib.parse import quote
+import streamlit.components.v1 as components
 import warnings
-import json
 import os
+import html
+import json
+import hashlib
+import uuid
 from dotenv import load_dotenv
+from decibel import aio, metrics, routing, stt
+from decibel.batch import iter_batch, parse_pairs
+from decibel.cache import CACHE_DIR
+from decibel.gemini import GEMINI_AVAILABLE
+from decibel.lookup import lookup_lyrics, lookup_synced, lyrics_cache
+from decibel.semantic_cache import snippet_cache
+from decibel.index import lyrics_index
+from decibel.store import lyrics_store, resolve, to_ref
+from decibel.search import search_lyrics_async, search_lyrics_stream
+from decibel.prefetch import prefetcher
+from decibel.providers import PROVIDERS
+# speech_recognition is only imported when voice search is first used
+from decibel.voice import VOICE_AVAILABLE, normalize_phrase, stream_transcripts
 warnings.filterwarnings('ignore')
 
-# Load environment variables from .env file
-load_dotenv()
-
-try:
-    import speech_recognition as sr
-    VOICE_AVAILABLE = True
-except ImportError:
-    VOICE_AVAILABLE = False
-
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-
 # Page configuration
 st.set_page_config(
     page_title="Decibel - Lyrics Finder",
@@ -30,506 +30,238 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Enhanced Custom CSS with modern design
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;600;700&display=swap');
-    
-    * {
-        font-family: 'Poppins', sans-serif;
-    }
-    
-    .main {
-        background: linear-gradient(135deg, #0f0c29 0%, #302b63 50%, #24243e 100%);
-    }
-    
-    .stApp {
-        background: linear-gradient(135deg, #0f0c29 0%, #302b63 50%, #24243e 100%);
-    }
-    
-    /* Hero Header */
-    .hero-header {
-        text-align: center;
-        padding: 2rem 0 3rem 0;
-        background: linear-gradient(135deg, rgba(29, 185, 84, 0.1) 0%, rgba(30, 215, 96, 0.05) 100%);
-        border-radius: 20px;
-        margin-bottom: 2rem;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-    }
-    
-    .hero-title {
-        font-size: 4rem;
-        font-weight: 700;
-        background: linear-gradient(135deg, #1DB954 0%, #1ed760 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 0.5rem;
-        letter-spacing: -2px;
-    }
-    
-    .hero-subtitle {
-        font-size: 1.3rem;
-        color: #b3b3b3;
-        font-weight: 300;
-        margin-top: 0;
-    }
-    
-    .hero-icon {
-        font-size: 3rem;
-        margin-bottom: 1rem;
-        animation: pulse 2s infinite;
-    }
-    
-    @keyframes pulse {
-        0%, 100% { transform: scale(1); }
-        50% { transform: scale(1.1); }
-    }
-    
-    /* Lyrics Display */
-    .lyrics-box {
-        background: linear-gradient(135deg, rgba(18, 18, 18, 0.95) 0%, rgba(28, 28, 28, 0.9) 100%);
-        padding: 3rem;
-        border-radius: 20px;
-        border: 2px solid rgba(29, 185, 84, 0.3);
-        box-shadow: 0 15px 50px rgba(0, 0, 0, 0.5), inset 0 1px 0 rgba(255, 255, 255, 0.1);
-        white-space: pre-wrap;
-        font-family: 'Courier New', monospace;
-        max-height: 600px;
-        overflow-y: auto;
-        color: #e0e0e0;
-        font-size: 1.1rem;
-        line-height: 1.8;
-        backdrop-filter: blur(10px);
-    }
-    
-    .lyrics-box::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    .lyrics-box::-webkit-scrollbar-track {
-        background: rgba(0, 0, 0, 0.3);
-        border-radius: 10px;
-    }
-    
-    .lyrics-box::-webkit-scrollbar-thumb {
-        background: linear-gradient(135deg, #1DB954 0%, #1ed760 100%);
-        border-radius: 10px;
-    }
-    
-    /* Message Boxes */
-    .success-message {
-        padding: 1.5rem;
-        background: linear-gradient(135deg, rgba(29, 185, 84, 0.2) 0%, rgba(30, 215, 96, 0.1) 100%);
-        border-left: 5px solid #1DB954;
-        border-radius: 15px;
-        color: #1ed760;
-        margin: 1rem 0;
-        box-shadow: 0 4px 15px rgba(29, 185, 84, 0.2);
-        backdrop-filter: blur(10px);
-    }
-    
-    .error-message {
-        padding: 1.5rem;
-        background: linear-gradient(135deg, rgba(220, 53, 69, 0.2) 0%, rgba(255, 107, 107, 0.1) 100%);
-        border-left: 5px solid #dc3545;
-        border-radius: 15px;
-        color: #ff6b6b;
-        margin: 1rem 0;
-        box-shadow: 0 4px 15px rgba(220, 53, 69, 0.2);
-        backdrop-filter: blur(10px);
-    }
-    
-    .info-message {
-        padding: 1.5rem;
-        background: linear-gradient(135deg, rgba(23, 162, 184, 0.2) 0%, rgba(93, 173, 226, 0.1) 100%);
-        border-left: 5px solid #17a2b8;
-        border-radius: 15px;
-        color: #5dade2;
-        margin: 1rem 0;
-        box-shadow: 0 4px 15px rgba(23, 162, 184, 0.2);
-        backdrop-filter: blur(10px);
-    }
-    
-    /* Song Cards */
-    .song-card {
-        background: linear-gradient(135deg, rgba(29, 185, 84, 0.15) 0%, rgba(30, 215, 96, 0.08) 100%);
-        padding: 1.5rem;
-        border-radius: 15px;
-        border: 2px solid rgba(29, 185, 84, 0.4);
-        margin: 0.8rem 0;
-        transition: all 0.3s ease;
-        box-shadow: 0 5px 20px rgba(0, 0, 0, 0.3);
-        backdrop-filter: blur(10px);
-    }
-    
-    .song-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 10px 30px rgba(29, 185, 84, 0.3);
-        border-color: #1DB954;
-    }
-    
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2rem;
-        background: rgba(18, 18, 18, 0.6);
-        border-radius: 15px;
-        padding: 0.5rem;
-        backdrop-filter: blur(10px);
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        height: 60px;
-        background: transparent;
-        border-radius: 10px;
-        color: #b3b3b3;
-        font-weight: 500;
-        font-size: 1.1rem;
-        transition: all 0.3s ease;
-    }
-    
-    .stTabs [data-baseweb="tab"]:hover {
-        background: rgba(29, 185, 84, 0.1);
-        color: #1ed760;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background: linear-gradient(135deg, #1DB954 0%, #1ed760 100%);
-        color: white !important;
-    }
-    
-    /* Buttons */
-    .stButton > button {
-        background: linear-gradient(135deg, #1DB954 0%, #1ed760 100%);
-        color: white;
-        border: none;
-        border-radius: 12px;
-        padding: 0.75rem 2rem;
-        font-weight: 600;
-        font-size: 1rem;
-        transition: all 0.3s ease;
-        box-shadow: 0 5px 15px rgba(29, 185, 84, 0.3);
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 25px rgba(29, 185, 84, 0.5);
-    }
-    
-    /* Input Fields */
-    .stTextInput > div > div > input,
-    .stTextArea > div > div > textarea {
-        background: rgba(18, 18, 18, 0.8);
-        border: 2px solid rgba(29, 185, 84, 0.3);
-        border-radius: 12px;
-        color: #e0e0e0;
-        font-size: 1rem;
-        padding: 0.75rem;
-        transition: all 0.3s ease;
-        backdrop-filter: blur(10px);
-    }
-    
-    .stTextInput > div > div > input:focus,
-    .stTextArea > div > div > textarea:focus {
-        border-color: #1DB954;
-        box-shadow: 0 0 20px rgba(29, 185, 84, 0.3);
-    }
-    
-    /* Section Headers */
-    h3 {
-        color: #1ed760;
-        font-weight: 600;
-        margin-bottom: 1.5rem;
-        font-size: 1.5rem;
-    }
-    
-    /* Footer */
-    .footer {
-        text-align: center;
-        padding: 2rem;
-        margin-top: 3rem;
-        color: #666;
-        font-size: 0.9rem;
-        border-top: 1px solid rgba(255, 255, 255, 0.1);
-    }
-    
-    /* Badges */
-    .badge {
-        display: inline-block;
-        padding: 4px 12px;
-        border-radius: 8px;
-        font-size: 0.85em;
-        font-weight: 600;
-        margin-left: 8px;
-    }
-    
-    /* Progress bar */
-    .stProgress > div > div > div {
-        background: linear-gradient(135deg, #1DB954 0%, #1ed760 100%);
-    }
-    
-    /* Expander */
-    .streamlit-expanderHeader {
-        background: rgba(18, 18, 18, 0.6);
-        border-radius: 10px;
-        color: #b3b3b3;
-        font-weight: 500;
-    }
-    
-    .streamlit-expanderHeader:hover {
-        color: #1ed760;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-def fetch_lyrics(artist, song):
-    """Fetch lyrics from multiple APIs"""
-    # Try API 1: lyrics-api.fly.dev
-    try:
-        url = f'https://lyrics-api.fly.dev/api/lyrics/{quote(artist)}/{quote(song)}'
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'lyrics' in data and data['lyrics']:
-                return {
-                    'title': data.get('title', song),
-                    'artist': data.get('artist', artist),
-                    'lyrics': data['lyrics'],
-                    'source': 'lyrics-api.fly.dev'
-                }
-    except:
-        pass
-    
-    # Try API 2: lrclib.net
-    try:
-        url = 'https://lrclib.net/api/get'
-        params = {'artist_name': artist, 'track_name': song}
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            lyrics = data.get('plainLyrics', '')
-            if lyrics:
-                return {
-                    'title': data.get('trackName', song),
-                    'artist': data.get('artistName', artist),
-                    'lyrics': lyrics,
-                    'source': 'lrclib.net'
-                }
-    except:
-        pass
-    
-    return None
-
-def identify_song_with_gemini(lyrics_text, api_key):
-    """Use Gemini to identify song from lyrics with improved prompting"""
-    if not GEMINI_AVAILABLE or not api_key:
-        return None
-    
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        
-        # Enhanced prompt with better instructions
-        prompt = f"""You are an expert music librarian with extensive knowledge of songs across all genres, languages, and eras.
+@st.cache_resource
+def load_config():
+    """One-time process setup, shared by every session and rerun"""
+    # Load environment variables from .env file
+    load_dotenv()
+    # Start the shared event loop now rather than on the first search
+    aio.get_loop()
+    # Load a local speech model in the background so the first voice search doesn't wait for it
+    if stt.default_engine() in stt.ENGINES:
+        stt.local_engine(stt.default_engine()).warm()
+    return {'gemini_api_key': os.getenv('GEMINI_API_KEY', '')}
 
-A user has provided these lyrics or sung words:
-"{lyrics_text}"
+@st.cache_resource
+def load_css():
+    """Read the stylesheet once per process"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'style.css'), encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
-TASK: Identify the most likely songs that contain these lyrics.
+config = load_config()
 
-ANALYSIS INSTRUCTIONS:
-1. Consider exact phrase matches first
-2. Look for distinctive phrases or memorable lines
-3. Consider phonetic similarities (the user might have misheard)
-4. Consider translations or alternate versions
-5. Include songs from all languages and regions
-6. Consider both popular hits and lesser-known tracks
-
-CONFIDENCE SCORING:
-- 90-100: Exact or near-exact lyric match
-- 70-89: Strong match with minor variations
-- 50-69: Partial match or similar phrasing
-- 30-49: Possible match based on keywords
-- Below 30: Low confidence match
+# Enhanced Custom CSS with modern design
+st.markdown(load_css(), unsafe_allow_html=True)
 
-OUTPUT FORMAT (JSON ONLY):
-[
-  {{
-    "title": "Exact Song Title",
-    "artist": "Artist Name (or Multiple Artists if applicable)",
-    "album": "Album Name",
-    "year": "Release Year",
-    "language": "Language",
-    "confidence": 95,
-    "matching_phrase": "the specific phrase that matched",
-    "genre": "Genre"
-  }}
-]
+def fetch_lyrics(artist, song):
+    """Fetch lyrics from the cache, or from all providers at once on a miss"""
+    return lookup_lyrics(artist, song)
 
-REQUIREMENTS:
-- Return TOP 8 matches, ordered by confidence (highest first)
-- Only include songs with confidence >= 30
-- If no matches found, return empty array: []
-- Provide accurate metadata (double-check artist spelling)
-- RESPOND WITH ONLY THE JSON ARRAY - NO OTHER TEXT
+def karaoke_html(synced):
+    """Self-contained player that highlights each synced line as it is sung"""
+    lines = "".join(f'<div class="line" id="l{i}">{html.escape(text) or "♪"}</div>' for i, (_, text) in enumerate(synced.lines()))
+    offsets = json.dumps(list(synced.offsets))
+    return f"""
+    <style>
+        body {{ margin: 0; font-family: sans-serif; background: transparent; }}
+        .controls button {{ background: #1ed760; border: none; border-radius: 20px; padding: 6px 16px; margin-right: 6px; cursor: pointer; font-weight: bold; }}
+        .clock {{ color: #b3b3b3; margin-left: 8px; }}
+        .lines {{ height: 320px; overflow-y: auto; margin-top: 10px; padding: 8px; }}
+        .line {{ color: #666; font-size: 1.15em; padding: 4px 0; transition: all 0.2s; }}
+        .line.past {{ color: #999; }}
+        .line.current {{ color: #1ed760; font-size: 1.45em; font-weight: bold; }}
+    </style>
+    <div class="controls">
+        <button onclick="toggle()" id="play">▶ Play</button><button onclick="restart()">⟲ Restart</button>
+        <span class="clock" id="clock">0:00</span>
+    </div>
+    <div class="lines" id="lines">{lines}</div>
+    <script>
+        const offsets = {offsets};
+        let startedAt = null, position = 0, current = -2;
+        function lineAt(ms) {{
+            let lo = 0, hi = offsets.length;
+            while (lo < hi) {{ const mid = (lo + hi) >> 1; if (offsets[mid] <= ms) lo = mid + 1; else hi = mid; }}
+            return lo - 1;
+        }}
+        function now() {{ return startedAt === null ? position : position + (performance.now() - startedAt); }}
+        function render() {{
+            const ms = now(), index = lineAt(ms);
+            const seconds = Math.floor(ms / 1000);
+            document.getElementById('clock').textContent = Math.floor(seconds / 60) + ':' + String(seconds % 60).padStart(2, '0');
+            if (index !== current) {{
+                current = index;
+                offsets.forEach((_, i) => {{
+                    const el = document.getElementById('l' + i);
+                    el.className = 'line' + (i === index ? ' current' : i < index ? ' past' : '');
+                }});
+                if (index >= 0) document.getElementById('l' + index).scrollIntoView({{block: 'center', behavior: 'smooth'}});
+            }}
+            if (startedAt !== null) requestAnimationFrame(render);
+        }}
+        function toggle() {{
+            if (startedAt === null) {{ startedAt = performance.now(); document.getElementById('play').textContent = '⏸ Pause'; requestAnimationFrame(render); }}
+            else {{ position = now(); startedAt = null; document.getElementById('play').textContent = '▶ Play'; }}
+        }}
+        function restart() {{ position = 0; if (startedAt !== null) startedAt = performance.now(); current = -2; render(); }}
+        render();
+    </script>
+    """
 
-Begin analysis:"""
+def song_card_html(song):
+    """HTML card for one matching song, with confidence and source badges"""
+    # Confidence badge
+    confidence_badge = ""
+    if song.get('confidence'):
+        conf = song['confidence']
+        if conf >= 80:
+            color = "#1ed760"
+            emoji = "🎯"
+        elif conf >= 60:
+            color = "#ffd54f"
+            emoji = "👍"
+        else:
+            color = "#ff6b6b"
+            emoji = "❓"
+        confidence_badge = f"<span class='badge' style='background-color: {color};'>{emoji} {conf}%</span>"
+    
+    # Source badge
+    source_badge = ""
+    if song.get('source') == 'gemini_ai':
+        source_badge = "<span class='badge' style='background-color: rgba(66, 133, 244, 0.3); color: #4285f4;'>🤖 AI</span>"
+    elif song.get('source') == 'local_index':
+        source_badge = "<span class='badge' style='background-color: rgba(29, 185, 84, 0.3); color: #1ed760;'>⚡ Local</span>"
 
-        # Configure generation parameters for better results
-        generation_config = {
-            'temperature': 0.3,
-            'top_p': 0.8,
-            'top_k': 40,
-            'max_output_tokens': 2048,
-        }
-        
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
-        result_text = response.text.strip()
-        
-        # Clean up response - remove markdown code blocks if present
-        if result_text.startswith('```'):
-            lines = result_text.split('\n')
-            result_text = '\n'.join(lines[1:-1]) if len(lines) > 2 else result_text
-            result_text = result_text.replace('```json', '').replace('```', '').strip()
-        
-        # Extract JSON from response
-        if result_text.startswith('['):
-            songs = json.loads(result_text)
-            
-            # Filter out low confidence results
-            filtered_songs = [s for s in songs if s.get('confidence', 0) >= 30]
-            
-            # Sort by confidence
-            filtered_songs.sort(key=lambda x: x.get('confidence', 0), reverse=True)
-            
-            return filtered_songs[:8] if filtered_songs else None
-        
-        return None
-        
-    except json.JSONDecodeError as e:
-        st.warning(f"⚠️ Gemini returned invalid format. Trying fallback search...")
-        return None
-    except Exception as e:
-        st.error(f"Gemini API error: {str(e)}")
-        return None
+    # Verification badge: did the song's lyrics contain the snippet?
+    verified_badge = ""
+    if song.get('verified'):
+        verified_badge = "<span class='badge' style='background-color: rgba(29, 185, 84, 0.3); color: #1ed760;'>✓ Lyrics match</span>"
+    elif song.get('lyrics_available') is False:
+        verified_badge = "<span class='badge' style='background-color: rgba(136, 136, 136, 0.3); color: #888;'>🚫 No lyrics</span>"
+    
+    # Build metadata string
+    metadata_parts = []
+    if song.get('year'):
+        metadata_parts.append(f"📅 {song['year']}")
+    if song.get('language'):
+        metadata_parts.append(f"🌐 {song['language']}")
+    if song.get('genre'):
+        metadata_parts.append(f"🎸 {song['genre']}")
+    
+    metadata_str = " • ".join(metadata_parts)
+    
+    # Matching phrase display
+    matching_phrase = ""
+    if song.get('matching_phrase'):
+        phrase = song['matching_phrase'][:60]
+        if len(song['matching_phrase']) > 60:
+            phrase += "..."
+        matching_phrase = f"<br><span style='color: #888; font-size: 0.9em; font-style: italic;'>💬 \"{phrase}\"</span>"
+    
+    return f"""
+    <div class="song-card">
+        <div style="margin-bottom: 0.5rem;">
+            <strong style="font-size: 1.3em; color: #1ed760;">🎵 {song['title']}</strong> 
+            {confidence_badge} {source_badge} {verified_badge}
+        </div>
+        <div style="color: #b3b3b3; font-size: 1.1em; margin-bottom: 0.3rem;">
+            🎤 {song['artist']}
+        </div>
+        {f"<div style='color: #888; margin-bottom: 0.3rem;'>💿 {song['album']}</div>" if song.get('album') else ""}
+        {f"<div style='color: #666; font-size: 0.9em;'>{metadata_str}</div>" if metadata_str else ""}
+        {matching_phrase}
+    </div>
+    """
 
 def search_by_lyrics_text(lyrics_text, api_key):
-    """Search for songs using lyrics text - enhanced version with better preprocessing"""
-    songs_found = []
-    
-    # Preprocess the input
-    cleaned_lyrics = lyrics_text.strip()
+    """Search for songs using lyrics text - local index first, then Gemini and lrclib
     
-    # Remove common filler words for better matching
-    filler_words = ['like', 'um', 'uh', 'you know', 'i mean', 'basically']
-    for filler in filler_words:
-        cleaned_lyrics = cleaned_lyrics.replace(filler, ' ')
-    
-    # Normalize spaces
-    cleaned_lyrics = ' '.join(cleaned_lyrics.split())
-    
-    # Priority 1: Use Gemini AI if available
-    if GEMINI_AVAILABLE and api_key:
-        with st.spinner("🤖 Using Gemini AI to identify the song..."):
-            gemini_results = identify_song_with_gemini(cleaned_lyrics, api_key)
-        
-        if gemini_results:
-            for song in gemini_results:
-                songs_found.append({
-                    'title': song.get('title', 'Unknown'),
-                    'artist': song.get('artist', 'Unknown'),
-                    'album': song.get('album', ''),
-                    'year': song.get('year', ''),
-                    'language': song.get('language', ''),
-                    'confidence': song.get('confidence', 0),
-                    'matching_phrase': song.get('matching_phrase', ''),
-                    'genre': song.get('genre', ''),
-                    'source': 'gemini_ai'
-                })
-            
-            if songs_found:
-                return songs_found
-    
-    # Fallback: Try lrclib.net search with cleaned input
-    try:
-        url = 'https://lrclib.net/api/search'
-        params = {'q': cleaned_lyrics[:100]}
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data and isinstance(data, list):
-                for item in data[:8]:
-                    songs_found.append({
-                        'title': item.get('trackName', item.get('name', 'Unknown')),
-                        'artist': item.get('artistName', item.get('artist', 'Unknown')),
-                        'album': item.get('albumName', ''),
-                        'source': 'lrclib'
-                    })
-                if songs_found:
-                    return songs_found
-    except Exception as e:
-        pass
+    Matches are previewed as cards while they stream in, before the full list is ready.
+    """
+    errors = []
+    songs_found = []
+    spinner = "🤖 Using Gemini AI to identify the song..." if GEMINI_AVAILABLE and api_key else "🔍 Searching lyrics databases..."
+    preview = st.empty()
+    with st.spinner(spinner):
+        for songs_found in search_lyrics_stream(lyrics_text, api_key, errors):
+            preview.markdown("".join(song_card_html(song) for song in songs_found), unsafe_allow_html=True)
+    preview.empty()
     
-    # Try search by partial match with better keyword extraction
-    try:
-        # Extract meaningful words (longer than 3 characters)
-        words = cleaned_lyrics.strip().split()
-        meaningful_words = [w for w in words if len(w) > 3][:5]
-        
-        if not meaningful_words:
-            meaningful_words = words[:5]
-        
-        search_query = ' '.join(meaningful_words)
-        
-        url = f'https://lrclib.net/api/search'
-        params = {'q': search_query}
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data and isinstance(data, list):
-                for item in data[:8]:
-                    songs_found.append({
-                        'title': item.get('trackName', 'Unknown'),
-                        'artist': item.get('artistName', 'Unknown'),
-                        'album': item.get('albumName', ''),
-                        'source': 'lrclib'
-                    })
-    except Exception as e:
-        pass
+    for level, message in errors:
+        getattr(st, level)(message)
     
     return songs_found
 
-def record_audio():
-    """Record audio from microphone"""
+def record_audio(api_key, engine='google'):
+    """Record from the microphone, showing the transcript as it forms and searching early
+    
+    Stable phrases are searched while the user is still singing, and the freshest
+    early matches are shown as they arrive. Returns (text, results, error); results
+    is None unless an early search already covered the whole final transcript.
+    """
     if not VOICE_AVAILABLE:
-        return None, "SpeechRecognition library not installed"
+        return None, None, "SpeechRecognition library not installed"
     
+    import speech_recognition as sr
     recognizer = sr.Recognizer()
+    status = st.empty()
+    transcript = st.empty()
+    early = st.empty()
+    speculative = {}
+    shown = None
+    
+    def show_early_matches():
+        # The longest phrase whose search has finished with results
+        for phrase in reversed(list(speculative)):
+            future = speculative[phrase]
+            if future.done() and not future.cancelled() and not future.exception() and future.result():
+                if phrase != shown:
+                    early.markdown(f"**Early matches for _'{phrase}'_:**" + "".join(song_card_html(song) for song in future.result()), unsafe_allow_html=True)
+                return phrase
+        return shown
     
     try:
         with sr.Microphone() as source:
-            st.info("🎤 Adjusting for background noise... Please wait.")
-            recognizer.adjust_for_ambient_noise(source, duration=1)
-            
-            st.warning("🎤 **LISTENING NOW! Speak or sing the lyrics...**")
-            audio = recognizer.listen(source, timeout=8, phrase_time_limit=12)
-            
-            st.info("🔄 Processing audio...")
-            text = recognizer.recognize_google(audio)
-            return text, None
+            with metrics.span('voice_capture'):
+                status.info("🎤 Adjusting for background noise...")
+                recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                
+                status.warning("🔴 **LISTENING NOW! Speak or sing the lyrics...**")
+                text = None
+                if engine in stt.ENGINES:
+                    # Make sure the model is loading while the user starts singing
+                    stt.local_engine(engine).warm()
+                for kind, value in stream_transcripts(recognizer, source, engine):
+                    if kind == 'partial':
+                        transcript.markdown(f"🎙️ _{value}…_")
+                    elif kind == 'stable':
+                        speculative[value] = aio.submit(search_lyrics_async(value, api_key))
+                    else:
+                        text = value
+                    shown = show_early_matches()
+        
+        status.empty()
+        transcript.empty()
+        early.empty()
+        future = speculative.get(normalize_phrase(text))
+        if future is not None and future.done() and not future.exception():
+            return text, future.result(), None
+        return text, None, None
             
     except sr.WaitTimeoutError:
-        return None, "No audio detected. Please try again."
+        return None, None, "No audio detected. Please try again."
     except sr.UnknownValueError:
-        return None, "Could not understand audio. Please speak more clearly."
+        return None, None, "Could not understand audio. Please speak more clearly."
     except sr.RequestError as e:
-        return None, f"Google Speech API error: {e}"
+        return None, None, f"Google Speech API error: {e}"
+    except OSError as e:
+        return None, None, f"Microphone error: {e}"
     except Exception as e:
-        return None, f"Microphone error: {e}"
+        return None, None, f"Speech recognition error: {e}"
+    finally:
+        # Early searches the final one supersedes
+        for future in speculative.values():
+            future.cancel()
 
 # Initialize session state
 if 'current_lyrics' not in st.session_state:
@@ -539,14 +271,9 @@ if 'search_results' not in st.session_state:
 if 'recognized_text' not in st.session_state:
     st.session_state.recognized_text = ""
 if 'gemini_api_key' not in st.session_state:
-    st.session_state.gemini_api_key = os.getenv('GEMINI_API_KEY', '')
-
-# Configure Gemini if available
-if st.session_state.gemini_api_key and GEMINI_AVAILABLE:
-    try:
-        genai.configure(api_key=st.session_state.gemini_api_key)
-    except Exception as e:
-        st.error(f"❌ Failed to configure Gemini API: {str(e)}")
+    st.session_state.gemini_api_key = config['gemini_api_key']
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Hero Header
 st.markdown("""
@@ -568,7 +295,7 @@ col_left, col_center, col_right = st.columns([1, 6, 1])
 
 with col_center:
     # Create tabs
-    tab1, tab2 = st.tabs(["🔍 Search by Name", "🎤 Search by Lyrics"])
+    tab1, tab2, tab3 = st.tabs(["🔍 Search by Name", "🎤 Search by Lyrics", "📂 Batch Lookup"])
 
     # TAB 1: Traditional Search
     with tab1:
@@ -588,9 +315,8 @@ with col_center:
                     result = fetch_lyrics(artist_input, song_input)
                 
                 if result:
-                    st.session_state.current_lyrics = result
+                    st.session_state.current_lyrics = to_ref(result)
                     st.session_state.search_results = []
-                    st.rerun()
                 else:
                     st.error("❌ Lyrics not found. Please check the spelling and try again.")
             else:
@@ -618,8 +344,9 @@ with col_center:
                     if results:
                         st.session_state.search_results = results
                         st.session_state.current_lyrics = None
+                        # Warm the cache so "View Lyrics" on a top result is instant
+                        prefetcher().schedule(st.session_state.session_id, results)
                         st.success(f"✅ Found {len(results)} matching songs!")
-                        st.rerun()
                     else:
                         st.error("❌ No songs found. Try different lyrics or phrases.")
                 else:
@@ -632,32 +359,29 @@ with col_center:
                 st.caption("Install: `pip install SpeechRecognition pyaudio`")
             else:
                 voice_btn = st.button("🎤 Voice Search", use_container_width=True, type="secondary")
+                engines = stt.available_engines()
+                if len(engines) > 1:
+                    labels = {'google': "Google (online)", 'vosk': "Vosk (offline)", 'whisper': "Whisper (offline)"}
+                    st.selectbox("Recognizer", engines, index=engines.index(stt.default_engine()),
+                                 format_func=labels.get, key='stt_engine')
         
         if VOICE_AVAILABLE and voice_btn:
             st.markdown("---")
-            st.info("🎤 **Get ready! Recording starts in 3 seconds...**")
-            
-            import time
-            progress_bar = st.progress(0)
-            for i in range(3):
-                time.sleep(1)
-                progress_bar.progress((i + 1) / 3)
-            progress_bar.empty()
-            
-            st.warning("🔴 **RECORDING NOW! Speak or sing the lyrics...**")
             
-            text, error = record_audio()
+            engine = st.session_state.get('stt_engine') or stt.default_engine()
+            text, results, error = record_audio(st.session_state.gemini_api_key, engine)
             
             if text:
                 st.session_state.recognized_text = text
                 st.success(f"✅ Recognized: **'{text}'**")
                 
-                results = search_by_lyrics_text(text, st.session_state.gemini_api_key)
+                if results is None:
+                    results = search_by_lyrics_text(text, st.session_state.gemini_api_key)
                 
                 if results:
                     st.session_state.search_results = results
                     st.session_state.current_lyrics = None
-                    st.rerun()
+                    prefetcher().schedule(st.session_state.session_id, results)
                 else:
                     st.warning(f"⚠️ No exact matches found for '{text}'")
                     st.info(f"""
@@ -669,6 +393,49 @@ with col_center:
             else:
                 st.error(f"❌ {error}")
 
+    # TAB 3: Batch Lookup
+    with tab3:
+        st.markdown("### Fetch lyrics for a whole playlist")
+        st.caption("Upload a CSV with `artist` and `title` columns, or a JSON list of songs. Results are saved as they arrive, so an interrupted run picks up where it stopped.")
+        
+        batch_file = st.file_uploader("📂 Playlist file", type=['csv', 'json'])
+        
+        if batch_file is not None:
+            raw = batch_file.getvalue()
+            fmt = 'json' if batch_file.name.lower().endswith('.json') else 'csv'
+            try:
+                pairs = parse_pairs(raw.decode('utf-8-sig'), fmt)
+            except ValueError as e:
+                pairs = []
+                st.error(f"❌ Could not read {batch_file.name}: {e}")
+            
+            # Named after the file contents so re-uploading the same playlist resumes it
+            output_path = os.path.join(CACHE_DIR, 'batches', hashlib.sha1(raw).hexdigest()[:16] + '.jsonl')
+            
+            if pairs:
+                st.write(f"🎵 {len(pairs)} songs in **{batch_file.name}**")
+                
+                if st.button("🚀 Fetch All Lyrics", type="primary", use_container_width=True):
+                    progress_bar = st.progress(0)
+                    status = st.empty()
+                    found = 0
+                    for done, total, record in iter_batch(pairs, output_path):
+                        progress_bar.progress(done / total)
+                        if record:
+                            found += record['found']
+                            status.caption(f"[{done}/{total}] {record['artist']} - {record['title']}")
+                    status.empty()
+                    st.success(f"✅ Batch complete! Found lyrics for {found} new songs.")
+            
+            if os.path.exists(output_path):
+                with open(output_path, 'rb') as f:
+                    st.download_button(
+                        "📥 Download Results (JSONL)",
+                        f.read(),
+                        f"{os.path.splitext(batch_file.name)[0]}_lyrics.jsonl",
+                        use_container_width=True
+                    )
+
     # Display search results with enhanced metadata
     if st.session_state.search_results:
         st.markdown("---")
@@ -678,59 +445,7 @@ with col_center:
             col1, col2 = st.columns([4, 1])
             
             with col1:
-                # Confidence badge
-                confidence_badge = ""
-                if song.get('confidence'):
-                    conf = song['confidence']
-                    if conf >= 80:
-                        color = "#1ed760"
-                        emoji = "🎯"
-                    elif conf >= 60:
-                        color = "#ffd54f"
-                        emoji = "👍"
-                    else:
-                        color = "#ff6b6b"
-                        emoji = "❓"
-                    confidence_badge = f"<span class='badge' style='background-color: {color};'>{emoji} {conf}%</span>"
-                
-                # Source badge
-                source_badge = ""
-                if song.get('source') == 'gemini_ai':
-                    source_badge = "<span class='badge' style='background-color: rgba(66, 133, 244, 0.3); color: #4285f4;'>🤖 AI</span>"
-                
-                # Build metadata string
-                metadata_parts = []
-                if song.get('year'):
-                    metadata_parts.append(f"📅 {song['year']}")
-                if song.get('language'):
-                    metadata_parts.append(f"🌐 {song['language']}")
-                if song.get('genre'):
-                    metadata_parts.append(f"🎸 {song['genre']}")
-                
-                metadata_str = " • ".join(metadata_parts)
-                
-                # Matching phrase display
-                matching_phrase = ""
-                if song.get('matching_phrase'):
-                    phrase = song['matching_phrase'][:60]
-                    if len(song['matching_phrase']) > 60:
-                        phrase += "..."
-                    matching_phrase = f"<br><span style='color: #888; font-size: 0.9em; font-style: italic;'>💬 \"{phrase}\"</span>"
-                
-                st.markdown(f"""
-                <div class="song-card">
-                    <div style="margin-bottom: 0.5rem;">
-                        <strong style="font-size: 1.3em; color: #1ed760;">🎵 {song['title']}</strong> 
-                        {confidence_badge} {source_badge}
-                    </div>
-                    <div style="color: #b3b3b3; font-size: 1.1em; margin-bottom: 0.3rem;">
-                        🎤 {song['artist']}
-                    </div>
-                    {f"<div style='color: #888; margin-bottom: 0.3rem;'>💿 {song['album']}</div>" if song.get('album') else ""}
-                    {f"<div style='color: #666; font-size: 0.9em;'>{metadata_str}</div>" if metadata_str else ""}
-                    {matching_phrase}
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(song_card_html(song), unsafe_allow_html=True)
             
             with col2:
                 st.markdown("<br>", unsafe_allow_html=True)
@@ -739,23 +454,31 @@ with col_center:
                         lyrics = fetch_lyrics(song['artist'], song['title'])
                     
                     if lyrics:
-                        st.session_state.current_lyrics = lyrics
+                        st.session_state.current_lyrics = to_ref(lyrics)
                         st.session_state.search_results = []
                         st.rerun()
                     else:
                         st.error("Lyrics not available for this song")
 
-    # Display lyrics
-    if st.session_state.current_lyrics:
+    # Display lyrics; sessions keep a reference and the body is shared by everyone viewing the song
+    data = resolve(st.session_state.current_lyrics)
+    if data:
         st.markdown("---")
-        data = st.session_state.current_lyrics
         
         st.success(f"✅ Lyrics loaded from **{data['source']}**")
         
         st.markdown(f"## 🎵 {data['title']}")
         st.markdown(f"### 🎤 {data['artist']}")
         
-        st.markdown(f'<div class="lyrics-box">{data["lyrics"]}</div>', unsafe_allow_html=True)
+        try:
+            synced = lookup_synced(data['artist'], data['title'])
+        except Exception:
+            synced = None
+        
+        if synced and st.toggle("🎤 Karaoke mode", help="Highlight each line as it is sung"):
+            components.html(karaoke_html(synced), height=400)
+        else:
+            st.markdown(f'<div class="lyrics-box">{data["lyrics"]}</div>', unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
         
@@ -768,8 +491,16 @@ with col_center:
                 f"{data['artist']}_{data['title']}.txt",
                 use_container_width=True
             )
+            if synced:
+                st.download_button(
+                    "⏱️ Download Synced (.lrc)",
+                    synced.to_lrc(),
+                    f"{data['artist']}_{data['title']}.lrc",
+                    use_container_width=True
+                )
         with col2:
             if st.button("🔄 New Search", use_container_width=True):
+                prefetcher().cancel(st.session_state.session_id)
                 st.session_state.current_lyrics = None
                 st.session_state.search_results = []
                 st.rerun()
@@ -801,4 +532,39 @@ with st.expander("🔧 System Information"):
         st.write(f"Search Results: {len(st.session_state.search_results)}")
         st.write(f"Lyrics Loaded: {'Yes' if st.session_state.current_lyrics else 'No'}")
         if st.session_state.recognized_text:
-            st.write(f"Last Voice: {st.session_state.recognized_text[:30]}...")
\ No newline at end of file
+            st.write(f"Last Voice: {st.session_state.recognized_text[:30]}...")
+        cache_stats = lyrics_cache().stats
+        st.write(f"Lyrics Cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits / {cache_stats['misses']} misses")
+        st.write(f"Indexed Songs: {len(lyrics_index())}")
+        raw_bytes, stored_bytes = lyrics_store().size()
+        st.write(f"Lyrics Store: {len(lyrics_store())} bodies, {raw_bytes / 1024:.0f} KB → {stored_bytes / 1024:.0f} KB on disk")
+        identify_stats = snippet_cache().store.stats
+        st.write(f"AI Cache: {identify_stats['memory_hits'] + identify_stats['disk_hits']} hits / {identify_stats['misses']} misses")
+    
+    st.write("**Lyrics Providers:**")
+    for health in routing.snapshot(PROVIDERS):
+        icon = {'closed': '🟢', 'half-open': '🟡', 'open': '🔴'}[health['state']]
+        latency = f"p50 {health['p50_ms']:.0f} ms / p90 {health['p90_ms']:.0f} ms" if health['p50_ms'] is not None else "not enough samples"
+        st.write(f"{icon} {health['provider']}: {latency}, {health['error_rate']:.0%} errors")
+    
+    st.write("**Stage Latency (recent calls):**")
+    stage_rows = metrics.summary()
+    if stage_rows:
+        st.dataframe([{
+            'Stage': row['stage'],
+            'Detail': row['labels'],
+            'Calls': row['calls'],
+            'Hit Rate': f"{row['hit_rate']:.0%}" if row['hit_rate'] is not None else '—',
+            'Errors': row['errors'],
+            'p50 ms': round(row['p50_ms']),
+            'p95 ms': round(row['p95_ms']),
+            'p99 ms': round(row['p99_ms']),
+        } for row in stage_rows], use_container_width=True, hide_index=True)
+        refresh_col, export_col = st.columns(2)
+        with refresh_col:
+            st.button("🔄 Refresh Timings")
+        with export_col:
+            st.download_button("📈 Export Metrics", metrics.render(), file_name="decibel_metrics.prom",
+                               mime="text/plain")
+    else:
+        st.caption("No lookups or searches timed yet.")
\ No newline at end of file
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Keep every cache, index and store of the test run out of ~/.cache/decibel;
+# set before any decibel module reads it at import time
+os.environ.setdefault('DECIBEL_CACHE_DIR', tempfile.mkdtemp(prefix='decibel-tests-'))
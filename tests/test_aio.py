@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from decibel import aio, gemini, gemini_pool, verify
+
+
+def test_run_sync_returns_and_raises():
+    async def double(x):
+        await asyncio.sleep(0)
+        return 2 * x
+
+    async def fail():
+        raise ValueError('nope')
+
+    assert aio.run_sync(double(21)) == 42
+    with pytest.raises(ValueError):
+        aio.run_sync(fail())
+
+
+def test_run_sync_refuses_to_block_the_shared_loop():
+    async def nested():
+        return aio.run_sync(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError):
+        aio.run_sync(nested())
+
+
+def test_iter_sync_yields_as_produced_and_stops_the_producer():
+    produced = []
+
+    async def numbers():
+        for i in range(100):
+            produced.append(i)
+            yield i
+            await asyncio.sleep(0.001)
+
+    items = []
+    for item in aio.iter_sync(numbers()):
+        items.append(item)
+        if item == 2:
+            break
+    assert items == [0, 1, 2]
+    aio.run_sync(asyncio.sleep(0.02))
+    assert len(produced) < 100
+
+
+class RecordingCache:
+    """Stands in for a cache, noting which thread each call came from"""
+
+    def __init__(self, value=None):
+        self.value = value
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread().name)
+        return self.value
+
+    def set(self, key, value, ttl=None):
+        self.threads.append(threading.current_thread().name)
+
+
+class Reply:
+    text = '[{"title": "Hello", "artist": "Adele", "confidence": 90}]'
+
+
+class FakeModel:
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        return Reply()
+
+
+def test_identification_cache_is_used_off_the_event_loop(monkeypatch):
+    cache = RecordingCache()
+    monkeypatch.setattr(gemini, 'snippet_cache', lambda: cache)
+    monkeypatch.setattr(gemini, 'GEMINI_AVAILABLE', True)
+    gemini_pool.register_model('test-key', gemini_pool.MODEL_NAME, FakeModel())
+
+    songs = aio.run_sync(gemini.identify_song_async('hello from the other side', 'test-key'))
+    assert songs[0]['title'] == 'Hello'
+    assert len(cache.threads) == 2
+    assert 'decibel-loop' not in cache.threads
+
+
+def test_verdict_cache_is_read_off_the_event_loop(monkeypatch):
+    cache = RecordingCache({'available': True, 'score': 1.0})
+    monkeypatch.setattr(verify, 'verification_cache', lambda: cache)
+
+    async def ranked():
+        return [songs async for songs in verify.verify_songs_stream('la la', [{'title': 'A', 'artist': 'B'}])]
+
+    updates = aio.run_sync(ranked())
+    assert updates[-1][0]['verified']
+    assert cache.threads and 'decibel-loop' not in cache.threads
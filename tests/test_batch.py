@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+from decibel import batch
+
+
+def test_parse_csv_and_json():
+    csv_text = 'Artist,Song,Year\nAdele,Hello,2015\n,Untitled,\nQueen, Bohemian Rhapsody ,1975\n'
+    assert batch.parse_pairs(csv_text, 'csv') == [('Adele', 'Hello'), ('Queen', 'Bohemian Rhapsody')]
+    json_text = json.dumps([{'artist_name': 'Adele', 'track': 'Hello'}, ['Queen', 'Bohemian Rhapsody'], ['x']])
+    assert batch.parse_pairs(json_text, 'json') == [('Adele', 'Hello'), ('Queen', 'Bohemian Rhapsody')]
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Outcomes the fake lookup returns per title, and the titles it was asked for"""
+    outcomes = {}
+    asked = []
+
+    async def lookup(artist, title):
+        asked.append(title)
+        outcome = outcomes.get(title, 'miss')
+        if outcome == 'raise':
+            raise RuntimeError('boom')
+        result = {'artist': artist, 'title': title, 'lyrics': 'la la'} if outcome == 'hit' else None
+        return result, outcome
+
+    monkeypatch.setattr(batch, 'lookup_lyrics_outcome_async', lookup)
+    return outcomes, asked
+
+
+def run(pairs, path):
+    return asyncio.run(batch.run_batch_async(pairs, str(path), concurrency=2))
+
+
+def test_summary_counts_each_outcome(tmp_path, lookups):
+    outcomes, asked = lookups
+    outcomes.update({'A': 'hit', 'B': 'miss', 'C': 'failed', 'D': 'raise'})
+    pairs = [('x', 'A'), ('x', 'B'), ('x', 'C'), ('x', 'D'), ('X', 'a')]
+    summary = run(pairs, tmp_path / 'out.jsonl')
+    assert summary == {'total': 4, 'skipped': 0, 'found': 1, 'missing': 1, 'errors': 2}
+    records = {r['title']: r for r in map(json.loads, (tmp_path / 'out.jsonl').read_text().splitlines())}
+    assert records['A']['found'] and records['A']['result']['lyrics'] == 'la la'
+    assert not records['B']['found'] and 'error' not in records['B']
+    assert records['C']['error'] and records['D']['error'] == 'boom'
+
+
+def test_resume_skips_answered_pairs_and_retries_failures(tmp_path, lookups):
+    outcomes, asked = lookups
+    outcomes.update({'A': 'hit', 'B': 'miss', 'C': 'failed'})
+    pairs = [('x', 'A'), ('x', 'B'), ('x', 'C')]
+    run(pairs, tmp_path / 'out.jsonl')
+
+    asked.clear()
+    outcomes['C'] = 'hit'
+    summary = run(pairs, tmp_path / 'out.jsonl')
+    assert asked == ['C']
+    assert summary == {'total': 3, 'skipped': 2, 'found': 1, 'missing': 0, 'errors': 0}
+
+
+def test_truncated_last_line_is_fetched_again(tmp_path, lookups):
+    outcomes, asked = lookups
+    path = tmp_path / 'out.jsonl'
+    path.write_text(json.dumps({'artist': 'x', 'title': 'A', 'found': True}) + '\n{"artist": "x", "ti')
+    run([('x', 'A'), ('x', 'B')], path)
+    assert asked == ['B']
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from decibel.cache import PersistentCache, normalize_key
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.sqlite3')
+
+
+def test_normalize_key_ignores_case_punctuation_and_spacing():
+    assert normalize_key('  The  Beatles ', "Let It Be!") == normalize_key('the beatles', 'let it be')
+    assert normalize_key('AC/DC', None) == 'ac dc|'
+
+
+def test_values_come_from_memory_then_disk(path):
+    cache = PersistentCache('lyrics', path=path)
+    cache.set('k', {'lyrics': 'la la'})
+    assert cache.get('k') == {'lyrics': 'la la'}
+    assert cache.stats['memory_hits'] == 1
+
+    # A new process sees the disk tier
+    other = PersistentCache('lyrics', path=path)
+    assert other.get('k', memory_only=True) is None
+    assert other.get('k') == {'lyrics': 'la la'}
+    assert other.get('k') == {'lyrics': 'la la'}
+    assert (other.stats['disk_hits'], other.stats['memory_hits'], other.stats['misses']) == (1, 1, 0)
+
+
+def test_expired_values_are_misses(path):
+    cache = PersistentCache('lyrics', ttl=60, path=path)
+    cache.set('gone', 'x', ttl=-1)
+    cache.set('kept', 'y')
+    assert cache.get('gone') is None
+    assert 'gone' not in cache
+    assert PersistentCache('lyrics', path=path).get('gone') is None
+    assert cache.get('kept') == 'y'
+    assert cache.stats['misses'] == 1
+
+
+def test_memory_tier_is_lru(path):
+    cache = PersistentCache('lyrics', max_memory_items=2, path=path)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b', memory_only=True) is None
+    assert cache.get('a', memory_only=True) == 1
+    assert cache.stats['evictions'] == 1
+    # Still on disk
+    assert cache.get('b') == 2
+
+
+def test_prune_evicts_least_recently_used_rows_above_the_disk_cap(path):
+    cache = PersistentCache('lyrics', max_disk_items=2, path=path)
+    for key in 'abc':
+        cache.set(key, key)
+        time.sleep(0.001)
+    cache.prune()
+    assert PersistentCache('lyrics', path=path).recent_keys(10) == ['c', 'b']
+
+
+def test_contains_leaves_stats_alone(path):
+    cache = PersistentCache('lyrics', path=path)
+    cache.set('k', 1)
+    assert 'k' in cache and 'other' not in cache
+    assert cache.stats == {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def test_caches_with_different_names_are_separate(path):
+    PersistentCache('lyrics', path=path).set('k', 1)
+    assert PersistentCache('identify', path=path).get('k') is None
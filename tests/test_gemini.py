@@ -0,0 +1,84 @@
+import json
+import re
+
+from decibel import aio, gemini, gemini_pool
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+class BatchModel:
+    """Answers batch prompts, cutting off its reply when asked about more than max_batch snippets"""
+
+    def __init__(self, max_batch):
+        self.max_batch = max_batch
+        self.batches = []
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        snippets = json.loads(re.search(r'own ID:\n(\{.*?\})\n\nTASK', prompt, re.S).group(1))
+        self.batches.append(list(snippets.values()))
+        reply = json.dumps({
+            sid: [{'title': text.title(), 'artist': 'Someone', 'confidence': 90}]
+            for sid, text in snippets.items()
+        })
+        if len(snippets) > self.max_batch:
+            reply = reply[:len(reply) // 2]
+        return Reply(reply)
+
+
+class DictCache(dict):
+    def get(self, key):
+        return dict.get(self, key)
+
+    def set(self, key, value, ttl=None):
+        self[key] = value
+
+
+def identify(monkeypatch, model, snippets, cache=None, max_output_tokens=8192):
+    monkeypatch.setattr(gemini, 'GEMINI_AVAILABLE', True)
+    cache = DictCache() if cache is None else cache
+    monkeypatch.setattr(gemini, 'snippet_cache', lambda: cache)
+    gemini_pool.register_model('test-batch-key', gemini_pool.MODEL_NAME, model)
+    return aio.run_sync(gemini.identify_songs_batch_async(
+        snippets, 'test-batch-key', max_output_tokens=max_output_tokens))
+
+
+def test_batch_size_fits_the_output_budget():
+    assert gemini.batch_size_for(8192, 3) == (8192 - 50) // (3 * gemini.TOKENS_PER_MATCH + 10)
+    assert gemini.batch_size_for(100, 3) == 1
+
+
+def test_one_call_answers_every_snippet(monkeypatch):
+    model = BatchModel(max_batch=10)
+    snippets = ['first line', 'second line', 'third line']
+    results = identify(monkeypatch, model, snippets)
+    assert len(model.batches) == 1
+    assert {s: songs[0]['title'] for s, songs in results.items()} == {s: s.title() for s in snippets}
+
+
+def test_cut_off_reply_splits_the_batch(monkeypatch):
+    model = BatchModel(max_batch=2)
+    snippets = [f'line number {i}' for i in range(5)]
+    results = identify(monkeypatch, model, snippets)
+    assert all(results[s][0]['title'] == s.title() for s in snippets)
+    # 5 fails, then 2 and 3; 3 fails and becomes 1 and 2
+    assert [len(b) for b in model.batches] == [5, 2, 3, 1, 2]
+
+
+def test_cached_and_repeated_snippets_skip_gemini(monkeypatch):
+    model = BatchModel(max_batch=10)
+    cache = DictCache({'known line': [{'title': 'Cached', 'artist': 'A', 'confidence': 95}]})
+    results = identify(monkeypatch, model, ['known line', 'new line', 'new line'], cache)
+    assert results['known line'][0]['title'] == 'Cached'
+    assert model.batches == [['new line']]
+    assert cache['new line'][0]['title'] == 'New Line'
+
+
+def test_snippet_gemini_never_answers_stays_unknown(monkeypatch):
+    class Broken:
+        async def generate_content_async(self, prompt, generation_config=None, stream=False):
+            return Reply('not json')
+
+    assert identify(monkeypatch, Broken(), ['one', 'two']) == {'one': None, 'two': None}
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from decibel import aio, gemini_pool
+from decibel.gemini_pool import GeminiBusyError, TokenBucket, generate
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class Model:
+    """Answers with its name, or raises the errors it was given first"""
+
+    def __init__(self, name, errors=()):
+        self.name = name
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        if not stream:
+            return self.name
+
+        async def chunks():
+            for part in ('one', 'two'):
+                yield part
+        return chunks()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    """Register models under a one-slot pool; returns register(name, model)"""
+    monkeypatch.setattr(gemini_pool, 'MAX_CONCURRENT', 1)
+    monkeypatch.setattr(gemini_pool, 'MODEL_NAME', 'test-primary')
+
+    def register(name, model):
+        gemini_pool.register_model('test-pool-key', name, model)
+        return model
+    return register
+
+
+def run(**kwargs):
+    return aio.run_sync(generate('test-pool-key', 'prompt', {}, **kwargs))
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_the_rate():
+    bucket = TokenBucket(60, capacity=2)
+
+    async def take(count, within):
+        deadline = time.monotonic() + within
+        return [await bucket.acquire(deadline) for _ in range(count)]
+
+    assert asyncio.run(take(3, within=0.1)) == [True, True, False]
+    # One token a second at 60 per minute
+    assert asyncio.run(take(1, within=1.5)) == [True]
+
+
+def test_generate_answers_through_the_pool(models):
+    models('test-primary', Model('primary'))
+    assert run() == 'primary'
+
+
+def test_rate_limit_moves_to_the_fallback_model(models, monkeypatch):
+    primary = models('test-primary', Model('primary', [RateLimited()]))
+    models('test-fallback', Model('fallback'))
+    monkeypatch.setattr(gemini_pool, 'FALLBACK_MODEL_NAME', 'test-fallback')
+    assert run() == 'fallback'
+    assert primary.calls == 1
+
+
+def test_other_errors_are_not_retried(models):
+    model = models('test-primary', Model('primary', [ValueError('bad request')]))
+    with pytest.raises(ValueError):
+        run()
+    assert model.calls == 1
+
+
+def test_stream_holds_its_slot_until_closed(models):
+    models('test-primary', Model('primary'))
+
+    async def scenario():
+        stream = await generate('test-pool-key', 'prompt', {}, stream=True)
+        with pytest.raises(GeminiBusyError):
+            await generate('test-pool-key', 'prompt', {}, timeout=0.05)
+        chunks = [chunk async for chunk in stream]
+        # Read to the end, so the slot is free again
+        return chunks, await generate('test-pool-key', 'prompt', {}, timeout=0.05)
+
+    assert aio.run_sync(scenario()) == (['one', 'two'], 'primary')
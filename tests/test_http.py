@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+import requests
+
+from decibel import http
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ScriptedSession:
+    """Answers each get with the next scripted response, raising it if it is an exception"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    monkeypatch.setattr(http, 'backoff_delay', lambda attempt, retry_after=None: 0)
+
+    def use(*replies):
+        session = ScriptedSession(*replies)
+        monkeypatch.setattr(http, 'session', lambda: session)
+        return session
+    return use
+
+
+def test_backoff_honours_retry_after_up_to_the_cap():
+    assert http.backoff_delay(0, '2') == 2.0
+    assert http.backoff_delay(0, '60') == 4.0
+    for attempt in range(6):
+        assert 0 <= http.backoff_delay(attempt) <= min(4.0, 0.25 * 2 ** attempt)
+
+
+def test_retryable_statuses_and_connection_errors_are_retried(scripted):
+    session = scripted(Response(503), requests.ConnectionError('reset'), Response(200))
+    assert http.get('https://lrclib.net/api/get').status_code == 200
+    assert session.calls == 3
+
+
+def test_other_statuses_are_returned_at_once(scripted):
+    session = scripted(Response(404))
+    assert http.get('https://lrclib.net/api/get').status_code == 404
+    assert session.calls == 1
+
+
+def test_last_error_is_returned_or_raised_after_the_retries(scripted):
+    scripted(Response(503), Response(502), Response(429))
+    assert http.get('https://lrclib.net/api/get', retries=2).status_code == 429
+    scripted(requests.Timeout('slow'), requests.Timeout('slow'))
+    with pytest.raises(requests.Timeout):
+        http.get('https://lrclib.net/api/get', retries=1)
+
+
+def test_a_saturated_host_fails_at_the_deadline(scripted):
+    scripted(Response(200))
+    slots = http._slots('busy.example')
+    taken = 0
+    while slots.acquire(blocking=False):
+        taken += 1
+    try:
+        with pytest.raises(http.HostBusyError):
+            http.get('https://busy.example/x', timeout=0.05)
+    finally:
+        for _ in range(taken):
+            slots.release()
+    assert http.get('https://busy.example/x', timeout=1).status_code == 200
+
+
+def test_one_session_is_shared_across_threads():
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(http.session())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(s is sessions[0] for s in sessions)
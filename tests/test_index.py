@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from decibel import search
+from decibel.index import LyricsIndex
+
+SONGS = [
+    {'title': 'Song A', 'artist': 'X', 'source': 'lrclib.net',
+     'lyrics': 'You know I will love you always\nall of my life'},
+    {'title': 'Song B', 'artist': 'Y', 'source': 'lrclib.net',
+     'lyrics': 'Me and you, all of it\nthe world loves us, of all places'},
+    {'title': 'The Sound of Silence', 'artist': 'Simon & Garfunkel', 'source': 'lrclib.net',
+     'lyrics': "Hello darkness, my old friend\nI've come to talk with you again"},
+    {'title': 'Tum Hi Ho', 'artist': 'Arijit Singh', 'source': 'lrclib.net',
+     'lyrics': 'Tum hi ho\nAb tum hi ho\nZindagi ab tum hi ho\nChain bhi, mera dard bhi\nMeri aashiqui ab tum hi ho'},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LyricsIndex(path=str(tmp_path / 'index.sqlite3'))
+    for song in SONGS:
+        index.add(song)
+    return index
+
+
+def test_add_is_idempotent(index):
+    index.add(SONGS[0])
+    assert len(index) == len(SONGS)
+
+
+def test_search_marks_phrase_matches(index):
+    results = index.search('hello darkness my old friend')
+    assert results[0]['title'] == 'The Sound of Silence'
+    assert results[0]['confidence'] == 100 and results[0]['phrase']
+    # Every word is there, but not in that order
+    scrambled = index.search('i will always love you')
+    assert scrambled[0]['title'] == 'Song A'
+    assert scrambled[0]['confidence'] == 100 and not scrambled[0]['phrase']
+
+
+def test_phrase_may_span_lines(index):
+    assert index.search("my old friend i've come")[0]['phrase']
+
+
+def test_search_needs_most_of_the_words(index):
+    assert index.search('completely unrelated words here') == []
+    assert index.search('') == []
+
+
+def test_fuzzy_search_finds_misheard_lines(index):
+    results = index.fuzzy_search('chain bi mera dart bhi')
+    assert results[0]['title'] == 'Tum Hi Ho'
+    assert results[0]['matching_phrase'].startswith('Chain bhi')
+
+
+def test_fuzzy_search_reports_the_joined_lines_when_they_match_better(index):
+    results = index.fuzzy_search("darkness my old friend i've come to talk")
+    assert results[0]['matching_phrase'] == "Hello darkness, my old friend I've come to talk with you again"
+
+
+def test_document_frequencies(index):
+    total, frequencies = index.document_frequencies(['hi', 'you', 'absent'])
+    assert total == len(SONGS)
+    assert frequencies == {'hi': 1, 'you': 3}
+
+
+@pytest.fixture
+def offline_search(index, monkeypatch):
+    """search_lyrics_async over the test index, with no remote candidates and no verification"""
+    monkeypatch.setattr(search, 'lyrics_index', lambda: index)
+
+    async def no_remote(query):
+        return []
+
+    async def unverified(snippet, songs, limit=None, deadline=None):
+        yield songs
+
+    monkeypatch.setattr(search, 'lrclib_search_async', no_remote)
+    monkeypatch.setattr(search, 'verify_songs_stream', unverified)
+
+    class Span:
+        outcome = 'ok'
+
+    def run(snippet):
+        async def main():
+            songs = []
+            async for songs in search._search_tiers(snippet, None, [], Span()):
+                pass
+            return songs
+        return asyncio.run(main())
+    return run
+
+
+def test_phrase_match_answers_alone(offline_search):
+    songs = offline_search('hello darkness my old friend')
+    assert songs[0]['title'] == 'The Sound of Silence'
+    assert songs[0]['source'] == 'local_index' and 'sources' not in songs[0]
+
+
+def test_word_overlap_is_only_a_candidate(offline_search):
+    songs = offline_search('all of me loves all of you')
+    # It went through the fan-out, as one ranking among the others
+    assert songs[0]['title'] == 'Song B'
+    assert 'local_index' in songs[0]['sources']
+
+
+def test_soundalike_snippet_answers_alone(offline_search):
+    songs = offline_search('hello darknes my old frend')
+    assert songs[0]['title'] == 'The Sound of Silence'
+    assert 'sources' not in songs[0]
+
+
+def test_short_phrases_do_not_answer_alone(offline_search):
+    assert 'sources' in offline_search('tum hi ho')[0]
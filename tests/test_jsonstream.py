@@ -0,0 +1,51 @@
+from decibel.jsonstream import JSONArrayStream
+
+
+def feed_all(stream, chunks):
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    return items
+
+
+def test_elements_are_yielded_as_soon_as_complete():
+    stream = JSONArrayStream()
+    assert stream.feed('```json\n[{"title": "Hel') == []
+    assert stream.started
+    assert stream.feed('lo"}, {"title": "Yesterday"') == [{'title': 'Hello'}]
+    assert stream.feed('}]\n```') == [{'title': 'Yesterday'}]
+    assert stream.finished
+    assert stream.close() == ''
+
+
+def test_any_chunking_gives_the_same_elements():
+    text = '[{"a": [1, 2]}, "x, y", 123, true, null, {"b": "]"}]'
+    expected = [{'a': [1, 2]}, 'x, y', 123, True, None, {'b': ']'}]
+    assert feed_all(JSONArrayStream(), [text]) == expected
+    assert feed_all(JSONArrayStream(), list(text)) == expected
+
+
+def test_number_at_end_of_chunk_waits_for_more_text():
+    stream = JSONArrayStream()
+    assert stream.feed('[12') == []
+    assert stream.feed('3, 4]') == [123, 4]
+
+
+def test_truncated_tail_is_reported_by_close():
+    stream = JSONArrayStream()
+    assert stream.feed('[{"title": "A"}, {"title": "B') == [{'title': 'A'}]
+    assert not stream.finished
+    assert stream.close() == '{"title": "B'
+
+
+def test_text_without_an_array():
+    stream = JSONArrayStream()
+    assert stream.feed('No songs found.') == []
+    assert not stream.started
+    assert stream.close() == 'No songs found.'
+
+
+def test_nothing_is_parsed_after_the_array_ends():
+    stream = JSONArrayStream()
+    assert stream.feed('[1] [2]') == [1]
+    assert stream.feed('[3]') == []
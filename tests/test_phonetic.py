@@ -0,0 +1,34 @@
+from decibel.phonetic import encode, phonetic_key, similarity, trigrams
+
+
+def test_romanized_spellings_share_a_key():
+    assert phonetic_key('bandhu') == phonetic_key('bandu')
+    assert phonetic_key('phir') == phonetic_key('fir')
+    assert phonetic_key('khushi') == phonetic_key('kusi')
+
+
+def test_silent_letters_and_accents_are_ignored():
+    assert phonetic_key('knight') == phonetic_key('night')
+    assert phonetic_key('wrong') == phonetic_key('rong')
+    assert phonetic_key('café') == phonetic_key('cafe')
+
+
+def test_different_sounds_keep_different_keys():
+    assert phonetic_key('love') != phonetic_key('lonely')
+    assert phonetic_key('dark') != phonetic_key('park')
+    assert phonetic_key('123') == ''
+
+
+def test_encode_keeps_one_key_per_word():
+    assert encode("Hello, darkness! 42") == [phonetic_key('hello'), phonetic_key('darkness')]
+    assert encode('') == []
+
+
+def test_similarity_prefers_the_line_that_sounds_alike():
+    query = 'chain bi mera dart bhi'
+    codes, grams = encode(query), trigrams(query)
+    heard = similarity(codes, grams, encode('Chain bhi, mera dard bhi'), 'Chain bhi, mera dard bhi')
+    other = similarity(codes, grams, encode('Hello darkness my old friend'), 'Hello darkness my old friend')
+    assert heard > 0.8 > other
+    assert similarity([], set(), codes, query) == 0.0
+    assert similarity(codes, grams, codes, query) == 1.0
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from decibel import prefetch
+from decibel.cache import normalize_key
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Titles whose lookups started and finished, and the most that ran at once"""
+    state = {'started': [], 'finished': [], 'running': 0, 'peak': 0, 'cached': set()}
+
+    async def lookup(artist, title):
+        state['started'].append(title)
+        state['running'] += 1
+        state['peak'] = max(state['peak'], state['running'])
+        try:
+            # Like a single-flight lookup: the upstream call outlives a cancelled caller
+            await asyncio.shield(asyncio.sleep(0.1))
+        finally:
+            state['running'] -= 1
+        state['finished'].append(title)
+
+    monkeypatch.setattr(prefetch, 'lookup_lyrics_async', lookup)
+    monkeypatch.setattr(prefetch, 'lyrics_cache', lambda: state['cached'])
+    return state
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def songs(*titles):
+    return [{'artist': 'x', 'title': t} for t in titles]
+
+
+def test_top_songs_are_fetched_in_ranking_order(lookups):
+    lookups['cached'].add(normalize_key('x', 'B'))
+    batch = songs('A', 'B', 'C', 'D') + [{'artist': 'x', 'title': 'E', 'lyrics_available': True}]
+    prefetch.Prefetcher(top_n=4, concurrency=1).schedule('session', batch)
+    wait_for(lambda: len(lookups['finished']) == 3)
+    assert lookups['started'] == ['A', 'C', 'D']
+
+
+def test_cancel_drops_unstarted_fetches_and_keeps_the_slot_until_running_ones_end(lookups):
+    prefetcher = prefetch.Prefetcher(top_n=3, concurrency=1)
+    prefetcher.schedule('session', songs('A', 'B', 'C'))
+    wait_for(lambda: lookups['started'] == ['A'])
+    prefetcher.schedule('session', songs('D'))
+    wait_for(lambda: 'D' in lookups['finished'])
+    assert lookups['started'] == ['A', 'D']
+    # A was not abandoned, and D only started once A had released the slot
+    assert lookups['finished'] == ['A', 'D']
+    assert lookups['peak'] == 1
@@ -0,0 +1,97 @@
+import asyncio
+import itertools
+
+from decibel.providers import _lrclib_parse, race_providers_async
+from decibel.routing import MIN_SAMPLES, health
+
+_names = itertools.count()
+
+
+class FakeProvider:
+    """Answers after a delay with a hit, a miss (None) or an exception"""
+
+    def __init__(self, seconds=0.0, answer='hit', timeout=10):
+        self.name = f'test-race-{next(_names)}'
+        self.seconds = seconds
+        self.answer = answer
+        self.timeout = timeout
+        self.started = self.cancelled = False
+
+    async def fetch(self, artist, song):
+        self.started = True
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return {'lyrics': 'la la', 'source': self.name} if self.answer == 'hit' else None
+
+
+def measured(provider, seconds):
+    # Give the provider a latency history so routing neither hedges at once nor calls it stale
+    for _ in range(MIN_SAMPLES):
+        health(provider.name).record(seconds, ok=True)
+    return provider
+
+
+def race(providers, outcomes=None):
+    return asyncio.run(race_providers_async('artist', 'song', providers, outcomes))
+
+
+def test_first_valid_answer_wins_and_later_providers_never_start():
+    first = measured(FakeProvider(0.01), 0.01)
+    second = measured(FakeProvider(0.01), 0.02)
+    assert race([first, second])['source'] == first.name
+    assert not second.started
+
+
+def test_misses_and_errors_fall_through_to_the_next_provider():
+    missing = measured(FakeProvider(answer=None), 0.01)
+    broken = measured(FakeProvider(answer=RuntimeError('boom')), 0.02)
+    good = measured(FakeProvider(), 0.03)
+    outcomes = []
+    assert race([missing, broken, good], outcomes)['source'] == good.name
+    assert outcomes == [(missing.name, 'miss'), (broken.name, 'error'), (good.name, 'hit')]
+
+
+def test_nobody_answering_returns_none():
+    outcomes = []
+    assert race([measured(FakeProvider(answer=None), 0.01)], outcomes) is None
+    assert [outcome for _, outcome in outcomes] == ['miss']
+
+
+def test_slow_provider_is_hedged_and_the_straggler_cancelled():
+    slow = measured(FakeProvider(5), 0.01)
+    backup = measured(FakeProvider(0.01), 0.02)
+    result = race([slow, backup])
+    assert result['source'] == backup.name
+    assert slow.started and slow.cancelled
+
+
+def test_timeout_counts_as_no_answer():
+    hung = measured(FakeProvider(5, timeout=0.05), 0.01)
+    outcomes = []
+    assert race([hung], outcomes) is None
+    assert outcomes == [(hung.name, 'timeout')]
+
+
+def test_open_circuit_is_skipped():
+    down = FakeProvider()
+    for _ in range(10):
+        health(down.name).record(1.0, ok=False)
+    up = measured(FakeProvider(), 0.01)
+    outcomes = []
+    assert race([down, up], outcomes)['source'] == up.name
+    assert race([down], outcomes) is None
+    assert not down.started
+
+
+def test_lrclib_parse_falls_back_to_synced_lines():
+    data = {'trackName': 'Song', 'artistName': 'Artist', 'plainLyrics': '',
+            'syncedLyrics': '[00:01.00] first line\n[00:02.50] second line'}
+    result = _lrclib_parse(data, 'a', 's')
+    assert result['lyrics'] == 'first line\nsecond line'
+    assert result['synced'] and result['source'] == 'lrclib.net'
+    assert _lrclib_parse({'plainLyrics': '', 'syncedLyrics': ''}, 'a', 's') is None
@@ -0,0 +1,29 @@
+from decibel.query import analyze, clean, tokenize
+
+
+def test_hesitations_are_removed():
+    assert clean('umm hello darkness, uhh my old friend') == 'hello darkness, my old friend'
+    assert clean('Hmm  dil   से re') == 'dil से re'
+
+
+def test_discourse_fillers_only_when_set_off():
+    assert clean('something like, hello darkness my old friend') == 'hello darkness my old friend'
+    assert clean('tum hi ho, you know') == 'tum hi ho'
+    assert clean('like a rolling stone') == 'like a rolling stone'
+    assert clean('I mean it') == 'I mean it'
+
+
+def test_case_and_inner_punctuation_are_kept():
+    assert clean('  Let It Be,  let it be, ') == 'Let It Be, let it be'
+    assert clean(None) == ''
+
+
+def test_tokenize_keeps_indic_vowel_signs():
+    assert tokenize("Dil से, I've") == ['dil', 'से', 'i', 've']
+    assert tokenize('दिल दिया') == ['दिल', 'दिया']
+
+
+def test_analyze_detects_language():
+    assert analyze('tum hi ho, ab tum hi ho')['language'] == 'hi-latn'
+    assert analyze('तुम ही हो')['language'] == 'hi'
+    assert analyze('hello darkness my old friend')['language'] == 'en'
@@ -0,0 +1,117 @@
+import asyncio
+
+from decibel.providers import race_providers_async
+from decibel.routing import MIN_SAMPLES, ProviderHealth, health, order
+
+
+def tripped(failures=3):
+    health = ProviderHealth('test', failure_threshold=failures, cooldown=30)
+    for _ in range(failures):
+        health.record(1.0, ok=False)
+    return health
+
+
+def cool_down(health):
+    health.opened_at -= health.cooldown + 1
+
+
+def test_closed_until_enough_consecutive_failures():
+    health = ProviderHealth('test', failure_threshold=3, cooldown=30)
+    health.record(1.0, ok=False)
+    health.record(1.0, ok=False)
+    assert health.state == 'closed' and health.allow()
+    # A miss is a healthy reply and resets the count
+    health.record(0.1, ok=True)
+    health.record(1.0, ok=False)
+    health.record(1.0, ok=False)
+    assert health.state == 'closed'
+    health.record(1.0, ok=False)
+    assert health.state == 'open'
+    assert not health.allow()
+
+
+def test_half_open_after_cooldown_lets_one_trial_through():
+    health = tripped()
+    cool_down(health)
+    assert health.state == 'half-open'
+    assert health.allow()
+    assert not health.allow()
+
+
+def test_successful_trial_closes():
+    health = tripped()
+    cool_down(health)
+    assert health.allow()
+    health.record(0.2, ok=True)
+    assert health.state == 'closed'
+    assert health.allow() and health.allow()
+
+
+def test_failed_trial_reopens_at_once():
+    health = tripped()
+    cool_down(health)
+    assert health.allow()
+    health.record(1.0, ok=False)
+    assert health.state == 'open'
+    assert not health.allow()
+
+
+def test_cancelled_trial_frees_the_slot():
+    health = tripped()
+    cool_down(health)
+    assert health.allow()
+    health.release_trial()
+    assert health.state == 'half-open'
+    assert health.allow()
+
+
+def test_hedge_delay_follows_p90():
+    health = ProviderHealth('test')
+    assert health.hedge_delay(10) == 1.0
+    assert health.hedge_delay(0.5) == 0.5
+    for seconds in (0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 2.0):
+        health.record(seconds, ok=True)
+    assert health.hedge_delay(10) == 2.0
+    assert health.hedge_delay(1.5) == 1.5
+
+
+def test_abandoned_calls_count_as_slow_but_not_as_failures():
+    health = ProviderHealth('test', failure_threshold=3, cooldown=30)
+    for _ in range(5):
+        health.record(0.05, ok=True)
+    for _ in range(6):
+        health.record_abandoned(2.0)
+    assert health.percentile(50) == 2.0
+    assert health.error_rate == 0.0
+    assert health.state == 'closed'
+
+
+class FakeProvider:
+    def __init__(self, name, seconds):
+        self.name = name
+        self.seconds = seconds
+        self.timeout = 10
+
+    async def fetch(self, artist, song):
+        await asyncio.sleep(self.seconds)
+        return {'lyrics': self.name, 'source': self.name}
+
+
+def test_provider_that_turns_slow_loses_its_place():
+    fast_then_slow = FakeProvider('test-turns-slow', 0.01)
+    backup = FakeProvider('test-backup', 0.02)
+    providers = [fast_then_slow, backup]
+    for _ in range(MIN_SAMPLES):
+        health('test-backup').record(0.02, ok=True)
+
+    async def lookups(count):
+        return [await race_providers_async('a', 's', providers) for _ in range(count)]
+
+    asyncio.run(lookups(MIN_SAMPLES))
+    assert [p.name for p in order(providers)] == ['test-turns-slow', 'test-backup']
+
+    # It no longer fails or answers, so only losing to the hedge says it got slow
+    fast_then_slow.seconds = 5
+    asyncio.run(lookups(2 * MIN_SAMPLES))
+    assert [p.name for p in order(providers)] == ['test-backup', 'test-turns-slow']
+    assert asyncio.run(race_providers_async('a', 's', providers))['source'] == 'test-backup'
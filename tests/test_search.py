@@ -0,0 +1,45 @@
+import pytest
+
+from decibel.search import RRF_K, SOURCE_WEIGHTS, fuse_rankings
+
+
+def test_songs_found_by_several_strategies_are_merged_and_ranked_first():
+    fused = fuse_rankings({
+        'gemini': [{'title': 'Yesterday', 'artist': 'The Beatles', 'confidence': 50}],
+        'lrclib_keywords': [
+            {'title': 'Let It Be', 'artist': 'The Beatles'},
+            {'title': 'yesterday', 'artist': 'the beatles', 'album': 'Help!'},
+        ],
+    })
+    assert [s['title'] for s in fused] == ['Yesterday', 'Let It Be']
+    top = fused[0]
+    assert top['sources'] == ['gemini', 'lrclib_keywords']
+    assert top['score'] == pytest.approx(1.0 / (RRF_K + 1) + SOURCE_WEIGHTS['lrclib_keywords'] / (RRF_K + 2))
+
+
+def test_gemini_metadata_wins_over_lrclib():
+    fused = fuse_rankings({
+        'lrclib_full_text': [{'title': 'hello', 'artist': 'adele', 'album': '25'}],
+        'gemini': [{'title': 'Hello', 'artist': 'Adele', 'confidence': 80, 'album': ''}],
+    })
+    assert len(fused) == 1
+    assert fused[0]['title'] == 'Hello' and fused[0]['artist'] == 'Adele'
+    # Empty Gemini fields don't erase what lrclib.net knew
+    assert fused[0]['album'] == '25'
+
+
+def test_gemini_weight_scales_with_confidence():
+    sure = fuse_rankings({'gemini': [{'title': 'A', 'artist': 'X', 'confidence': 100}]})
+    unsure = fuse_rankings({'gemini': [{'title': 'A', 'artist': 'X', 'confidence': 0}]})
+    assert sure[0]['score'] == pytest.approx(3 * unsure[0]['score'])
+
+
+def test_a_strategy_counts_once_per_song():
+    fused = fuse_rankings({'lrclib_keywords': [{'title': 'A', 'artist': 'X'}, {'title': 'a', 'artist': 'x'}]})
+    assert len(fused) == 1
+    assert fused[0]['score'] == pytest.approx(SOURCE_WEIGHTS['lrclib_keywords'] / (RRF_K + 1))
+
+
+def test_empty_rankings():
+    assert fuse_rankings({}) == []
+    assert fuse_rankings({'gemini': []}) == []
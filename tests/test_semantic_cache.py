@@ -0,0 +1,43 @@
+import pytest
+
+from decibel.semantic_cache import SnippetCache, _near_duplicate, normalize_snippet
+
+SONGS = [{'title': 'Tum Hi Ho', 'artist': 'Arijit Singh', 'confidence': 95}]
+
+
+def test_normalize_snippet_drops_fillers_case_and_punctuation():
+    assert normalize_snippet('Umm, ALL of me... loves all of you!') == 'all of me loves all of you'
+    # Fillers that are lyrics stay
+    assert normalize_snippet('like a rolling stone') == 'like a rolling stone'
+
+
+@pytest.mark.parametrize('a, b', [
+    ('tum hi ho bandu', 'tum hi ho bandhu'),
+    ('phir le aaya dil', 'fir le aaya dil'),
+])
+def test_soundalike_spellings_are_near_duplicates(a, b):
+    assert _near_duplicate(a, b)
+
+
+@pytest.mark.parametrize('a, b', [
+    ('i love you baby', 'i love you lady'),
+    ('we will rock you', 'we will mock you'),
+    ('i love you', 'i don t love you'),
+    ('all of me', 'all of you'),
+])
+def test_different_words_are_not_near_duplicates(a, b):
+    assert not _near_duplicate(a, b)
+
+
+def test_most_words_must_be_identical():
+    assert not _near_duplicate('phir bandu', 'fir bandhu')
+    assert _near_duplicate('phir bandu', 'fir bandhu', min_identical=0)
+
+
+def test_cache_serves_exact_and_soundalike_snippets_only():
+    cache = SnippetCache()
+    cache.set('Tum hi ho, bandu mere', SONGS)
+    assert cache.get('tum hi ho bandu mere') == SONGS
+    assert cache.get('tum hi ho bandhu mere') == SONGS
+    assert cache.get('tum hi ho bandu tere') is None
+    assert cache.get('umm') is None
@@ -0,0 +1,10 @@
+from decibel.server import _lyrics_payload
+from decibel.synced import SyncedLyrics
+
+
+def test_lyrics_payload_leaves_out_the_internal_synced_encoding():
+    result = {'title': 'Hello', 'artist': 'Adele', 'lyrics': 'Hello, it is me', 'source': 'lrclib.net',
+              'synced': SyncedLyrics.parse('[00:01.00]Hello, it is me').encode()}
+    assert _lyrics_payload(result) == {'title': 'Hello', 'artist': 'Adele',
+                                       'lyrics': 'Hello, it is me', 'source': 'lrclib.net'}
+    assert _lyrics_payload({'title': 't', 'lyrics': 'l', 'synced': ''}) == {'title': 't', 'lyrics': 'l'}
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from decibel.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'lyrics'
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do('key', fetch) for _ in range(10)))
+        return flights, results
+
+    flights, results = asyncio.run(main())
+    assert results == ['lyrics'] * 10
+    assert len(calls) == 1
+    assert len(flights) == 0
+
+
+def test_different_keys_are_not_coalesced():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def main():
+        flights = SingleFlight()
+        return await asyncio.gather(flights.do('a', lambda: fetch('a')), flights.do('b', lambda: fetch('b')))
+
+    assert asyncio.run(main()) == ['a', 'b']
+    assert sorted(calls) == ['a', 'b']
+
+
+def test_failure_reaches_every_caller_and_is_not_kept():
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError('upstream down')
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do('key', fail) for _ in range(3)), return_exceptions=True)
+        # The next call starts afresh
+        again = await flights.do('key', lambda: asyncio.sleep(0, result='ok'))
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert again == 'ok'
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'lyrics'
+
+    async def main():
+        flights = SingleFlight()
+        leader = asyncio.ensure_future(flights.do('key', fetch))
+        follower = asyncio.ensure_future(flights.do('key', fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 'lyrics'
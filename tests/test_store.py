@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from decibel import store
+from decibel.store import LyricsStore, normalize_body
+
+BODY = "Hello darkness, my old friend\r\nI've come to talk with you again  \r\n\r\n\r\nBecause a vision"
+
+
+@pytest.fixture
+def lyrics(tmp_path, monkeypatch):
+    instance = LyricsStore(path=str(tmp_path / 'lyrics.seg'))
+    # to_ref and resolve go through the process-wide store
+    monkeypatch.setattr(store, '_store', instance)
+    return instance
+
+
+def test_put_and_get_normalized_body(lyrics):
+    key = lyrics.put(BODY)
+    assert lyrics.get(key) == normalize_body(BODY)
+    assert normalize_body(BODY) == "Hello darkness, my old friend\nI've come to talk with you again\n\nBecause a vision"
+
+
+def test_identical_bodies_are_stored_once(lyrics):
+    assert lyrics.put(BODY) == lyrics.put(BODY.replace('\r\n', '\n'))
+    assert len(lyrics) == 1
+    assert lyrics.stats['stored'] == 1
+    assert lyrics.stats['deduplicated'] == 1
+
+
+def test_bodies_are_read_back_from_the_segment(lyrics):
+    keys = [lyrics.put(f'{BODY}\nverse {i}') for i in range(3)]
+    reopened = LyricsStore(path=lyrics.path)
+    assert reopened.get(keys[1], memory_only=True) is None
+    assert reopened.get(keys[1]) == normalize_body(f'{BODY}\nverse 1')
+    assert reopened.get(keys[1], memory_only=True) is not None
+    raw, stored = reopened.size()
+    assert stored == os.path.getsize(lyrics.path)
+    assert stored < raw + 3 * 5
+
+
+def test_unknown_digest(lyrics):
+    assert lyrics.get('0' * 32) is None
+
+
+def test_to_ref_and_resolve_round_trip(lyrics):
+    result = {'title': 'The Sound of Silence', 'artist': 'Simon & Garfunkel',
+              'lyrics': BODY, 'synced': 'TFJDMQ==', 'source': 'lrclib.net'}
+    ref = store.to_ref(result)
+    assert 'lyrics' not in ref and 'synced' not in ref
+    assert set(ref) >= {'lyrics_ref', 'synced_ref'}
+    assert store.resolve(ref) == dict(result, lyrics=normalize_body(BODY))
+
+
+def test_empty_synced_stays_inline(lyrics):
+    ref = store.to_ref({'title': 't', 'lyrics': BODY, 'synced': ''})
+    assert ref['synced'] == '' and 'synced_ref' not in ref
+    assert store.resolve(ref)['synced'] == ''
+
+
+def test_resolve_passes_through_results_and_misses(lyrics):
+    full = {'title': 't', 'lyrics': 'words'}
+    assert store.resolve(full) is full
+    assert store.resolve(None) is None
+    assert store.resolve({'title': 't', 'lyrics_ref': '0' * 32}) is None
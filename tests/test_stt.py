@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from decibel.stt import LocalEngine
+
+
+class EchoEngine(LocalEngine):
+    """Transcribes a clip as its bytes decoded, counting model loads"""
+
+    name = 'echo'
+
+    def __init__(self, fail_load=False):
+        super().__init__()
+        self.loads = 0
+        self.fail_load = fail_load
+        self.threads = set()
+
+    def load_model(self):
+        self.loads += 1
+        if self.fail_load:
+            raise RuntimeError('no model')
+        return 'model'
+
+    def transcribe_one(self, pcm):
+        self.threads.add(threading.current_thread().name)
+        if pcm == b'bad':
+            raise ValueError('unreadable clip')
+        return pcm.decode()
+
+
+def test_engines_must_implement_the_model_hooks():
+    with pytest.raises(TypeError):
+        LocalEngine()
+
+
+def test_concurrent_clips_share_one_model_and_worker():
+    engine = EchoEngine()
+    clips = [f'clip {i}'.encode() for i in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        texts = list(pool.map(lambda pcm: engine.transcribe(pcm, timeout=5), clips))
+    assert texts == [pcm.decode() for pcm in clips]
+    assert engine.loads == 1
+    assert engine.threads == {'decibel-stt-echo'}
+
+
+def test_a_failing_clip_does_not_stop_the_worker():
+    engine = EchoEngine()
+    with pytest.raises(ValueError):
+        engine.transcribe(b'bad', timeout=5)
+    assert engine.transcribe(b'fine', timeout=5) == 'fine'
+
+
+def test_model_load_error_reaches_every_caller():
+    engine = EchoEngine(fail_load=True)
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match='no model'):
+            engine.transcribe(b'clip', timeout=5)
+    assert engine.loads == 1
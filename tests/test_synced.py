@@ -0,0 +1,56 @@
+from decibel.synced import SyncedLyrics
+
+LRC = """[ar: Simon & Garfunkel]
+[00:01.50]Hello darkness, my old friend
+[00:05.00][00:20.25]I've come to talk with you again
+[00:10.123]Because a vision softly creeping
+"""
+
+
+def test_parse_orders_lines_and_skips_metadata():
+    synced = SyncedLyrics.parse(LRC)
+    assert synced.lines() == [
+        (1500, 'Hello darkness, my old friend'),
+        (5000, "I've come to talk with you again"),
+        (10123, 'Because a vision softly creeping'),
+        (20250, "I've come to talk with you again"),
+    ]
+    # A repeated line's text is stored once
+    assert synced.text.count("I've come") == 1
+
+
+def test_line_at():
+    synced = SyncedLyrics.parse(LRC)
+    assert synced.line_at(0) is None
+    assert synced.line_at(1500) == 'Hello darkness, my old friend'
+    assert synced.line_at(9999) == "I've come to talk with you again"
+    assert synced.line_at(60000) == "I've come to talk with you again"
+
+
+def test_offset_tag_shifts_lines_earlier():
+    synced = SyncedLyrics.parse('[offset:+500]\n[00:01.00]one\n[00:00.20]zero')
+    assert synced.lines() == [(0, 'zero'), (500, 'one')]
+
+
+def test_bytes_and_encoded_round_trip():
+    synced = SyncedLyrics.parse(LRC)
+    assert SyncedLyrics.from_bytes(synced.to_bytes()).lines() == synced.lines()
+    encoded = synced.encode()
+    assert encoded.isascii()
+    assert SyncedLyrics.decode(encoded).lines() == synced.lines()
+
+
+def test_lrc_round_trip():
+    synced = SyncedLyrics.parse(LRC)
+    assert SyncedLyrics.parse(synced.to_lrc()).lines() == [
+        (1500, 'Hello darkness, my old friend'),
+        (5000, "I've come to talk with you again"),
+        (10120, 'Because a vision softly creeping'),
+        (20250, "I've come to talk with you again"),
+    ]
+
+
+def test_empty_or_untimed_text_is_falsy():
+    assert not SyncedLyrics.parse('')
+    assert not SyncedLyrics.parse('just plain lyrics\nno timestamps')
+    assert SyncedLyrics.parse('').plain() == ''
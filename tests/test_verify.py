@@ -0,0 +1,31 @@
+import pytest
+
+from decibel.verify import VERIFIED_SCORE, align
+
+LYRICS = """Hello darkness, my old friend
+I've come to talk with you again
+Because a vision softly creeping
+Left its seeds while I was sleeping"""
+
+
+def test_verbatim_snippet_anywhere_in_the_lyrics():
+    assert align('hello darkness my old friend', LYRICS) == 1.0
+    assert align('Because a vision, softly creeping!', LYRICS) == 1.0
+    # Across a line break
+    assert align('softly creeping left its seeds', LYRICS) == 1.0
+
+
+def test_misheard_and_skipped_words_lower_the_score():
+    score = align('hello darkness my friend', LYRICS)
+    assert VERIFIED_SCORE <= score < 1.0
+    assert align('hello darkness my old fiend', LYRICS) == pytest.approx(0.8)
+
+
+def test_soundalike_words_cost_less_than_different_ones():
+    assert align('bandu mere', 'o bandhu mere') == pytest.approx(1 - 0.3 / 2)
+
+
+def test_unrelated_or_empty():
+    assert align('completely unrelated words', LYRICS) == 0.0
+    assert align('', LYRICS) == 0.0
+    assert align('hello', '') == 0.0
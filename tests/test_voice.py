@@ -0,0 +1,50 @@
+from array import array
+
+from decibel.voice import PhraseTracker, rms
+
+
+def feed_all(tracker, partials):
+    return [tracker.feed(text) for text in partials]
+
+
+def test_words_two_partials_agree_on_become_a_phrase():
+    tracker = PhraseTracker(min_words=3)
+    assert feed_all(tracker, [
+        'hello darkness',
+        'Hello darkness my old',
+        'hello darkness my old friend',
+    ]) == [None, None, 'hello darkness my old']
+
+
+def test_phrase_is_only_reported_again_once_it_grows():
+    tracker = PhraseTracker(min_words=3)
+    assert feed_all(tracker, [
+        'tum hi ho ab',
+        'tum hi ho ab tum',
+        'tum hi ho ab tum',
+        'tum hi ho ab tum hi ho',
+        'tum hi ho ab tum hi ho',
+    ]) == [None, 'tum hi ho ab', 'tum hi ho ab tum', None, 'tum hi ho ab tum hi ho']
+
+
+def test_revised_partials_reset_the_agreement():
+    tracker = PhraseTracker(min_words=3)
+    assert feed_all(tracker, [
+        'i will always',
+        'i would always love',
+        'i would always love you',
+    ]) == [None, None, 'i would always love']
+
+
+def test_short_agreement_and_the_phrase_limit():
+    tracker = PhraseTracker(min_words=3, max_phrases=1)
+    assert feed_all(tracker, ['let it', 'let it be']) == [None, None]
+    assert tracker.feed('let it be let') == 'let it be'
+    assert feed_all(tracker, ['let it be let it', 'let it be let it be']) == [None, None]
+
+
+def test_rms_of_16_bit_audio():
+    assert rms(b'', 2) == 0
+    assert rms(array('h', [300, -300, 300, -300]).tobytes(), 2) == 300
+    # A dangling odd byte is ignored
+    assert rms(array('h', [100, -100]).tobytes() + b'\x01', 2) == 100